@@ -1,6 +1,11 @@
 // TEAMFPSCRUDDjangoReact/src/api.ts
 const API_BASE = (import.meta.env?.VITE_API_BASE as string) || "http://127.0.0.1:8000";
 
+// Conditional GETs: remember each GET's ETag/Last-Modified + body (per token, since payloads
+// are per user) and send them back; a 304 is answered from the remembered body.
+type CachedGet = { etag: string | null; lastModified: string | null; body: string };
+const getCache = new Map<string, CachedGet>();
+
 async function apiFetch(path: string, opts: RequestInit = {}, token?: string) {
   const headers: HeadersInit = {
     Accept: "application/json",
@@ -8,18 +13,68 @@ async function apiFetch(path: string, opts: RequestInit = {}, token?: string) {
   };
   if (token) headers["Authorization"] = `Token ${token}`;
   if (opts.body && !(opts.body instanceof FormData)) headers["Content-Type"] = "application/json";
+
+  const isGet = (opts.method || "GET").toUpperCase() === "GET";
+  const cacheKey = `${token || ""} ${path}`;
+  const cached = isGet ? getCache.get(cacheKey) : undefined;
+  if (cached?.etag) headers["If-None-Match"] = cached.etag;
+  if (cached?.lastModified) headers["If-Modified-Since"] = cached.lastModified;
+
   const res = await fetch(`${API_BASE}${path}`, { ...opts, headers, credentials: "omit" });
+  if (res.status === 304 && cached) {
+    return new Response(cached.body, { status: 200, headers: { "Content-Type": "application/json" } });
+  }
+  if (isGet && res.ok && (res.headers.get("ETag") || res.headers.get("Last-Modified"))) {
+    getCache.set(cacheKey, {
+      etag: res.headers.get("ETag"),
+      lastModified: res.headers.get("Last-Modified"),
+      body: await res.clone().text(),
+    });
+  }
   return res;
 }
 
 export type Subject = { id: number | string; name: string };
 export type Student = { id: number | string; email: string; first_name?: string; last_name?: string; is_staff?: boolean; is_admin?: boolean };
 
+// List endpoints use cursor pagination: { next, previous, results }
+export type Page<T> = { next: string | null; previous: string | null; results: T[] };
+
+// `next` links are absolute URLs; apiFetch expects a path relative to API_BASE
+function toPath(url: string) {
+  const u = new URL(url);
+  return `${u.pathname}${u.search}`;
+}
+
+// Yields one page of results at a time, following the server's `next` cursor.
+export async function* iteratePages<T>(path: string, token?: string): AsyncGenerator<T[]> {
+  let next: string | null = path;
+  while (next) {
+    const r = await apiFetch(next, { method: "GET" }, token);
+    if (!r.ok) throw r;
+    const page = (await r.json()) as Page<T>;
+    yield page.results;
+    next = page.next ? toPath(page.next) : null;
+  }
+}
+
+async function fetchAllPages<T>(path: string, token?: string) {
+  const all: T[] = [];
+  for await (const results of iteratePages<T>(path, token)) all.push(...results);
+  return all;
+}
+
+// Filters are applied by the server (see grades/filters.py); empty values are left out
+function withQuery(path: string, params: Record<string, string | undefined>) {
+  const query = new URLSearchParams();
+  for (const [key, value] of Object.entries(params)) if (value) query.set(key, value);
+  const qs = query.toString();
+  return qs ? `${path}?${qs}` : path;
+}
+
 // Subjects
-export async function fetchSubjects(token?: string) {
-  const r = await apiFetch("/api/subjects/", { method: "GET" }, token);
-  if (!r.ok) throw r;
-  return r.json() as Promise<Subject[]>;
+export async function fetchSubjects(token?: string, filters: { search?: string } = {}) {
+  return fetchAllPages<Subject>(withQuery("/api/subjects/", filters), token);
 }
 export async function createSubject(payload: { name: string }, token?: string) {
   const r = await apiFetch("/api/subjects/", { method: "POST", body: JSON.stringify(payload) }, token);
@@ -33,10 +88,9 @@ export async function deleteSubject(id: string | number, token?: string) {
 }
 
 // Users
-export async function fetchUsers(token?: string) {
-  const r = await apiFetch("/api/users/", { method: "GET" }, token);
-  if (!r.ok) throw r;
-  return r.json() as Promise<Student[]>;
+export type UserFilters = { email?: string; name?: string; role?: "student" | "staff" };
+export async function fetchUsers(token?: string, filters: UserFilters = {}) {
+  return fetchAllPages<Student>(withQuery("/api/users/", filters), token);
 }
 export async function createUser(payload: { email: string; password: string; first_name?: string; last_name?: string }, token?: string) {
   const r = await apiFetch("/api/users/", { method: "POST", body: JSON.stringify(payload) }, token);
@@ -47,4 +101,34 @@ export async function deleteUser(id: string | number, token?: string) {
   const r = await apiFetch(`/api/users/${id}/`, { method: "DELETE" }, token);
   if (!r.ok && r.status !== 204) throw r;
   return r;
-}
\ No newline at end of file
+}
+// Delta sync (see grades/sync.py): rows changed and ids deleted since `since`, plus the token
+// for the next call. Without `since` every visible row is returned; keep calling while has_more.
+type Id = number | string;
+export type Changes = {
+  token: string;
+  has_more: boolean;
+  subjects: Subject[];
+  users: Student[];
+  enrollments: { id: Id; student: Id; subject: Id; grade: string | null }[];
+  deleted: { subjects: Id[]; enrollments: Id[]; users: Id[] };
+};
+export class SyncExpired extends Error {}
+export async function fetchChanges(since: string | null, token?: string) {
+  const r = await apiFetch(withQuery("/api/sync/", { since: since || undefined }), { method: "GET" }, token);
+  // 410: the token outlived the server's deletion history; rebuild the mirror from scratch
+  if (r.status === 410) throw new SyncExpired();
+  if (!r.ok) throw r;
+  return r.json() as Promise<Changes>;
+}
+
+// Upserts changed rows by id (those failing `keep` are removed) and drops deleted ids
+export function applyChanges<T extends { id: Id }>(rows: T[], changed: T[], deleted: Id[], keep: (row: T) => boolean = () => true) {
+  const byId = new Map(rows.map((row) => [String(row.id), row]));
+  for (const row of changed) {
+    if (keep(row)) byId.set(String(row.id), row);
+    else byId.delete(String(row.id));
+  }
+  for (const id of deleted) byId.delete(String(id));
+  return [...byId.values()];
+}
@@ -3,7 +3,7 @@
 import * as api from "../api";
 
 import { Box, Container, Grid, Paper, Tab, Tabs, Typography } from "@mui/material";
-import React, { useCallback, useEffect, useMemo, useState } from "react";
+import React, { useCallback, useEffect, useMemo, useRef, useState } from "react";
 
 import ConfirmDialog from "../components/ConfirmDialog";
 import StudentForm from "../components/StudentForm";
@@ -11,6 +11,11 @@ import StudentList from "../components/StudentList";
 import SubjectForm from "../components/SubjectForm";
 import SubjectList from "../components/SubjectList";
 
+// how often the dashboard asks /api/sync/ for changes made elsewhere
+const SYNC_INTERVAL_MS = 30_000;
+
+const isStudent = (user: api.Student) => !user.is_staff && !user.is_admin;
+
 type Props = {
   token: string | null;
   showSnack: (message: string, severity?: "success" | "info" | "error") => void;
@@ -41,29 +46,57 @@ export default function Dashboard({ token, showSnack }: Props) {
 
   const [tabIndex, setTabIndex] = useState<number>(0);
 
+  // Local mirror kept current by /api/sync/: the first call returns everything, later ones only
+  // what changed (including deletions made by other users) since the returned token.
+  const syncToken = useRef<string | null>(null);
+
+  const syncChanges = useCallback(async () => {
+    const auth = token || undefined;
+    let changes: api.Changes;
+    do {
+      try {
+        changes = await api.fetchChanges(syncToken.current, auth);
+      } catch (err) {
+        if (!(err instanceof api.SyncExpired)) throw err;
+        syncToken.current = null;
+        setSubjects([]);
+        setStudents([]);
+        changes = await api.fetchChanges(null, auth);
+      }
+      const { subjects: changedSubjects, users, deleted } = changes;
+      setSubjects((s) => api.applyChanges(s, changedSubjects, deleted.subjects));
+      setStudents((s) => api.applyChanges(s, users, deleted.users, isStudent));
+      syncToken.current = changes.token;
+    } while (changes.has_more);
+  }, [token]);
+
   const loadAll = useCallback(async () => {
     setLoading(true);
     try {
-      const [subRes, userRes] = await Promise.allSettled([api.fetchSubjects(token || undefined), api.fetchUsers(token || undefined)]);
-      if (subRes.status === "fulfilled") setSubjects(subRes.value);
-      if (userRes.status === "fulfilled") {
-        setStudents((userRes.value as api.Student[]).filter((u) => !u.is_staff && !u.is_admin));
-      }
+      syncToken.current = null;
+      setSubjects([]);
+      setStudents([]);
+      await syncChanges();
     } catch (err) {
-      // ignore - per-call errors handled below
       console.error(err);
     } finally {
       setLoading(false);
     }
-  }, [token]);
+  }, [syncChanges]);
 
   useEffect(() => {
-    if (token) loadAll();
-    else {
+    if (!token) {
+      syncToken.current = null;
       setSubjects([]);
       setStudents([]);
+      return;
     }
-  }, [token, loadAll]);
+    loadAll();
+    const timer = window.setInterval(() => {
+      syncChanges().catch((err) => console.error(err));
+    }, SYNC_INTERVAL_MS);
+    return () => window.clearInterval(timer);
+  }, [token, loadAll, syncChanges]);
 
   // Add subject
   const handleAddSubject = useCallback(
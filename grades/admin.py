@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
-from .models import User, Subject, Enrollment
+from .models import User, Subject, Enrollment, SubjectStats, Term, ArchivedEnrollment
 
 
 @admin.register(User)
@@ -32,4 +32,29 @@ class SubjectAdmin(admin.ModelAdmin):
 @admin.register(Enrollment)
 class EnrollmentAdmin(admin.ModelAdmin):
     list_display = ('student', 'subject', 'grade', 'created_at', 'updated_at')
-    list_filter = ('subject',)
\ No newline at end of file
+    list_filter = ('subject',)
+
+@admin.register(SubjectStats)
+class SubjectStatsAdmin(admin.ModelAdmin):
+    list_display = ('subject', 'enrollment_count', 'graded_count', 'updated_at')
+    readonly_fields = ('subject', 'enrollment_count', 'graded_count', 'grade_distribution', 'updated_at')
+
+
+@admin.register(Term)
+class TermAdmin(admin.ModelAdmin):
+    list_display = ('name', 'starts_on', 'ends_on', 'archived_at')
+    readonly_fields = ('archived_at',)
+
+
+@admin.register(ArchivedEnrollment)
+class ArchivedEnrollmentAdmin(admin.ModelAdmin):
+    # history moved by `manage.py archive_terms`: read-only
+    list_display = ('id', 'student', 'subject', 'grade', 'term', 'created_at')
+    list_filter = ('term',)
+    list_select_related = ('student', 'subject', 'term')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
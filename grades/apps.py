@@ -1,6 +1,16 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class GradesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'grades'
+
+    def ready(self):
+        # connect model signal receivers (cache invalidation)
+        from . import signals  # noqa: F401
+        # count queries on every connection opened from now on (grades.metrics)
+        from . import metrics  # noqa: F401
+        # recreate the SQLite search triggers a table rebuild may have dropped (grades.filters)
+        from .filters import ensure_subject_search
+        post_migrate.connect(ensure_subject_search, sender=self)
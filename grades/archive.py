@@ -0,0 +1,67 @@
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from . import response_cache
+from .models import ArchivedEnrollment, Enrollment, Term, Tombstone
+from .stats import apply_enrollment_changes, delete_enrollments
+
+# Enrollment columns copied to ArchivedEnrollment
+_COLUMNS = ('id', 'student_id', 'subject_id', 'grade', 'grade_points', 'created_at', 'updated_at')
+
+
+def term_bounds(term):
+    """[start, end) of a term: midnight of starts_on up to midnight after ends_on, in the current time zone."""
+    tz = timezone.get_current_timezone()
+    start = datetime.combine(term.starts_on, time.min, tzinfo=tz)
+    end = datetime.combine(term.ends_on + timedelta(days=1), time.min, tzinfo=tz)
+    return start, end
+
+
+def closed_terms(today=None):
+    """Terms whose last day has passed, oldest first."""
+    return Term.objects.filter(ends_on__lt=today or timezone.localdate()).order_by('starts_on', 'id')
+
+
+def archive_term(term, batch_size=None, progress=None):
+    """
+    Move the enrollments created during `term` from Enrollment to ArchivedEnrollment.
+    Returns the number of rows moved.
+
+    Rows move in batches of `batch_size` (settings.GRADES_ARCHIVE_BATCH_SIZE), one transaction
+    each, so the write lock is held briefly and the command can be interrupted and run again.
+    Like _unenroll in grades.views the DELETE is a plain SQL one (stats.delete_enrollments), so
+    what the post_delete receivers maintain is written here per batch: SubjectStats, tombstones
+    (synced clients drop the rows, which leave /api/enrollments/ and /api/sync/) and the response
+    cache versions. No live events are published: archiving closes a term, it does not unenroll
+    anyone.
+    `progress(moved)` is called after each batch.
+    """
+    batch_size = batch_size or getattr(settings, 'GRADES_ARCHIVE_BATCH_SIZE', 1000)
+    start, end = term_bounds(term)
+    moved = 0
+    while True:
+        with transaction.atomic():
+            rows = list(
+                Enrollment.objects.select_for_update()
+                .filter(created_at__gte=start, created_at__lt=end)
+                .order_by('created_at', 'id')
+                .values_list(*_COLUMNS)[:batch_size])
+            if not rows:
+                break
+            ArchivedEnrollment.objects.bulk_create(
+                ArchivedEnrollment(term=term, **dict(zip(_COLUMNS, row))) for row in rows)
+            delete_enrollments(Enrollment.objects.filter(pk__in=[row[0] for row in rows]))
+            apply_enrollment_changes((subject_id, -1, grade, None) for _, _, subject_id, grade, *_ in rows)
+            Tombstone.objects.bulk_create(
+                Tombstone(model=Tombstone.ENROLLMENT, object_id=pk, student_id=student_id)
+                for pk, student_id, *_ in rows)
+            response_cache.bump_versions(response_cache.ENROLLMENTS)
+        moved += len(rows)
+        if progress is not None:
+            progress(moved)
+    term.archived_at = timezone.now()
+    Term.objects.filter(pk=term.pk).update(archived_at=term.archived_at, updated_at=term.archived_at)
+    return moved
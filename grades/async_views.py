@@ -0,0 +1,202 @@
+from importlib import import_module
+from types import ModuleType
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import prefetch_related_objects
+from django.http import Http404
+from django.urls import URLPattern, URLResolver
+from rest_framework import exceptions
+from rest_framework.response import Response
+
+from .roles import arequest_access
+
+# Django 5.0 ships this as django.db.models.aprefetch_related_objects
+aprefetch_related_objects = sync_to_async(prefetch_related_objects)
+
+READ_ACTIONS = ('list', 'retrieve')
+
+
+class _PageQuery:
+    """
+    Stand-in for the queryset handed to CursorPagination.paginate_queryset, which only orders,
+    filters and slices it once. The first pass records the final sliced queryset; the second
+    serves the rows fetched for it asynchronously, so DRF's cursor logic runs unchanged.
+    """
+
+    def __init__(self, queryset, rows, sliced):
+        self.queryset = queryset
+        self.rows = rows
+        self.sliced = sliced
+
+    def __getattr__(self, name):
+        return getattr(self.queryset, name)
+
+    def order_by(self, *fields):
+        return _PageQuery(self.queryset.order_by(*fields), self.rows, self.sliced)
+
+    def filter(self, *args, **kwargs):
+        return _PageQuery(self.queryset.filter(*args, **kwargs), self.rows, self.sliced)
+
+    def __getitem__(self, k):
+        self.sliced.append(self.queryset[k])
+        return self.rows if self.rows is not None else []
+
+
+async def apaginate_queryset(paginator, queryset, request, view=None):
+    """paginator.paginate_queryset(...) with the page read by QuerySet.aiterator()."""
+    sliced = []
+    paginator.paginate_queryset(_PageQuery(queryset, None, sliced), request, view=view)
+    if not sliced:
+        # pagination turned off for this request (no page size)
+        return None
+    rows = [obj async for obj in sliced[-1].aiterator()]
+    return paginator.paginate_queryset(_PageQuery(queryset, rows, sliced), request, view=view)
+
+
+class AsyncReadMixin:
+    """
+    Async list / retrieve for a ModelViewSet, served when the project runs under ASGI
+    (see read_urlpatterns(); project/asgi.py turns settings.GRADES_ASYNC_READS on).
+
+    - Authentication, permissions, filtering, cursor pagination and serializers are the
+      viewset's own, so responses are identical to the sync actions; only the DB reads are
+      awaited: rows via QuerySet.aiterator() / afirst(), tokens via
+      CachedTokenAuthentication.aauthenticate() (other authenticators via sync_to_async).
+    - prefetch_related() lookups are applied to the fetched rows afterwards (aiterator()
+      cannot prefetch on Django 4.2).
+    - Every other action runs the regular sync view through sync_to_async.
+    - Serializers must read only prefetched data: a lazy query from the event loop raises
+      SynchronousOnlyOperation.
+    """
+
+    @classmethod
+    def as_async_view(cls, actions, **initkwargs):
+        sync_view = sync_to_async(cls.as_view(actions, **initkwargs))
+
+        async def view(request, *args, **kwargs):
+            method = request.method.lower()
+            action_map = dict(actions)
+            if 'get' in action_map:
+                action_map.setdefault('head', action_map['get'])
+            if action_map.get(method) not in READ_ACTIONS:
+                return await sync_view(request, *args, **kwargs)
+
+            self = cls(**initkwargs)
+            self.action_map = action_map
+            self.request = request
+            self.args = args
+            self.kwargs = kwargs
+            return await self.adispatch(request, *args, **kwargs)
+
+        # attributes DRF's as_view() sets, read by the router, metrics and benchmarks
+        view.cls = cls
+        view.initkwargs = initkwargs
+        view.actions = actions
+        view.csrf_exempt = True
+        return view
+
+    async def adispatch(self, request, *args, **kwargs):
+        # APIView.dispatch with authentication and the handler awaited
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+        try:
+            await self.aperform_authentication(request)
+            # the permission classes and get_queryset() read the user's cached role (grades.roles)
+            await arequest_access(request)
+            self.initial(request, *args, **kwargs)
+            handler = self.alist if self.action == 'list' else self.aretrieve
+            response = await handler(request, *args, **kwargs)
+        except Exception as exc:
+            response = self.handle_exception(exc)
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
+
+    async def aperform_authentication(self, request):
+        # Request._authenticate, awaiting each authenticator; initial() then finds request.user set
+        for authenticator in request.authenticators:
+            authenticate = getattr(authenticator, 'aauthenticate', None) or sync_to_async(authenticator.authenticate)
+            try:
+                user_auth = await authenticate(request)
+            except exceptions.APIException:
+                request._not_authenticated()
+                raise
+            if user_auth is not None:
+                request._authenticator = authenticator
+                request.user, request.auth = user_auth
+                return
+        request._not_authenticated()
+
+    async def alist(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        lookups = queryset._prefetch_related_lookups
+        queryset = queryset.prefetch_related(None)
+
+        page = None
+        if self.paginator is not None:
+            page = await apaginate_queryset(self.paginator, queryset, request, view=self)
+        rows = page if page is not None else [obj async for obj in queryset.aiterator()]
+        if lookups:
+            await aprefetch_related_objects(rows, *lookups)
+
+        serializer = self.get_serializer(rows, many=True)
+        if page is not None:
+            return self.get_paginated_response(serializer.data)
+        return Response(serializer.data)
+
+    async def aretrieve(self, request, *args, **kwargs):
+        instance = await self.aget_object()
+        return Response(self.get_serializer(instance).data)
+
+    async def aget_object(self):
+        # GenericAPIView.get_object with the row read by QuerySet.afirst()
+        queryset = self.filter_queryset(self.get_queryset())
+        lookups = queryset._prefetch_related_lookups
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        # same 404s as rest_framework.generics.get_object_or_404
+        try:
+            obj = await queryset.prefetch_related(None).filter(
+                **{self.lookup_field: self.kwargs[lookup_url_kwarg]}).afirst()
+        except (TypeError, ValueError, ValidationError):
+            raise Http404
+        if obj is None:
+            raise Http404(f'No {queryset.model._meta.object_name} matches the given query.')
+        if lookups:
+            await aprefetch_related_objects([obj], *lookups)
+        self.check_object_permissions(self.request, obj)
+        return obj
+
+
+def read_urlpatterns(patterns, async_reads=True):
+    """
+    `patterns` with every AsyncReadMixin viewset route rebuilt as its async
+    (as_async_view) or sync (as_view) variant; includes are rebuilt recursively.
+    """
+    rebuilt = []
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            pattern = URLResolver(pattern.pattern, read_urlpatterns(pattern.url_patterns, async_reads),
+                                  pattern.default_kwargs, pattern.app_name, pattern.namespace)
+        else:
+            view_class = getattr(pattern.callback, 'cls', None)
+            actions = getattr(pattern.callback, 'actions', None)
+            if actions and isinstance(view_class, type) and issubclass(view_class, AsyncReadMixin):
+                make_view = view_class.as_async_view if async_reads else view_class.as_view
+                pattern = URLPattern(pattern.pattern, make_view(actions, **pattern.callback.initkwargs),
+                                     pattern.default_args, pattern.name)
+        rebuilt.append(pattern)
+    return rebuilt
+
+
+def read_urlconf(async_reads):
+    """
+    settings.ROOT_URLCONF as a module object whose reads are served async or sync, for
+    comparing both paths in one process (override_settings(ROOT_URLCONF=...)).
+    """
+    module = ModuleType(f"{settings.ROOT_URLCONF}.{'async' if async_reads else 'sync'}_reads")
+    module.urlpatterns = read_urlpatterns(import_module(settings.ROOT_URLCONF).urlpatterns, async_reads)
+    return module
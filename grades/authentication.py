@@ -0,0 +1,120 @@
+import hashlib
+import threading
+
+from django.conf import settings
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication, get_authorization_header
+from rest_framework.authtoken.models import Token
+
+from .caching import invalidated_cache
+
+_stats = {'hits': 0, 'misses': 0}
+_stats_lock = threading.Lock()
+
+
+def _cache():
+    # (cache, timeout); short-lived when the alias is per-process, see grades.caching
+    return invalidated_cache(getattr(settings, 'GRADES_TOKEN_CACHE_ALIAS', 'default'),
+                             getattr(settings, 'GRADES_TOKEN_CACHE_TTL', 300))
+
+
+def token_cache_key(key):
+    # hash the raw token so it never appears in (possibly shared) cache key listings
+    return 'grades:auth-token:' + hashlib.sha256(key.encode()).hexdigest()
+
+
+def invalidate_token(key):
+    _cache()[0].delete(token_cache_key(key))
+
+
+def invalidate_user_tokens(user_id):
+    keys = Token.objects.filter(user_id=user_id).values_list('key', flat=True)
+    _cache()[0].delete_many([token_cache_key(key) for key in keys])
+
+
+def token_cache_stats():
+    """Snapshot of hit/miss counters for this process."""
+    with _stats_lock:
+        return dict(_stats)
+
+
+def _count(name):
+    with _stats_lock:
+        _stats[name] += 1
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    Drop-in replacement for DRF's TokenAuthentication that caches the token -> user lookup.
+
+    - The resolved Token (with its user joined) is stored in the cache framework for
+      settings.GRADES_TOKEN_CACHE_TTL seconds, so repeat requests skip the token+user query.
+    - The cache is per-process with the default LocMemCache: a token revoked through another
+      worker stays valid here until the entry expires, so entries are kept at most
+      settings.GRADES_LOCAL_CACHE_TTL seconds (see grades.caching). A shared alias (Redis,
+      Memcached) sees every invalidation.
+    - Entries are dropped by grades.signals when the token is deleted or its user is saved
+      or deleted (covers is_active / is_staff / is_admin changes). QuerySet.update() bypasses
+      signals, so such writes are only picked up once the TTL expires.
+    - Invalid tokens are never cached.
+    - aauthenticate() is the same lookup for the async read views (grades.async_views); a
+      cache hit resolves without leaving the event loop.
+    """
+
+    def authenticate_credentials(self, key):
+        cache, timeout = _cache()
+        cache_key = token_cache_key(key)
+        token = cache.get(cache_key)
+        if token is None:
+            _count('misses')
+            user, token = super().authenticate_credentials(key)
+            cache.set(cache_key, token, timeout)
+            return user, token
+        return self._cached_credentials(token)
+
+    def authenticate(self, request):
+        key = self.token_key(request)
+        return None if key is None else self.authenticate_credentials(key)
+
+    async def aauthenticate(self, request):
+        """Async counterpart of authenticate(), used by grades.async_views."""
+        key = self.token_key(request)
+        return None if key is None else await self.aauthenticate_credentials(key)
+
+    def token_key(self, request):
+        # the Authorization header parsing of TokenAuthentication.authenticate, minus the lookup
+        auth = get_authorization_header(request).split()
+        if not auth or auth[0].lower() != self.keyword.lower().encode():
+            return None
+        if len(auth) == 1:
+            raise exceptions.AuthenticationFailed(_('Invalid token header. No credentials provided.'))
+        if len(auth) > 2:
+            raise exceptions.AuthenticationFailed(_('Invalid token header. Token string should not contain spaces.'))
+        try:
+            return auth[1].decode()
+        except UnicodeError:
+            raise exceptions.AuthenticationFailed(
+                _('Invalid token header. Token string should not contain invalid characters.'))
+
+    async def aauthenticate_credentials(self, key):
+        cache, timeout = _cache()
+        token = cache.get(token_cache_key(key))
+        if token is None:
+            _count('misses')
+            model = self.get_model()
+            try:
+                token = await model.objects.select_related('user').aget(key=key)
+            except model.DoesNotExist:
+                raise exceptions.AuthenticationFailed(_('Invalid token.'))
+            if not token.user.is_active:
+                raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+            cache.set(token_cache_key(key), token, timeout)
+            return token.user, token
+        return self._cached_credentials(token)
+
+    def _cached_credentials(self, token):
+        _count('hits')
+        if not token.user.is_active:
+            raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+        return token.user, token
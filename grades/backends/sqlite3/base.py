@@ -0,0 +1,30 @@
+from django.db.backends.sqlite3.base import DatabaseWrapper as SQLiteDatabaseWrapper
+
+
+class DatabaseWrapper(SQLiteDatabaseWrapper):
+    """
+    SQLite backend tuned for concurrent writers (ENGINE 'grades.backends.sqlite3').
+
+    Extra DATABASES OPTIONS, removed before sqlite3.connect() sees them:
+    - pragmas: {name: value} run on every new connection, e.g. journal_mode=WAL,
+      synchronous=NORMAL, mmap_size. The busy timeout is sqlite3's own `timeout` option.
+    - transaction_mode: 'IMMEDIATE' makes atomic() take the write lock up front with
+      `BEGIN IMMEDIATE`, so two transactions that read then write wait on the busy timeout
+      instead of failing with "database is locked" (same option as Django 5.1's backend).
+    """
+
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        params.pop('pragmas', None)
+        params.pop('transaction_mode', None)
+        return params
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for name, value in self.settings_dict['OPTIONS'].get('pragmas', {}).items():
+            conn.execute(f'PRAGMA {name} = {value}')
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        mode = self.settings_dict['OPTIONS'].get('transaction_mode')
+        self.cursor().execute(f'BEGIN {mode}' if mode else 'BEGIN')
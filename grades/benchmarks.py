@@ -0,0 +1,444 @@
+import asyncio
+import io
+import json
+import math
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.core.asgi import get_asgi_application
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.wsgi import get_wsgi_application
+from django.db import connection, connections, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import get_resolver
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from .archive import archive_term, term_bounds
+from .async_views import read_urlconf
+from .fast_list import FastListSerializer, values_plan
+from .models import User, Subject, Enrollment, Job, Term
+from .renderers import ORJSONRenderer
+from .serializers import EnrollmentSerializer, UserSerializer
+from .seeding import SEED_PASSWORD
+
+ROLES = ('anonymous', 'student', 'staff')
+HTTP_METHODS = ('get', 'post', 'put', 'patch', 'delete')
+STAFF_EMAIL = 'bench-staff@example.com'
+SPARE_SUBJECT = 'bench spare subject'
+ARCHIVE_TERM = 'bench closed term'
+
+
+def served_routes():
+    """
+    Every (url name, http method) pair served by project/urls.py, except the Django admin
+    and the unnamed root redirect. Used to check the benchmark covers each endpoint.
+    """
+    found = set()
+
+    def walk(patterns, namespace=''):
+        for pattern in patterns:
+            if hasattr(pattern, 'url_patterns'):
+                if pattern.namespace != 'admin':
+                    walk(pattern.url_patterns, f'{namespace}{pattern.namespace}:' if pattern.namespace else namespace)
+                continue
+            if not pattern.name:
+                continue
+            actions = getattr(pattern.callback, 'actions', None)
+            if actions:
+                # DRF adds 'head' to a viewset's actions once it has served a GET; HEAD mirrors GET
+                methods = [m for m in actions if m in HTTP_METHODS]
+            else:
+                view_class = getattr(pattern.callback, 'cls', None) or getattr(pattern.callback, 'view_class', None)
+                methods = [m for m in HTTP_METHODS if hasattr(view_class, m)]
+            found.update((namespace + pattern.name, m) for m in methods)
+
+    walk(get_resolver().url_patterns)
+    return found
+
+
+def prepare_personas():
+    """
+    Pick/create the users and rows the routes operate on: a staff user, a seeded student with
+    enrollments, one of that student's subjects, an empty subject (for the delete path) and a
+    finished job.
+    """
+    staff, _ = User.objects.get_or_create(email=STAFF_EMAIL, defaults={'is_staff': True})
+    # get_or_create leaves the password empty, which has_usable_password() accepts
+    if not staff.password or not staff.has_usable_password():
+        staff.set_password(SEED_PASSWORD)
+        staff.save()
+    enrollment = Enrollment.objects.select_related('student', 'subject').order_by('id').first()
+    if enrollment is None:
+        raise ValueError('Seed the database (manage.py seed_data) before benchmarking.')
+    spare, _ = Subject.objects.get_or_create(name=SPARE_SUBJECT)
+    job = Job.objects.filter(created_by=staff, kind=Job.REBUILD_STATS).order_by('id').first()
+    if job is None:
+        job = Job.objects.create(created_by=staff, kind=Job.REBUILD_STATS, status=Job.SUCCEEDED)
+    return {
+        'staff': staff,
+        'student': enrollment.student,
+        'subject': enrollment.subject,
+        'enrollment': enrollment,
+        'spare_subject': spare,
+        'job': job,
+    }
+
+
+def benchmark_routes(p):
+    """Request specs (name, method, path, data) for every served route; `data` may be a factory."""
+    student, subject, enrollment, spare = p['student'], p['subject'], p['enrollment'], p['spare_subject']
+
+    def csv_upload():
+        return {'file': SimpleUploadedFile('users.csv', b'email,password\nbench-import@example.com,secret123\n')}
+
+    return [
+        ('root', 'get', '/', None),
+        ('api:api-root', 'get', '/api/', None),
+        ('api_token_auth', 'post', '/api-token-auth/', {'username': student.email, 'password': SEED_PASSWORD}),
+        ('metrics', 'get', '/api/_metrics', None),
+        ('sync', 'get', '/api/sync/', None),
+        ('api:job-list', 'get', '/api/jobs/', None),
+        ('api:job-list', 'post', '/api/jobs/', {'kind': 'export_gradebook', 'params': {'output': 'csv'}}),
+        ('api:job-detail', 'get', f"/api/jobs/{p['job'].id}/", None),
+        ('api:job-result', 'get', f"/api/jobs/{p['job'].id}/result/", None),
+        ('api:user-list', 'get', '/api/users/', None),
+        ('api:user-list', 'post', '/api/users/', {'email': 'bench-new@example.com', 'password': 'secret123'}),
+        ('api:user-import-csv', 'post', '/api/users/import/', csv_upload),
+        ('api:user-detail', 'get', f'/api/users/{student.id}/', None),
+        ('api:user-detail', 'put', f'/api/users/{student.id}/', {'email': student.email, 'password': 'secret123'}),
+        ('api:user-detail', 'patch', f'/api/users/{student.id}/', {'first_name': 'Bench'}),
+        ('api:user-detail', 'delete', f'/api/users/{student.id}/', None),
+        ('api:user-transcript', 'get', f'/api/users/{student.id}/transcript/', None),
+        ('api:user-transcript', 'get', '/api/users/me/transcript/', None),
+        ('api:subject-list', 'get', '/api/subjects/', None),
+        ('api:subject-list', 'post', '/api/subjects/', {'name': 'bench new subject'}),
+        ('api:subject-all-stats', 'get', '/api/subjects/stats/', None),
+        ('api:subject-detail', 'get', f'/api/subjects/{subject.id}/', None),
+        ('api:subject-detail', 'put', f'/api/subjects/{subject.id}/', {'name': subject.name}),
+        ('api:subject-detail', 'patch', f'/api/subjects/{subject.id}/', {'name': subject.name}),
+        ('api:subject-detail', 'delete', f'/api/subjects/{spare.id}/', None),
+        ('api:subject-stats', 'get', f'/api/subjects/{subject.id}/stats/', None),
+        ('api:subject-remove-students', 'delete', f'/api/subjects/{subject.id}/students/', {'students': [student.id]}),
+        ('api:subject-remove-student', 'delete', f'/api/subjects/{subject.id}/students/{student.id}/', None),
+        ('api:enrollment-list', 'get', '/api/enrollments/', None),
+        ('api:enrollment-list', 'post', '/api/enrollments/', {'subject': spare.id}),
+        ('api:enrollment-bulk', 'post', '/api/enrollments/bulk/', [{'student': student.id, 'subject': spare.id}]),
+        ('api:enrollment-bulk', 'patch', '/api/enrollments/bulk/', [{'id': enrollment.id, 'grade': 'A'}]),
+        ('api:enrollment-export', 'get', '/api/enrollments/export/', None),
+        ('api:enrollment-detail', 'get', f'/api/enrollments/{enrollment.id}/', None),
+        ('api:enrollment-detail', 'put', f'/api/enrollments/{enrollment.id}/',
+         {'student': student.id, 'subject': subject.id, 'grade': 'B'}),
+        ('api:enrollment-detail', 'patch', f'/api/enrollments/{enrollment.id}/', {'grade': 'B'}),
+        ('api:enrollment-detail', 'delete', f'/api/enrollments/{enrollment.id}/', None),
+    ]
+
+
+def _clients(p):
+    clients = {'anonymous': APIClient()}
+    for role in ('student', 'staff'):
+        token, _ = Token.objects.get_or_create(user=p[role])
+        clients[role] = APIClient()
+        clients[role].credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+    return clients
+
+
+def percentile(samples, pct):
+    # nearest-rank percentile
+    ordered = sorted(samples)
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+
+def measure(client, method, path, data, repeat):
+    """
+    Issue one warm-up request, then `repeat` timed ones. Each request runs in a transaction
+    that is rolled back, so writes do not change the data the next request sees.
+    Streaming responses are drained inside the timing window.
+    """
+    timings, queries, status_code = [], 0, None
+    for attempt in range(repeat + 1):
+        payload = data() if callable(data) else data
+        fmt = 'multipart' if callable(data) else 'json'
+        with transaction.atomic():
+            with CaptureQueriesContext(connection) as ctx:
+                start = time.perf_counter()
+                if payload is None:
+                    response = getattr(client, method)(path)
+                else:
+                    response = getattr(client, method)(path, payload, format=fmt)
+                if response.streaming:
+                    for _ in response.streaming_content:
+                        pass
+                elapsed = time.perf_counter() - start
+            transaction.set_rollback(True)
+        if attempt:
+            timings.append(elapsed * 1000)
+            queries, status_code = len(ctx.captured_queries), response.status_code
+    return {
+        'status': status_code,
+        'queries': queries,
+        'p50_ms': round(percentile(timings, 50), 3),
+        'p95_ms': round(percentile(timings, 95), 3),
+        'p99_ms': round(percentile(timings, 99), 3),
+    }
+
+
+def run_benchmarks(repeat=5):
+    """Measure every route as every role against the current database; keys are 'name METHOD role'."""
+    personas = prepare_personas()
+    clients = _clients(personas)
+    results = {}
+    for name, method, path, data in benchmark_routes(personas):
+        for role in ROLES:
+            results[f'{name} {method.upper()} {role}'] = measure(clients[role], method, path, data, repeat)
+    return results
+
+
+def check_query_scaling(small, large):
+    """Failures for every route whose query count changed when the data volume grew."""
+    return [
+        f"{key}: {small[key]['queries']} queries at the small volume, {large[key]['queries']} at the large one"
+        for key in sorted(small.keys() & large.keys())
+        if small[key]['queries'] != large[key]['queries']
+    ]
+
+
+def check_baseline(results, baseline, tolerance=1.5, slack_ms=5.0):
+    """
+    Failures for routes whose p95 exceeds the baseline p95 * tolerance (+ slack_ms, so that
+    sub-millisecond routes do not fail on timer noise) or whose query count went up.
+    """
+    failures = []
+    for key in sorted(results.keys() & baseline.keys()):
+        now, then = results[key], baseline[key]
+        if now['queries'] > then['queries']:
+            failures.append(f"{key}: {now['queries']} queries, baseline {then['queries']}")
+        if now['p95_ms'] > then['p95_ms'] * tolerance + slack_ms:
+            failures.append(f"{key}: p95 {now['p95_ms']:.1f}ms, baseline {then['p95_ms']:.1f}ms")
+    return failures
+
+
+def concurrent_read_routes(p):
+    """
+    (name, path, role) reads compared by run_concurrency_benchmark. Roles are picked so the
+    shared response cache does not answer them (students' subject payloads are per user).
+    """
+    student, subject, enrollment = p['student'], p['subject'], p['enrollment']
+    return [
+        ('api:subject-list', '/api/subjects/', 'student'),
+        ('api:subject-detail', f'/api/subjects/{subject.id}/', 'student'),
+        ('api:enrollment-list', '/api/enrollments/', 'staff'),
+        ('api:enrollment-detail', f'/api/enrollments/{enrollment.id}/', 'staff'),
+        ('api:user-list', '/api/users/', 'staff'),
+        ('api:user-detail', f'/api/users/{student.id}/', 'staff'),
+    ]
+
+
+def _wsgi_get(app, path, token):
+    path, _, query = path.partition('?')
+    environ = {
+        'REQUEST_METHOD': 'GET', 'PATH_INFO': path, 'QUERY_STRING': query, 'SCRIPT_NAME': '',
+        'SERVER_NAME': 'testserver', 'SERVER_PORT': '80', 'SERVER_PROTOCOL': 'HTTP/1.1',
+        'HTTP_HOST': 'testserver', 'HTTP_AUTHORIZATION': f'Token {token}',
+        'wsgi.version': (1, 0), 'wsgi.url_scheme': 'http', 'wsgi.input': io.BytesIO(), 'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True, 'wsgi.multiprocess': False, 'wsgi.run_once': False,
+    }
+    status = []
+    body = app(environ, lambda line, headers, exc_info=None: status.append(line))
+    try:
+        for _ in body:
+            pass
+    finally:
+        body.close()
+    return int(status[0].split()[0])
+
+
+async def _asgi_get(app, path, token):
+    path, _, query = path.partition('?')
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET',
+        'scheme': 'http', 'path': path, 'raw_path': path.encode(), 'query_string': query.encode(),
+        'root_path': '', 'headers': [(b'host', b'testserver'), (b'authorization', f'Token {token}'.encode())],
+        'client': ('127.0.0.1', 0), 'server': ('testserver', 80),
+    }
+    status = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            status.append(message['status'])
+
+    await app(scope, receive, send)
+    return status[0]
+
+
+def _shares(total, clients):
+    return [n for n in (total // clients + (i < total % clients) for i in range(clients)) if n]
+
+
+def _load_summary(samples, elapsed):
+    timings = [seconds * 1000 for seconds, _ in samples]
+    return {
+        'requests': len(samples),
+        'non_200': sum(1 for _, status_code in samples if status_code != 200),
+        'rps': round(len(samples) / elapsed, 1),
+        'p50_ms': round(percentile(timings, 50), 3),
+        'p95_ms': round(percentile(timings, 95), 3),
+    }
+
+
+def _wsgi_load(app, path, token, concurrency, requests):
+    # a threaded WSGI server: one thread per client
+    def client(n):
+        samples = []
+        try:
+            for _ in range(n):
+                start = time.perf_counter()
+                status_code = _wsgi_get(app, path, token)
+                samples.append((time.perf_counter() - start, status_code))
+        finally:
+            connections.close_all()
+        return samples
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        samples = [sample for chunk in pool.map(client, _shares(requests, concurrency)) for sample in chunk]
+    return _load_summary(samples, time.perf_counter() - start)
+
+
+def _asgi_load(app, path, token, concurrency, requests):
+    # an ASGI server such as uvicorn: one task per client on a single event loop
+    async def client(n):
+        samples = []
+        for _ in range(n):
+            start = time.perf_counter()
+            status_code = await _asgi_get(app, path, token)
+            samples.append((time.perf_counter() - start, status_code))
+        return samples
+
+    async def main():
+        start = time.perf_counter()
+        chunks = await asyncio.gather(*(client(n) for n in _shares(requests, concurrency)))
+        return [sample for chunk in chunks for sample in chunk], time.perf_counter() - start
+
+    return _load_summary(*asyncio.run(main()))
+
+
+def run_concurrency_benchmark(concurrency=32, requests=320):
+    """
+    Throughput and latency of the list/detail reads with `concurrency` clients sharing
+    `requests` GETs per route, served by the sync views through the WSGI handler and by the
+    async views (grades.async_views) through the ASGI handler. Keys are 'name wsgi|asgi'.
+    """
+    personas = prepare_personas()
+    tokens = {role: Token.objects.get_or_create(user=personas[role])[0].key for role in ('student', 'staff')}
+    results = {}
+    for mode, async_reads in (('wsgi', False), ('asgi', True)):
+        with override_settings(ROOT_URLCONF=read_urlconf(async_reads)):
+            app = get_asgi_application() if async_reads else get_wsgi_application()
+            load = _asgi_load if async_reads else _wsgi_load
+            for name, path, role in concurrent_read_routes(personas):
+                results[f'{name} {mode}'] = load(app, path, tokens[role], concurrency, requests)
+    return results
+
+
+def run_serialization_benchmark(repeat=5):
+    """
+    Time listing every enrollment and every user in one response body: ModelSerializer over
+    model instances rendered by DRF's JSONRenderer (the old list path) versus
+    FastListSerializer over `.values()` rows rendered by ORJSONRenderer. Timings include the
+    query; 'identical' reports whether both produced the same bytes.
+    """
+    cases = {
+        'enrollments': (EnrollmentSerializer, Enrollment.objects.select_related('student', 'subject').order_by('updated_at', 'id')),
+        'users': (UserSerializer, User.objects.order_by('id')),
+    }
+    results = {}
+    for name, (serializer_class, queryset) in cases.items():
+        columns = [column for _, column, _ in values_plan(serializer_class)]
+
+        def serializer_path():
+            return JSONRenderer().render(serializer_class(list(queryset.all()), many=True).data)
+
+        def fast_path():
+            return ORJSONRenderer().render(FastListSerializer(serializer_class, list(queryset.values(*columns))).data)
+
+        timings = {}
+        for label, build in (('serializer', serializer_path), ('fast', fast_path)):
+            samples = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                body = build()
+                samples.append((time.perf_counter() - start) * 1000)
+            timings[label] = (percentile(samples, 50), body)
+        results[name] = {
+            'rows': queryset.count(),
+            'bytes': len(timings['fast'][1]),
+            'serializer_ms': round(timings['serializer'][0], 3),
+            'fast_ms': round(timings['fast'][0], 3),
+            'speedup': round(timings['serializer'][0] / timings['fast'][0], 2),
+            'identical': timings['serializer'][1] == timings['fast'][1],
+        }
+    return results
+
+
+def archive_routes(p):
+    """
+    Requests on the hot enrollment paths, as (label, role, method, path, data): the student
+    scoping of the enrollment list, the duplicate check of enrolling, the subject deletion
+    guard, the staff list and the transcript (which reads both tables).
+    """
+    spare = p['spare_subject']
+    return [
+        ('enrollments:list', 'student', 'get', '/api/enrollments/', None),
+        ('enrollments:create', 'student', 'post', '/api/enrollments/', {'subject': spare.id}),
+        ('subjects:delete', 'staff', 'delete', f'/api/subjects/{spare.id}/', None),
+        ('enrollments:list', 'staff', 'get', '/api/enrollments/', None),
+        ('users:transcript', 'student', 'get', '/api/users/me/transcript/', None),
+    ]
+
+
+def run_archive_benchmark(archive_share=0.9, repeat=5):
+    """
+    Measure archive_routes() before and after term archival (grades.archive): the oldest
+    `archive_share` of the enrollments are back-dated into a closed term, which is archived
+    between the two measurements. Returns {'rows': {...}, 'routes': {'label role': {'before':
+    measure(), 'after': measure()}}}.
+    """
+    personas = prepare_personas()
+    clients = _clients(personas)
+    today = timezone.localdate()
+    term, _ = Term.objects.get_or_create(
+        name=ARCHIVE_TERM, defaults={'starts_on': today - timedelta(days=365), 'ends_on': today - timedelta(days=200)})
+    ids = list(Enrollment.objects.order_by('id').values_list('id', flat=True))
+    cutoff = ids[min(len(ids) - 1, int(len(ids) * archive_share))]
+    start, _ = term_bounds(term)
+    Enrollment.objects.filter(id__lt=cutoff).update(created_at=start)
+
+    routes = archive_routes(personas)
+    results = {f'{label} {role}': {'before': measure(clients[role], method, path, data, repeat)}
+               for label, role, method, path, data in routes}
+    archived = archive_term(term)
+    for label, role, method, path, data in routes:
+        results[f'{label} {role}']['after'] = measure(clients[role], method, path, data, repeat)
+    return {
+        'rows': {'before': len(ids), 'after': Enrollment.objects.count(), 'archived': archived},
+        'routes': results,
+    }
+
+
+def load_baseline(path):
+    with open(path) as fh:
+        return json.load(fh)
+
+
+def save_results(path, results):
+    with open(path, 'w') as fh:
+        json.dump(results, fh, indent=2, sort_keys=True)
+        fh.write('\n')
@@ -0,0 +1,24 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+
+# backends whose entries are only seen by the process that wrote them
+PROCESS_LOCAL_BACKENDS = (LocMemCache, DummyCache)
+
+
+def invalidated_cache(alias, timeout):
+    """
+    (cache, timeout) for entries that grades.signals drops when the database changes (tokens,
+    roles).
+
+    A signal only reaches the process that made the write. In a cache shared by every process
+    (Redis, Memcached) that is enough and entries keep `timeout`; in a per-process one
+    (LocMemCache, the default) the other workers would keep a stale entry, so it lives at most
+    settings.GRADES_LOCAL_CACHE_TTL seconds there.
+    """
+    cache = caches[alias]
+    if isinstance(cache, PROCESS_LOCAL_BACKENDS):
+        timeout = min(timeout, getattr(settings, 'GRADES_LOCAL_CACHE_TTL', 5))
+    return cache, timeout
+
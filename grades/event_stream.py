@@ -0,0 +1,154 @@
+import asyncio
+import json
+from urllib.parse import parse_qs
+
+from django.conf import settings
+from rest_framework import exceptions
+
+from .authentication import CachedTokenAuthentication
+from .events import CLOSED, OVERFLOW, get_broker, hub
+from .roles import aaccess_for
+
+EVENTS_PATH = '/api/events/enrollments/'
+
+
+def _format(event):
+    # one Server-Sent Events message; the event type doubles as the SSE event name
+    return f"event: {event['type']}\ndata: {json.dumps(event, separators=(',', ':'))}\n\n".encode()
+
+
+class EnrollmentEventStream:
+    """
+    ASGI app streaming Enrollment create / grade-update / delete events as Server-Sent Events
+    (GET /api/events/enrollments/, `Authorization: Token <key>`).
+
+    - Students receive their own enrollments' events, staff and Teachers everyone's;
+      ?subject=<id> narrows either to one subject (the scoping of EnrollmentViewSet.get_queryset).
+    - Runs in front of Django (see with_event_stream) so an open stream holds no thread or
+      database connection: after authentication it only waits on its Subscription
+      (grades.events). Disconnects are noticed as soon as the server reports them.
+    - A comment line is sent every settings.GRADES_EVENTS_HEARTBEAT_SECONDS to keep proxies
+      from closing idle streams; streams end after GRADES_EVENTS_MAX_SECONDS and clients
+      reconnect (EventSource does so by itself after the advertised `retry`).
+    - A listener more than GRADES_EVENTS_QUEUE_SIZE events behind gets an `overflow` event
+      and the stream ends; it should resync through /api/sync/ and reconnect.
+    - Beyond GRADES_EVENTS_MAX_CONNECTIONS open streams per process, new ones get 503.
+    """
+
+    retry_ms = 5000
+
+    async def __call__(self, scope, receive, send):
+        headers = {name.decode('latin-1').lower(): value.decode('latin-1') for name, value in scope['headers']}
+        cors = self._cors_headers(headers.get('origin'))
+        if scope['method'] == 'OPTIONS':
+            return await self._respond(send, 204, None, cors + [
+                (b'access-control-allow-methods', b'GET, OPTIONS'),
+                (b'access-control-allow-headers', b'authorization'),
+                (b'access-control-max-age', b'86400'),
+            ])
+        if scope['method'] != 'GET':
+            return await self._respond(send, 405, {'detail': f"Method \"{scope['method']}\" not allowed."},
+                                       cors + [(b'allow', b'GET, OPTIONS')])
+
+        try:
+            user = await self._authenticate(headers.get('authorization', ''))
+        except (exceptions.NotAuthenticated, exceptions.AuthenticationFailed) as exc:
+            return await self._respond(send, 401, {'detail': str(exc.detail)},
+                                       cors + [(b'www-authenticate', b'Token')])
+
+        query = parse_qs(scope.get('query_string', b'').decode('latin-1'))
+        subject = query.get('subject', [''])[-1].strip() or None
+        if subject is not None:
+            if not subject.isdigit():
+                return await self._respond(send, 400, {'subject': ['A valid integer is required.']}, cors)
+            subject = int(subject)
+
+        sees_all = (await aaccess_for(user)).can('grades.view_enrollment')
+        get_broker().start()
+        subscription = hub.subscribe(
+            student=None if sees_all else user.pk,
+            subject=subject,
+            queue_size=getattr(settings, 'GRADES_EVENTS_QUEUE_SIZE', 100),
+            limit=getattr(settings, 'GRADES_EVENTS_MAX_CONNECTIONS', 10000),
+        )
+        if subscription is None:
+            return await self._respond(send, 503, {'detail': 'Too many open event streams; retry later.'},
+                                       cors + [(b'retry-after', b'30')])
+        watcher = asyncio.ensure_future(self._watch_disconnect(receive, subscription))
+        try:
+            await self._stream(send, subscription, cors)
+        finally:
+            watcher.cancel()
+            subscription.close()
+
+    async def _stream(self, send, subscription, cors):
+        await send({'type': 'http.response.start', 'status': 200, 'headers': cors + [
+            (b'content-type', b'text/event-stream; charset=utf-8'),
+            (b'cache-control', b'no-cache'),
+            (b'x-accel-buffering', b'no'),  # nginx: pass events through unbuffered
+        ]})
+        await send({'type': 'http.response.body', 'body': f'retry: {self.retry_ms}\n\n'.encode(), 'more_body': True})
+        loop = asyncio.get_running_loop()
+        heartbeat = getattr(settings, 'GRADES_EVENTS_HEARTBEAT_SECONDS', 15)
+        deadline = loop.time() + getattr(settings, 'GRADES_EVENTS_MAX_SECONDS', 3600)
+        while (remaining := deadline - loop.time()) > 0:
+            event = await subscription.get(min(heartbeat, remaining))
+            if event is None:
+                body = b': ping\n\n'
+            elif event['type'] == CLOSED:
+                return
+            else:
+                body = _format(event)
+                # several events waiting: send them in one write
+                while event['type'] != OVERFLOW and not subscription.queue.empty():
+                    event = subscription.queue.get_nowait()
+                    if event['type'] == CLOSED:
+                        break
+                    body += _format(event)
+            # send() waits while the client is not reading; events meanwhile queue up to the limit
+            await send({'type': 'http.response.body', 'body': body, 'more_body': True})
+            if event is not None and event['type'] in (OVERFLOW, CLOSED):
+                break
+        await send({'type': 'http.response.body', 'body': b'', 'more_body': False})
+
+    @staticmethod
+    async def _watch_disconnect(receive, subscription):
+        while (await receive())['type'] != 'http.disconnect':
+            pass
+        subscription.disconnect()
+
+    @staticmethod
+    async def _authenticate(authorization):
+        # the Authorization header rules of TokenAuthentication; cached tokens resolve on the loop
+        auth = authorization.split()
+        if not auth or auth[0].lower() != CachedTokenAuthentication.keyword.lower():
+            raise exceptions.NotAuthenticated()
+        if len(auth) != 2:
+            raise exceptions.AuthenticationFailed('Invalid token header.')
+        user, _ = await CachedTokenAuthentication().aauthenticate_credentials(auth[1])
+        return user
+
+    @staticmethod
+    def _cors_headers(origin):
+        if origin and origin in getattr(settings, 'CORS_ALLOWED_ORIGINS', ()):
+            return [(b'access-control-allow-origin', origin.encode('latin-1')), (b'vary', b'Origin')]
+        return []
+
+    @staticmethod
+    async def _respond(send, status, data, headers):
+        body = b'' if data is None else json.dumps(data).encode()
+        content_type = [(b'content-type', b'application/json')] if data is not None else []
+        await send({'type': 'http.response.start', 'status': status, 'headers': headers + content_type})
+        await send({'type': 'http.response.body', 'body': body})
+
+
+def with_event_stream(application):
+    """`application` (Django's ASGI app) with EVENTS_PATH served by EnrollmentEventStream."""
+    stream = EnrollmentEventStream()
+
+    async def app(scope, receive, send):
+        if scope['type'] == 'http' and scope['path'] == EVENTS_PATH:
+            return await stream(scope, receive, send)
+        return await application(scope, receive, send)
+
+    return app
@@ -0,0 +1,223 @@
+import asyncio
+import json
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+# event types pushed by the live enrollment feed (grades.event_stream)
+CREATED = 'enrollment.created'
+GRADED = 'enrollment.graded'
+DELETED = 'enrollment.deleted'
+# queued after the last event a lagging subscriber still receives; the stream then ends
+OVERFLOW = 'overflow'
+# queued when the subscriber's connection went away
+CLOSED = 'closed'
+
+
+def enrollment_event(kind, enrollment):
+    """JSON-ready event for an Enrollment; values are rendered as EnrollmentSerializer does."""
+    return {
+        'type': kind,
+        'id': enrollment.pk,
+        'student': enrollment.student_id,
+        'subject': enrollment.subject_id,
+        'grade': enrollment.grade,
+        'grade_points': None if enrollment.grade_points is None else str(enrollment.grade_points),
+        'updated_at': enrollment.updated_at.isoformat().replace('+00:00', 'Z') if enrollment.updated_at else None,
+    }
+
+
+def publish(events):
+    """Hand `events` to the broker once the current transaction commits (never for a rollback)."""
+    events = list(events)
+    if events:
+        transaction.on_commit(lambda: get_broker().publish(events))
+
+
+# --- In-process fan-out ---
+class Subscription:
+    """
+    One listener's bounded queue of events, consumed on the event loop that subscribed.
+
+    - Only events of `student` (None: every student) and `subject` (None: every subject) are queued.
+    - Backpressure: when `queue_size` events are waiting the listener is too slow to keep up;
+      the backlog is dropped and OVERFLOW queued, so it can resync (/api/sync/) instead of
+      holding an ever-growing buffer.
+    """
+
+    def __init__(self, hub, loop, student=None, subject=None, queue_size=100):
+        self.hub = hub
+        self.loop = loop
+        self.student = student
+        self.subject = subject
+        self.queue = asyncio.Queue(maxsize=queue_size + 1)  # + room for OVERFLOW / CLOSED
+        self.queue_size = queue_size
+        self.overflowed = False
+
+    def offer(self, event):
+        # event loop thread only
+        if self.overflowed or (self.subject is not None and event['subject'] != self.subject):
+            return
+        if self.queue.qsize() >= self.queue_size:
+            self.overflowed = True
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait({'type': OVERFLOW})
+            return
+        self.queue.put_nowait(event)
+
+    def disconnect(self):
+        # event loop thread only: wake the consumer so it can stop
+        self.overflowed = True
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait({'type': CLOSED})
+
+    async def get(self, timeout):
+        """The next event, or None when nothing arrived within `timeout` seconds."""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self):
+        self.hub.unsubscribe(self)
+
+
+class EventHub:
+    """
+    Fans published events out to this process's subscriptions.
+
+    - Subscriptions are indexed by student, so an event only visits its own student's
+      listeners plus the unscoped (staff) ones.
+    - dispatch() may be called from any thread; delivery is batched into one callback per
+      event loop.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._by_student = defaultdict(set)
+        self.count = 0
+
+    def subscribe(self, student=None, subject=None, queue_size=100, limit=None):
+        """A Subscription on the running loop, or None when `limit` subscriptions are open."""
+        subscription = Subscription(self, asyncio.get_running_loop(), student, subject, queue_size)
+        with self._lock:
+            if limit is not None and self.count >= limit:
+                return None
+            self._by_student[student].add(subscription)
+            self.count += 1
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            listeners = self._by_student.get(subscription.student)
+            if listeners is not None and subscription in listeners:
+                listeners.discard(subscription)
+                self.count -= 1
+                if not listeners:
+                    del self._by_student[subscription.student]
+
+    def dispatch(self, events):
+        by_loop = defaultdict(list)
+        with self._lock:
+            for event in events:
+                for subscription in (*self._by_student.get(event['student'], ()), *self._by_student.get(None, ())):
+                    by_loop[subscription.loop].append((subscription, event))
+        try:
+            current = asyncio.get_running_loop()
+        except RuntimeError:
+            current = None
+        for loop, deliveries in by_loop.items():
+            if loop is current:
+                _deliver(deliveries)
+            elif not loop.is_closed():
+                loop.call_soon_threadsafe(_deliver, deliveries)
+
+
+def _deliver(deliveries):
+    for subscription, event in deliveries:
+        subscription.offer(event)
+
+
+hub = EventHub()
+
+
+# --- Brokers ---
+class LocalBroker:
+    """
+    Single-process broker: published events go straight to this process's hub. The default,
+    and the stand-in used by the tests; with several worker processes use RedisBroker.
+    """
+
+    def __init__(self, hub):
+        self.hub = hub
+
+    def start(self):
+        pass
+
+    def publish(self, events):
+        self.hub.dispatch(events)
+
+
+class RedisBroker:
+    """
+    Shares events between worker processes over a Redis pub/sub channel (needs the `redis`
+    package; settings.GRADES_EVENTS_REDIS_URL).
+
+    - publish() sends each batch to the channel as JSON.
+    - start() runs one listener thread per process, which dispatches every batch on the
+      channel (this process's included) to the local hub. After a connection error it
+      reconnects; events published meanwhile are lost, which clients repair with /api/sync/.
+    """
+    channel = 'grades:enrollment-events'
+
+    def __init__(self, hub):
+        try:
+            import redis
+        except ImportError as exc:
+            raise ImproperlyConfigured('grades.events.RedisBroker requires the redis package.') from exc
+        self.hub = hub
+        self.redis = redis
+        self.client = redis.Redis.from_url(getattr(settings, 'GRADES_EVENTS_REDIS_URL', 'redis://localhost:6379/0'))
+        self._lock = threading.Lock()
+        self._listener = None
+
+    def start(self):
+        with self._lock:
+            if self._listener is None:
+                self._listener = threading.Thread(target=self._listen, name='grades-events', daemon=True)
+                self._listener.start()
+
+    def publish(self, events):
+        self.client.publish(self.channel, json.dumps(events))
+
+    def _listen(self):
+        while True:
+            try:
+                pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.channel)
+                for message in pubsub.listen():
+                    self.hub.dispatch(json.loads(message['data']))
+            except self.redis.RedisError:
+                time.sleep(1)
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    """The process-wide broker named by settings.GRADES_EVENTS_BROKER, built on first use."""
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                broker_class = import_string(getattr(settings, 'GRADES_EVENTS_BROKER', 'grades.events.LocalBroker'))
+                _broker = broker_class(hub)
+    return _broker
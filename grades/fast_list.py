@@ -0,0 +1,125 @@
+from datetime import timezone as dt_timezone
+from functools import lru_cache
+
+from django.conf import settings
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
+
+# fields whose to_representation returns model column values unchanged
+_PASSTHROUGH_FIELDS = (serializers.CharField, serializers.IntegerField, serializers.BooleanField)
+# fields that render the column value through to_representation (e.g. datetimes to ISO 8601)
+_CONVERTED_FIELDS = (serializers.DateTimeField, serializers.DateField, serializers.DecimalField,
+                     serializers.FloatField, serializers.UUIDField)
+
+
+@lru_cache(maxsize=None)
+def values_plan(serializer_class):
+    """
+    How to build serializer_class's output from a `.values()` row: a tuple of
+    (field name, column, field to convert through or None), in field order. None when some
+    readable field is not a plain model column (method fields, nested serializers, dotted
+    sources, pk_field).
+    """
+    plan = []
+    for name, field in serializer_class().fields.items():
+        if field.write_only:
+            continue
+        if len(field.source_attrs) != 1:
+            return None
+        column = field.source_attrs[0]
+        if isinstance(field, serializers.PrimaryKeyRelatedField) and field.pk_field is None:
+            # `.values('student')` yields the related id, which is what the field renders
+            plan.append((name, column, None))
+        elif isinstance(field, _CONVERTED_FIELDS):
+            plan.append((name, column, field))
+        elif isinstance(field, _PASSTHROUGH_FIELDS):
+            plan.append((name, column, None))
+        else:
+            return None
+    return tuple(plan)
+
+
+def _utc_isoformat(value, fallback):
+    # DateTimeField.to_representation for an aware UTC value rendered in UTC as ISO 8601
+    if value.tzinfo is not dt_timezone.utc:
+        return fallback(value)
+    text = value.isoformat()
+    return text[:-6] + 'Z' if text.endswith('+00:00') else text
+
+
+def converter(field):
+    """field.to_representation, or a shortcut for datetimes rendered as ISO 8601 in UTC."""
+    if field is None:
+        return None
+    if isinstance(field, serializers.DateTimeField):
+        output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+        tz = field.timezone if hasattr(field, 'timezone') else field.default_timezone()
+        if (isinstance(output_format, str) and output_format.lower() == ISO_8601
+                and (tz is dt_timezone.utc or getattr(tz, 'key', None) == 'UTC')):
+            fallback = field.to_representation
+            return lambda value: _utc_isoformat(value, fallback)
+    return field.to_representation
+
+
+class FastListSerializer:
+    """
+    Read-only stand-in for `serializer_class(rows, many=True)` over `.values()` rows.
+
+    - .data is a list of plain dicts with the keys, order and representations the
+      ModelSerializer produces, without instantiating models or running per-field
+      get_attribute() (see values_plan()).
+    - Only used for list actions, through ValuesListMixin.
+    """
+
+    def __init__(self, serializer_class, rows, plan=None):
+        self.plan = plan if plan is not None else values_plan(serializer_class)
+        self.rows = rows
+
+    @property
+    def data(self):
+        # converters depend on the active timezone, so they are resolved per response
+        plan = [(name, column, converter(field)) for name, column, field in self.plan]
+        return [
+            {name: row[column] if convert is None or row[column] is None else convert(row[column])
+             for name, column, convert in plan}
+            for row in self.rows
+        ]
+
+
+class ValuesListMixin:
+    """
+    List actions read `.values()` rows and serialise them with FastListSerializer when the
+    viewset's serializer only has plain column fields; other actions are untouched.
+    The cursor paginators read their ordering column from the row dicts.
+    With grades.fieldsets.FieldsetViewMixin only the requested columns are selected, and
+    `?expand=` requests go through the ModelSerializer.
+    Set settings.GRADES_FAST_LIST = False to serialise lists with the ModelSerializer.
+    """
+
+    def _values_plan(self):
+        if self.action != 'list' or not getattr(settings, 'GRADES_FAST_LIST', True):
+            return None
+        plan = values_plan(self.get_serializer_class())
+        fieldset = self.get_fieldset() if hasattr(self, 'get_fieldset') else None
+        if plan is None or fieldset is None:
+            return plan
+        if fieldset.expand:
+            return None
+        return tuple(entry for entry in plan if fieldset.includes(entry[0]))
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        plan = self._values_plan()
+        if plan is None:
+            return queryset
+        columns = [column for _, column, _ in plan]
+        # the cursor paginator reads its position from the ordering columns of each row
+        ordering = getattr(self.paginator, 'ordering', ()) or ()
+        columns += [field.lstrip('-') for field in ordering if field.lstrip('-') not in columns]
+        return queryset.values(*columns)
+
+    def get_serializer(self, *args, **kwargs):
+        plan = self._values_plan()
+        if plan is None or not kwargs.get('many'):
+            return super().get_serializer(*args, **kwargs)
+        return FastListSerializer(self.get_serializer_class(), args[0], plan=plan)
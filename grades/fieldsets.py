@@ -0,0 +1,158 @@
+from functools import lru_cache
+
+from rest_framework.exceptions import ValidationError
+
+# query parameters, in the order their errors are reported
+FIELDSET_PARAMS = ('fields', 'omit', 'expand')
+
+
+def _names(query_params, param):
+    # `?fields=id,name` and `?fields=id&fields=name` are equivalent
+    values = query_params.getlist(param)
+    if not values:
+        return None
+    return frozenset(name.strip() for value in values for name in value.split(',') if name.strip())
+
+
+@lru_cache(maxsize=None)
+def _readable_fields(serializer_class):
+    return frozenset(name for name, field in serializer_class().fields.items() if not field.write_only)
+
+
+def _top_level(names):
+    return {name.split('.', 1)[0] for name in names}
+
+
+class Fieldset:
+    """
+    The serializer fields a read renders, from the ?fields=, ?omit= and ?expand= query parameters.
+
+    - fields: allow-list of field names (None renders every default field).
+    - omit: field names to leave out.
+    - expand: fields rendered through the serializer's `expandable_fields` (e.g. a nested
+      student instead of its id); expanded fields are rendered even when not listed in fields.
+    - Dotted names (`enrollments.student`) apply to the serializer's `nested_serializers`.
+    """
+
+    def __init__(self, fields=None, omit=frozenset(), expand=frozenset()):
+        self.fields = fields
+        self.omit = omit
+        self.expand = expand
+
+    @classmethod
+    def from_request(cls, request):
+        params = request.query_params
+        return cls(_names(params, 'fields'), _names(params, 'omit') or frozenset(),
+                   _names(params, 'expand') or frozenset())
+
+    def includes(self, name):
+        if name in self.omit:
+            return False
+        return self.fields is None or name in _top_level(self.fields) or name in self.expand
+
+    def expands(self, name):
+        return name in self.expand
+
+    def nested(self, name):
+        """The Fieldset for the serializer nested under `name`."""
+        prefix = name + '.'
+
+        def strip(names):
+            return frozenset(n[len(prefix):] for n in names if n.startswith(prefix))
+
+        # `?fields=enrollments` alone keeps every nested field
+        fields = strip(self.fields) if self.fields is not None else None
+        return Fieldset(fields or None, strip(self.omit), strip(self.expand))
+
+    def validate(self, serializer_class):
+        """Raise ValidationError (400) for names serializer_class cannot render or expand."""
+        readable = _readable_fields(serializer_class)
+        expandable = getattr(serializer_class, 'expandable_fields', {})
+        nested = getattr(serializer_class, 'nested_serializers', {})
+        errors = {}
+        for param in FIELDSET_PARAMS:
+            names = getattr(self, param) or ()
+            for name in sorted(names):
+                top, dotted, _ = name.partition('.')
+                if dotted:
+                    known = top in nested
+                elif param == 'expand':
+                    known = top in expandable
+                else:
+                    known = top in readable
+                if not known:
+                    errors.setdefault(param, []).append(f"Unknown field '{name}'.")
+        if errors:
+            raise ValidationError(errors)
+        for name, nested_class in nested.items():
+            self.nested(name).validate(nested_class)
+
+
+class FieldsetSerializerMixin:
+    """
+    Serializer side of sparse fieldsets: with a Fieldset in context['fieldset'] the serializer
+    drops the fields it does not include and swaps in `expandable_fields` for expanded ones, so
+    skipped fields (and their SerializerMethodField lookups) never run.
+
+    - expandable_fields: {name: serializer class} rendered for `?expand=name`.
+    - nested_serializers: {name: serializer class} rendered under `name`, which dotted names
+      (`?omit=name.field`) are validated against; pass fieldset.nested(name) down to it.
+    """
+    expandable_fields = {}
+    nested_serializers = {}
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        fieldset = self.context.get('fieldset')
+        if fieldset is None:
+            return
+        for name in list(self.fields):
+            if not fieldset.includes(name):
+                self.fields.pop(name)
+            elif fieldset.expands(name):
+                self.fields[name] = self.expandable_fields[name](read_only=True)
+
+
+class FieldsetViewMixin:
+    """
+    Viewset side of sparse fieldsets for list / retrieve.
+
+    - get_fieldset(): the validated Fieldset of the request (None for other actions), also
+      handed to the serializer through the context.
+    - renders(name): whether the response includes field `name`; get_queryset() implementations
+      use it to skip the prefetches / joins of fields that are not rendered.
+    - Reads drop the queryset's select_related() joins except those of expanded fields
+      (expandable field names are relation names); other actions keep them.
+    """
+    fieldset_actions = ('list', 'retrieve')
+
+    def get_fieldset(self):
+        if self.action not in self.fieldset_actions:
+            return None
+        if not hasattr(self, '_fieldset'):
+            fieldset = Fieldset.from_request(self.request)
+            fieldset.validate(self.get_serializer_class())
+            self._fieldset = fieldset
+        return self._fieldset
+
+    def renders(self, name):
+        fieldset = self.get_fieldset()
+        return fieldset is None or fieldset.includes(name)
+
+    def expands(self, name):
+        fieldset = self.get_fieldset()
+        return fieldset is not None and fieldset.expands(name)
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        fieldset = self.get_fieldset()
+        if fieldset is None:
+            return queryset
+        related = sorted(fieldset.expand)
+        queryset = queryset.select_related(None)
+        return queryset.select_related(*related) if related else queryset
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['fieldset'] = self.get_fieldset()
+        return context
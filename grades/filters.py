@@ -0,0 +1,188 @@
+import operator
+import re
+import string
+from functools import reduce
+
+from django.db import connections
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Lower, Trim
+from rest_framework import serializers
+from rest_framework.filters import BaseFilterBackend
+
+from .models import GRADED, STAFF, STUDENT, UNGRADED
+
+
+class ParamsFilterBackend(BaseFilterBackend):
+    """
+    List filter driven by query parameters declared as a serializer (`params_class`).
+
+    - Only list actions are filtered; blank parameters are ignored.
+    - Invalid values are answered with 400 and the usual {param: [errors]} body.
+    - Subclasses implement filter_params(queryset, params) with the validated values. Every
+      filter is backed by an index (see the model Meta.indexes and migration 0009).
+    """
+    params_class = None
+
+    def filter_queryset(self, request, queryset, view):
+        if getattr(view, 'action', None) != 'list':
+            return queryset
+        fields = self.params_class().fields
+        data = {name: value for name, value in request.query_params.items() if name in fields and value.strip()}
+        if not data:
+            return queryset
+        params = self.params_class(data=data)
+        params.is_valid(raise_exception=True)
+        return self.filter_params(queryset, params.validated_data)
+
+    def filter_params(self, queryset, params):
+        raise NotImplementedError
+
+
+def _vendor(queryset):
+    return connections[queryset.db].vendor
+
+
+# SQLite's LOWER() folds ASCII letters only
+_ASCII_LOWER = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+
+
+def prefix_filter(queryset, column, prefix):
+    """Rows whose lower-cased `column` starts with `prefix` (case-insensitive), using an index."""
+    alias = f'{column}_lower'
+    queryset = queryset.alias(**{alias: Lower(column)})
+    if _vendor(queryset) == 'postgresql':
+        # LIKE 'prefix%' is served by the text_pattern_ops expression index
+        return queryset.filter(**{f'{alias}__startswith': prefix.lower()})
+    # SQLite only uses an index for LIKE on a plain column, so the prefix becomes a range on the
+    # lower(column) expression index (byte order, exact for prefixes). LOWER() leaves non-ASCII
+    # letters as they are, so the prefix is folded the same way; its non-ASCII letters are tried
+    # lower-case, upper-case and capitalized ("é", "É", "Émile"), one range each.
+    variants = (prefix, prefix.lower(), prefix.upper(), prefix.capitalize())
+    ranges = [
+        Q(**{f'{alias}__gte': low, f'{alias}__lt': low[:-1] + chr(ord(low[-1]) + 1)})
+        for low in dict.fromkeys(variant.translate(_ASCII_LOWER) for variant in variants)
+    ]
+    return queryset.filter(reduce(operator.or_, ranges))
+
+
+# --- Enrollments ---
+class EnrollmentFilterParams(serializers.Serializer):
+    subject = serializers.IntegerField(required=False)
+    student = serializers.IntegerField(required=False)
+    graded = serializers.BooleanField(required=False)
+    # exact grade text, surrounding whitespace ignored (as in SubjectStats.grade_distribution)
+    grade = serializers.CharField(required=False, max_length=10)
+
+
+class EnrollmentFilter(ParamsFilterBackend):
+    """?subject=<id>&student=<id>&graded=true|false&grade=<text>"""
+    params_class = EnrollmentFilterParams
+
+    def filter_params(self, queryset, params):
+        if 'subject' in params:
+            queryset = queryset.filter(subject_id=params['subject'])
+        if 'student' in params:
+            queryset = queryset.filter(student_id=params['student'])
+        if 'graded' in params:
+            queryset = queryset.filter(GRADED if params['graded'] else UNGRADED)
+        if 'grade' in params:
+            queryset = queryset.alias(grade_trimmed=Trim('grade')).filter(grade_trimmed=params['grade'])
+        return queryset
+
+
+# --- Users ---
+class UserFilterParams(serializers.Serializer):
+    email = serializers.CharField(required=False)
+    name = serializers.CharField(required=False)
+    role = serializers.ChoiceField(choices=('student', 'staff'), required=False)
+
+
+class UserFilter(ParamsFilterBackend):
+    """?email=<prefix>&name=<first or last name prefix>&role=student|staff (case-insensitive prefixes)"""
+    params_class = UserFilterParams
+
+    def filter_params(self, queryset, params):
+        if 'email' in params:
+            queryset = prefix_filter(queryset, 'email', params['email'])
+        if 'name' in params:
+            # either name may match: union of the two prefix lookups, each on its own index
+            first = prefix_filter(queryset, 'first_name', params['name'])
+            last = prefix_filter(queryset, 'last_name', params['name'])
+            queryset = queryset.filter(Q(pk__in=first.values('pk')) | Q(pk__in=last.values('pk')))
+        if 'role' in params:
+            queryset = queryset.filter(STUDENT if params['role'] == 'student' else STAFF)
+        return queryset
+
+
+# --- Subjects ---
+class SubjectSearchParams(serializers.Serializer):
+    search = serializers.CharField(required=False, max_length=200)
+
+
+def _search_terms(text):
+    return re.findall(r'\w+', text)
+
+
+class SubjectSearchFilter(ParamsFilterBackend):
+    """
+    ?search=<words>: subjects whose name contains every word.
+
+    - SQLite: FTS5 match on word prefixes (`alg` finds "Linear Algebra"), diacritics ignored.
+    - PostgreSQL: case-insensitive substring per word, served by the pg_trgm index.
+    - Other backends: the same substring match without an index.
+    """
+    params_class = SubjectSearchParams
+
+    def filter_params(self, queryset, params):
+        terms = _search_terms(params['search'])
+        if not terms:
+            return queryset
+        if _vendor(queryset) == 'sqlite':
+            # terms are bare words, quoted so no FTS5 query syntax reaches MATCH; each is a prefix
+            match = ' '.join(f'"{term}"*' for term in terms)
+            return queryset.filter(pk__in=RawSQL(
+                'SELECT rowid FROM grades_subject_fts WHERE grades_subject_fts MATCH %s', (match,)))
+        for term in terms:
+            queryset = queryset.filter(name__icontains=term)
+        return queryset
+
+
+# The triggers keeping the SQLite search index (grades_subject_fts, migration 0009) in step with
+# grades_subject. SQLite drops them whenever a migration rebuilds that table (most AlterField /
+# RemoveField on Subject), so ensure_subject_search recreates them after every migrate.
+SUBJECT_FTS_TRIGGERS = {
+    'grades_subject_fts_insert': """CREATE TRIGGER IF NOT EXISTS grades_subject_fts_insert
+        AFTER INSERT ON grades_subject BEGIN
+        INSERT INTO grades_subject_fts(rowid, name) VALUES (new.id, new.name);
+    END""",
+    'grades_subject_fts_delete': """CREATE TRIGGER IF NOT EXISTS grades_subject_fts_delete
+        AFTER DELETE ON grades_subject BEGIN
+        INSERT INTO grades_subject_fts(grades_subject_fts, rowid, name) VALUES ('delete', old.id, old.name);
+    END""",
+    'grades_subject_fts_update': """CREATE TRIGGER IF NOT EXISTS grades_subject_fts_update
+        AFTER UPDATE OF name ON grades_subject BEGIN
+        INSERT INTO grades_subject_fts(grades_subject_fts, rowid, name) VALUES ('delete', old.id, old.name);
+        INSERT INTO grades_subject_fts(rowid, name) VALUES (new.id, new.name);
+    END""",
+}
+
+
+def ensure_subject_search(using='default', **kwargs):
+    """
+    post_migrate receiver: on SQLite, create the search index triggers that are missing and
+    rebuild the index, which missed every subject written without them. Returns the names of the
+    triggers created. Nothing to do before migration 0009 or on other backends.
+    """
+    connection = connections[using]
+    if connection.vendor != 'sqlite' or 'grades_subject_fts' not in connection.introspection.table_names():
+        return []
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'grades_subject'")
+        present = {name for name, in cursor.fetchall()}
+        missing = [name for name in SUBJECT_FTS_TRIGGERS if name not in present]
+        for name in missing:
+            cursor.execute(SUBJECT_FTS_TRIGGERS[name])
+        if missing:
+            cursor.execute("INSERT INTO grades_subject_fts(grades_subject_fts) VALUES ('rebuild')")
+    return missing
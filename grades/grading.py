@@ -0,0 +1,34 @@
+from decimal import Decimal, InvalidOperation
+
+# 4.0 scale for letter grades (case-insensitive, surrounding whitespace ignored)
+GRADE_POINTS = {
+    'A+': Decimal('4.00'), 'A': Decimal('4.00'), 'A-': Decimal('3.70'),
+    'B+': Decimal('3.30'), 'B': Decimal('3.00'), 'B-': Decimal('2.70'),
+    'C+': Decimal('2.30'), 'C': Decimal('2.00'), 'C-': Decimal('1.70'),
+    'D+': Decimal('1.30'), 'D': Decimal('1.00'), 'D-': Decimal('0.70'),
+    'F': Decimal('0.00'),
+}
+MAX_GRADE_POINTS = Decimal('4.00')
+
+
+def grade_points(grade):
+    """
+    Normalised numeric value of a free-text Enrollment.grade, or None.
+
+    - Letter grades map through GRADE_POINTS ('b+' -> 3.30).
+    - Numbers already on the 0-4 scale are kept, rounded to two places ('3.5' -> 3.50).
+    - Blank grades and anything else (pass/fail, percentages) have no points and are left
+      out of GPAs; they still count as graded for SubjectStats and the delete guards.
+    """
+    if grade is None:
+        return None
+    text = str(grade).strip().upper()
+    if text in GRADE_POINTS:
+        return GRADE_POINTS[text]
+    try:
+        value = Decimal(text)
+    except InvalidOperation:
+        return None
+    if not value.is_finite() or not 0 <= value <= MAX_GRADE_POINTS:
+        return None
+    return value.quantize(Decimal('0.01'))
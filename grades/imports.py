@@ -0,0 +1,129 @@
+import csv
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.db import IntegrityError, transaction
+from rest_framework import serializers
+
+from .models import User
+
+# CSV header expected by import_users (password / names are optional columns)
+IMPORT_COLUMNS = ('email', 'password', 'first_name', 'last_name')
+
+
+class UserImportRowSerializer(serializers.Serializer):
+    """Shape/format checks for one CSV row; mirrors UserSerializer's rules without any DB access."""
+    email = serializers.EmailField()
+    password = serializers.CharField(min_length=6, required=False, allow_blank=True)
+    first_name = serializers.CharField(max_length=30, required=False, allow_blank=True)
+    last_name = serializers.CharField(max_length=30, required=False, allow_blank=True)
+
+
+def _init_worker():
+    # Hashing needs settings (PASSWORD_HASHERS); with the "spawn" start method the
+    # worker starts from a fresh interpreter, so configure Django there too.
+    if not settings.configured:
+        os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'project.settings')
+        django.setup()
+
+
+def _hash(password):
+    # blank passwords get an unusable hash, same as UserManager.create_user(password=None)
+    return make_password(password or None)
+
+
+def read_user_csv(fileobj):
+    """Yield (line number, row dict) pairs from a text-mode CSV file with an `email` header column."""
+    reader = csv.DictReader(fileobj)
+    if 'email' not in (reader.fieldnames or ()):
+        raise ValueError("CSV header must include an 'email' column.")
+    for row in reader:
+        # line_num is the reader's current line, i.e. this row's (1-based, header is line 1)
+        yield reader.line_num, {k: (row.get(k) or '').strip() for k in IMPORT_COLUMNS}
+
+
+def import_users(rows, workers=None, batch_size=None, progress=None):
+    """
+    Create users from (line, row) pairs in batches.
+
+    - Rows are validated in-process; passwords for each batch are hashed in a process pool
+      (`workers` processes, default os.cpu_count(); `workers=1` hashes inline).
+    - Duplicate emails (already in the DB or repeated in the file) are checked with one
+      query per batch and skipped; valid users are written with bulk_create.
+    - If another writer creates some of the emails between the check and the insert, the batch
+      is inserted row by row and the conflicting rows are reported as failures.
+    - `progress(processed, created)` is called after every batch.
+
+    Returns a report dict: total, created, duplicates (emails) and failures (line + errors).
+    No row ever aborts the import; problems are collected and reported at the end.
+    """
+    workers = workers or getattr(settings, 'GRADES_IMPORT_WORKERS', None) or os.cpu_count() or 1
+    batch_size = batch_size or getattr(settings, 'GRADES_IMPORT_BATCH_SIZE', 1000)
+    report = {'total': 0, 'created': 0, 'duplicates': [], 'failures': []}
+    seen = set()
+
+    executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) if workers > 1 else None
+    try:
+        batch = []
+        for line, row in rows:
+            report['total'] += 1
+            item = UserImportRowSerializer(data=row)
+            if not item.is_valid():
+                report['failures'].append({'line': line, 'errors': item.errors})
+                continue
+            data = dict(item.validated_data)
+            data['email'] = User.objects.normalize_email(data['email'])
+            if data['email'] in seen:
+                report['duplicates'].append(data['email'])
+                continue
+            seen.add(data['email'])
+            batch.append((line, data))
+            if len(batch) >= batch_size:
+                _import_batch(batch, executor, workers, report)
+                batch = []
+                if progress:
+                    progress(report['total'], report['created'])
+        if batch:
+            _import_batch(batch, executor, workers, report)
+        if progress:
+            progress(report['total'], report['created'])
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    return report
+
+
+def _import_batch(batch, executor, workers, report):
+    existing = set(User.objects.filter(email__in=[d['email'] for _, d in batch]).values_list('email', flat=True))
+    report['duplicates'].extend(d['email'] for _, d in batch if d['email'] in existing)
+    batch = [(line, d) for line, d in batch if d['email'] not in existing]
+    if not batch:
+        return
+
+    passwords = [d.pop('password', '') for _, d in batch]
+    if executor is None:
+        hashes = [_hash(p) for p in passwords]
+    else:
+        hashes = list(executor.map(_hash, passwords, chunksize=max(1, len(passwords) // (workers * 4))))
+
+    try:
+        with transaction.atomic():
+            User.objects.bulk_create([User(password=h, **d) for (_, d), h in zip(batch, hashes)])
+        report['created'] += len(batch)
+    except IntegrityError:
+        # another writer created some of these emails since the check above: insert row by row
+        for (line, d), h in zip(batch, hashes):
+            try:
+                with transaction.atomic():
+                    User.objects.bulk_create([User(password=h, **d)])
+            except IntegrityError as exc:
+                if User.objects.filter(email=d['email']).exists():
+                    errors = {'email': ['A user with this email was created while the import ran.']}
+                else:
+                    errors = {'non_field_errors': [str(exc)]}
+                report['failures'].append({'line': line, 'errors': errors})
+            else:
+                report['created'] += 1
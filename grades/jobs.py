@@ -0,0 +1,217 @@
+import io
+import logging
+import os
+import socket
+import tempfile
+import threading
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.db import connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .exports import EXPORT_FORMATS
+from .imports import import_users, read_user_csv
+from .models import ArchivedEnrollment, Enrollment, Job
+from .roles import access_for
+from .stats import rebuild_subject_stats
+
+logger = logging.getLogger(__name__)
+
+# kind -> handler(job, context) returning the JSON report stored in Job.result
+HANDLERS = {}
+
+
+def job_handler(kind):
+    def register(fn):
+        HANDLERS[kind] = fn
+        return fn
+    return register
+
+
+def lease_duration():
+    return timedelta(seconds=getattr(settings, 'GRADES_JOBS_LEASE_SECONDS', 60))
+
+
+def max_attempts():
+    return getattr(settings, 'GRADES_JOBS_MAX_ATTEMPTS', 3)
+
+
+def worker_name():
+    """Identifies one worker thread in Job.locked_by (host, process, thread, random suffix)."""
+    return f'{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}:{uuid.uuid4().hex[:6]}'
+
+
+class LeaseLost(Exception):
+    """The job's lease expired and another worker claimed it; this worker must stop."""
+
+
+# --- Claiming ---
+def claim_job(worker):
+    """
+    Lease the oldest claimable job to `worker` and return it, or None when the queue is empty.
+
+    A job is claimable when queued, or running with an expired lease. Claims are a
+    compare-and-set UPDATE on (status, locked_until), so two workers can never both win a
+    row; on PostgreSQL the candidate is also read with SELECT ... FOR UPDATE SKIP LOCKED, so
+    concurrent workers pick different rows instead of contending for the same one. Jobs that
+    already used up GRADES_JOBS_MAX_ATTEMPTS leases are failed instead of run again.
+    """
+    while True:
+        now = timezone.now()
+        with transaction.atomic():
+            candidates = Job.objects.filter(
+                Q(status=Job.QUEUED) | Q(status=Job.RUNNING, locked_until__lt=now)).order_by('id')
+            if connection.features.has_select_for_update_skip_locked:
+                candidates = candidates.select_for_update(skip_locked=True)
+            job = candidates.first()
+            if job is None:
+                return None
+            current = Job.objects.filter(pk=job.pk, status=job.status, locked_until=job.locked_until)
+            if job.attempts >= max_attempts():
+                current.update(status=Job.FAILED, finished_at=now, locked_by='', locked_until=None, updated_at=now,
+                               error=f'Gave up after {job.attempts} attempts (worker lost its lease).')
+                continue
+            claimed = current.update(
+                status=Job.RUNNING, locked_by=worker, locked_until=now + lease_duration(),
+                attempts=F('attempts') + 1, started_at=now, updated_at=now,
+            )
+        if claimed:
+            job.refresh_from_db()
+            return job
+
+
+class JobContext:
+    """
+    What a handler gets besides its Job: progress reporting, and lease renewal.
+
+    A background thread renews the lease every third of GRADES_JOBS_LEASE_SECONDS while the
+    handler runs. Once renewal finds the job claimed by someone else, progress() raises
+    LeaseLost so the handler stops.
+    """
+
+    def __init__(self, job, worker):
+        self.job = job
+        self.worker = worker
+        self.lost = False
+        self._stop = threading.Event()
+        self._renewer = threading.Thread(target=self._renew_lease, name=f'job-{job.pk}-lease', daemon=True)
+
+    def _owned(self):
+        return Job.objects.filter(pk=self.job.pk, locked_by=self.worker, status=Job.RUNNING)
+
+    def _extend(self, **fields):
+        now = timezone.now()
+        if not self._owned().update(locked_until=now + lease_duration(), updated_at=now, **fields):
+            self.lost = True
+
+    def _renew_lease(self):
+        try:
+            while not self._stop.wait(lease_duration().total_seconds() / 3):
+                self._extend()
+                if self.lost:
+                    return
+        finally:
+            connection.close()
+
+    def progress(self, done, total=None):
+        """Record `done` of `total` units processed (also renews the lease)."""
+        fields = {'progress': done} if total is None else {'progress': done, 'total': total}
+        if not self.lost:
+            self._extend(**fields)
+        if self.lost:
+            raise LeaseLost()
+
+    def __enter__(self):
+        self._renewer.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._renewer.join()
+
+
+def run_job(job, worker):
+    """Run a claimed job and record its outcome. Returns the final status (None if the lease was lost)."""
+    try:
+        with JobContext(job, worker) as context:
+            report = HANDLERS[job.kind](job, context)
+    except LeaseLost:
+        logger.warning('Job %s: lease lost, left to the worker that claimed it', job.pk)
+        return None
+    except Exception as exc:
+        logger.exception('Job %s failed', job.pk)
+        outcome = {'status': Job.FAILED, 'error': f'{type(exc).__name__}: {exc}'}
+    else:
+        outcome = {'status': Job.SUCCEEDED, 'result': report}
+    now = timezone.now()
+    updated = Job.objects.filter(pk=job.pk, locked_by=worker, status=Job.RUNNING).update(
+        locked_by='', locked_until=None, finished_at=now, updated_at=now, **outcome)
+    return outcome['status'] if updated else None
+
+
+def work(worker=None, stop=None, poll=None, burst=False):
+    """
+    Claim and run jobs until `stop` is set, or, with `burst`, until the queue is empty.
+    Returns the number of jobs run.
+    """
+    worker = worker or worker_name()
+    stop = stop or threading.Event()
+    poll = getattr(settings, 'GRADES_JOBS_POLL_SECONDS', 1.0) if poll is None else poll
+    count = 0
+    while not stop.is_set():
+        job = claim_job(worker)
+        if job is None:
+            if burst:
+                break
+            stop.wait(poll)
+            continue
+        run_job(job, worker)
+        count += 1
+    return count
+
+
+# --- Handlers ---
+@job_handler(Job.IMPORT_USERS)
+def run_import_users(job, context):
+    with job.input_file.open('rb') as upload:
+        rows = read_user_csv(io.TextIOWrapper(upload, encoding='utf-8-sig', newline=''))
+        return import_users(rows, progress=lambda processed, created: context.progress(processed))
+
+
+@job_handler(Job.EXPORT_GRADEBOOK)
+def run_export_gradebook(job, context):
+    # the creator's visibility, as on /api/enrollments/export/
+    user = job.created_by
+    queryset, archived = Enrollment.objects.all(), ArchivedEnrollment.objects.all()
+    if not access_for(user).can('grades.view_enrollment'):
+        queryset = queryset.filter(student_id=user.pk if user else None)
+        archived = archived.filter(student_id=user.pk if user else None)
+    if job.params.get('subject') is not None:
+        queryset = queryset.filter(subject_id=job.params['subject'])
+        archived = archived.filter(subject_id=job.params['subject'])
+    stream, _, extension = EXPORT_FORMATS[job.params.get('output', 'csv')]
+
+    total = queryset.count() + archived.count()
+    context.progress(0, total)
+    chunk_size = getattr(settings, 'GRADES_EXPORT_CHUNK_SIZE', 2000)
+    written = 0
+    with tempfile.TemporaryFile() as output:
+        for index, part in enumerate(stream(queryset, archived)):
+            output.write(part.encode())
+            # the CSV stream starts with a header line
+            written = index if extension == 'csv' else index + 1
+            if written and written % chunk_size == 0:
+                context.progress(written)
+        output.seek(0)
+        job.result_file.save(f'gradebook-{job.pk}.{extension}', File(output), save=False)
+    Job.objects.filter(pk=job.pk).update(result_file=job.result_file.name, progress=written)
+    return {'rows': written}
+
+
+@job_handler(Job.REBUILD_STATS)
+def run_rebuild_stats(job, context):
+    return {'subjects': rebuild_subject_stats()}
@@ -0,0 +1,382 @@
+import asyncio
+import json
+import os
+import random
+import shlex
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+from django.conf import settings
+
+from .benchmarks import percentile, prepare_personas
+from .models import Subject, User
+from .seeding import SEED_PASSWORD
+
+# substrings of the error page / message when a request failed on a database lock
+# (SQLite busy timeout, PostgreSQL deadlock / serialization / lock timeout)
+LOCK_ERRORS = ('database is locked', 'database table is locked', 'deadlock detected',
+               'could not serialize access', 'lock timeout', 'could not obtain lock')
+# 400 bodies of a lost enrollment race: caught by the serializer's unique-together check, or
+# by the database constraint when both requests passed that check (EnrollmentSerializer.create)
+DUPLICATE_ENROLLMENT = ('must make a unique set', 'already enrolled')
+GRADES = ('A', 'B+', 'B', 'C', 'D', 'F')
+
+
+# --- HTTP ---
+class HttpClient:
+    """
+    Minimal asyncio HTTP/1.1 client holding one keep-alive connection, like a browser tab.
+
+    Enough for the JSON API: Content-Length or chunked bodies, reconnects when the server
+    closed the connection. A request that fails on a reused connection before any response
+    arrived is retried once on a fresh one (the server dropped the idle connection).
+    """
+
+    def __init__(self, host, port, timeout=30.0):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.reader = self.writer = None
+
+    async def request(self, method, path, data=None, token=None):
+        """(status, body bytes) of one request; `data` is sent as JSON."""
+        body = b'' if data is None else json.dumps(data).encode()
+        lines = [f'{method} {path} HTTP/1.1', f'Host: {self.host}:{self.port}', 'Accept: application/json',
+                 f'Content-Length: {len(body)}']
+        if data is not None:
+            lines.append('Content-Type: application/json')
+        if token:
+            lines.append(f'Authorization: Token {token}')
+        message = ('\r\n'.join(lines) + '\r\n\r\n').encode() + body
+
+        for attempt in range(2):
+            reused = self.writer is not None
+            if not reused:
+                self.reader, self.writer = await asyncio.wait_for(
+                    asyncio.open_connection(self.host, self.port), self.timeout)
+            try:
+                self.writer.write(message)
+                await self.writer.drain()
+                status, headers, content = await asyncio.wait_for(self._read_response(), self.timeout)
+                break
+            except (ConnectionError, asyncio.IncompleteReadError):
+                await self.close()
+                if attempt or not reused:
+                    raise
+        if headers.get('connection', '').lower() == 'close':
+            await self.close()
+        return status, content
+
+    async def _read_response(self):
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise ConnectionResetError('Connection closed by the server.')
+        status = int(status_line.split()[1])
+        headers = {}
+        while (line := await self.reader.readline()) not in (b'\r\n', b'\n', b''):
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+        if headers.get('transfer-encoding', '').lower() == 'chunked':
+            content = b''
+            while size := int((await self.reader.readline()).split(b';')[0], 16):
+                content += await self.reader.readexactly(size)
+                await self.reader.readline()
+            await self.reader.readline()
+        elif 'content-length' in headers:
+            content = await self.reader.readexactly(int(headers['content-length']))
+        else:
+            content = await self.reader.read()
+            headers['connection'] = 'close'
+        return status, headers, content
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except ConnectionError:
+                pass
+        self.reader = self.writer = None
+
+
+# --- Local server ---
+def free_port(host='127.0.0.1'):
+    with socket.socket() as sock:
+        sock.bind((host, 0))
+        return sock.getsockname()[1]
+
+
+class LocalServer:
+    """
+    The project served from a child process on a free local port, against `database_name`
+    (passed as API_DB_NAME; the other API_DB_* variables are inherited).
+
+    `command` is the server command line with a {port} placeholder, e.g.
+    'uvicorn project.asgi:application --port {port}'; the default is `manage.py runserver`
+    (threaded WSGI). The server's output goes to a temporary log, shown if it fails to start.
+    """
+
+    def __init__(self, database_name, command=None, host='127.0.0.1', startup_timeout=60.0):
+        self.database_name = str(database_name)
+        self.command = command
+        self.host = host
+        self.port = None
+        self.startup_timeout = startup_timeout
+        self.process = None
+        self.log = None
+
+    @property
+    def url(self):
+        return f'http://{self.host}:{self.port}'
+
+    def __enter__(self):
+        self.port = free_port(self.host)
+        if self.command:
+            args = shlex.split(self.command.format(port=self.port))
+        else:
+            args = [sys.executable, 'manage.py', 'runserver', f'{self.host}:{self.port}', '--noreload']
+        self.log = tempfile.TemporaryFile()
+        self.process = subprocess.Popen(
+            args, cwd=settings.BASE_DIR, env={**os.environ, 'API_DB_NAME': self.database_name},
+            stdout=self.log, stderr=subprocess.STDOUT,
+        )
+        try:
+            self._wait_until_ready()
+        except BaseException:
+            self.__exit__(None, None, None)
+            raise
+        return self
+
+    def _wait_until_ready(self):
+        deadline = time.monotonic() + self.startup_timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f'The server exited with status {self.process.returncode}:\n{self.output()}')
+            try:
+                with socket.create_connection((self.host, self.port), timeout=1) as sock:
+                    sock.sendall(f'GET / HTTP/1.1\r\nHost: {self.host}:{self.port}\r\nConnection: close\r\n\r\n'.encode())
+                    if sock.recv(12).startswith(b'HTTP/'):
+                        return
+            except OSError:
+                pass
+            time.sleep(0.1)
+        raise RuntimeError(f'The server did not answer within {self.startup_timeout:.0f}s:\n{self.output()}')
+
+    def output(self):
+        self.log.seek(0)
+        return self.log.read().decode(errors='replace')[-4000:]
+
+    def __exit__(self, *exc_info):
+        if self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+        self.log.close()
+
+
+# --- Scenario ---
+def load_personas(students=200, graders=4, hot_subjects=5):
+    """
+    Who takes part, read from the current database: the first `students` non-staff users (the
+    seeded ones share grades.seeding.SEED_PASSWORD), the benchmark staff user as every grader,
+    and the `hot_subjects` subjects everyone tries to enroll in.
+    """
+    staff = prepare_personas()['staff']
+    emails = list(User.objects.filter(is_staff=False, is_admin=False).order_by('id')
+                  .values_list('email', flat=True)[:students])
+    subjects = list(Subject.objects.order_by('id').values('id', 'name')[:hot_subjects])
+    if len(emails) < students or not subjects:
+        raise ValueError(f'Seed at least {students} students and one subject first (manage.py seed_data).')
+    return {
+        'students': emails,
+        'graders': [staff.email] * graders,
+        'password': SEED_PASSWORD,
+        'subjects': subjects,
+    }
+
+
+class Recorder:
+    """Outcome and latency of every request, per endpoint label."""
+
+    def __init__(self):
+        self.samples = defaultdict(list)
+
+    async def call(self, client, label, method, path, data=None, token=None, conflict_ok=False):
+        """
+        Send one request and record it as ok (2xx), conflict (an expected 4xx: a lost
+        enrollment race when `conflict_ok`), lock (failed on a database lock) or error.
+        Returns (status, parsed JSON or None); status 0 when no response arrived.
+        """
+        start = time.perf_counter()
+        try:
+            status, content = await client.request(method, path, data, token)
+        except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError):
+            self.samples[label].append((time.perf_counter() - start, 'error'))
+            await client.close()
+            return 0, None
+        elapsed = time.perf_counter() - start
+        text = content.decode(errors='replace')
+        if 200 <= status < 300:
+            outcome = 'ok'
+        elif _is_lock_error(text):
+            outcome = 'lock'
+        elif conflict_ok and status == 400 and any(message in text for message in DUPLICATE_ENROLLMENT):
+            outcome = 'conflict'
+        else:
+            outcome = 'error'
+        self.samples[label].append((elapsed, outcome))
+        try:
+            payload = json.loads(content) if content else None
+        except ValueError:
+            payload = None
+        return status, payload
+
+    def summary(self, elapsed):
+        """Per-endpoint report, plus a 'total' row over every request."""
+        rows = {label: _summarize(samples, elapsed) for label, samples in sorted(self.samples.items())}
+        rows['total'] = _summarize([s for samples in self.samples.values() for s in samples], elapsed)
+        return rows
+
+
+def _is_lock_error(text):
+    text = text.lower()
+    return any(pattern in text for pattern in LOCK_ERRORS)
+
+
+def _summarize(samples, elapsed):
+    timings = [seconds * 1000 for seconds, _ in samples]
+    counts = {outcome: sum(1 for _, o in samples if o == outcome) for outcome in ('ok', 'conflict', 'error', 'lock')}
+    return {
+        'requests': len(samples),
+        'rps': round(len(samples) / elapsed, 1) if elapsed else 0.0,
+        'p50_ms': round(percentile(timings, 50), 2),
+        'p95_ms': round(percentile(timings, 95), 2),
+        'p99_ms': round(percentile(timings, 99), 2),
+        'ok': counts['ok'],
+        'conflicts': counts['conflict'],
+        'errors': counts['error'],
+        'lock_failures': counts['lock'],
+        'error_rate': round((counts['error'] + counts['lock']) / len(samples), 4),
+    }
+
+
+async def _login(recorder, client, email, password):
+    _, payload = await recorder.call(client, 'login', 'POST', '/api-token-auth/',
+                                     {'username': email, 'password': password})
+    return (payload or {}).get('token')
+
+
+async def _pause(rng, think):
+    if think:
+        await asyncio.sleep(rng.uniform(0, think))
+
+
+async def student_session(recorder, connect, email, password, subjects, rng, duplicate_rate, think):
+    """
+    One student at registration time: log in, browse and search the catalog, open a subject,
+    enroll in it (a double submit with probability `duplicate_rate`, racing itself on the
+    (student, subject) unique constraint), then check their enrollments.
+    """
+    client = connect()
+    try:
+        token = await _login(recorder, client, email, password)
+        if not token:
+            return
+        subject = rng.choice(subjects)
+        await _pause(rng, think)
+        await recorder.call(client, 'subjects:list', 'GET', '/api/subjects/?page_size=20', token=token)
+        await _pause(rng, think)
+        query = subject['name'].split()[-1]
+        await recorder.call(client, 'subjects:search', 'GET', f'/api/subjects/?search={query}', token=token)
+        await _pause(rng, think)
+        await recorder.call(client, 'subjects:detail', 'GET', f"/api/subjects/{subject['id']}/", token=token)
+        await _pause(rng, think)
+        enroll = {'subject': subject['id']}
+        if rng.random() < duplicate_rate:
+            second = connect()
+            try:
+                await asyncio.gather(
+                    recorder.call(client, 'enrollments:create', 'POST', '/api/enrollments/', enroll, token, True),
+                    recorder.call(second, 'enrollments:create', 'POST', '/api/enrollments/', enroll, token, True),
+                )
+            finally:
+                await second.close()
+        else:
+            await recorder.call(client, 'enrollments:create', 'POST', '/api/enrollments/', enroll, token, True)
+        await _pause(rng, think)
+        await recorder.call(client, 'enrollments:list', 'GET', f"/api/enrollments/?subject={subject['id']}", token=token)
+    finally:
+        await client.close()
+
+
+async def grader_session(recorder, connect, email, password, subjects, rng, done, think):
+    """Staff posting grades on the hot subjects' ungraded enrollments until the students are done."""
+    client = connect()
+    try:
+        token = await _login(recorder, client, email, password)
+        if not token:
+            return
+        while not done.is_set():
+            subject = rng.choice(subjects)
+            _, page = await recorder.call(client, 'enrollments:ungraded', 'GET',
+                                          f"/api/enrollments/?subject={subject['id']}&graded=false&page_size=10",
+                                          token=token)
+            for enrollment in (page or {}).get('results', []):
+                if done.is_set():
+                    break
+                await recorder.call(client, 'enrollments:grade', 'PATCH', f"/api/enrollments/{enrollment['id']}/",
+                                    {'grade': rng.choice(GRADES)}, token)
+                await _pause(rng, think)
+            # nothing (left) to grade yet: wait for enrollments instead of spinning
+            await asyncio.sleep(max(think, 0.05))
+    finally:
+        await client.close()
+
+
+def run_load_test(base_url, personas, duplicate_rate=0.2, think=0.1, ramp=1.0, timeout=30.0, seed=None):
+    """
+    Replay the registration mix against the server at `base_url` with every student of
+    `personas` (load_personas()) active at once, arrivals spread over `ramp` seconds, and
+    the graders posting grades meanwhile. `think` is the maximum pause between a user's
+    requests. Returns the Recorder summary: per endpoint requests, requests/second,
+    p50/p95/p99 latency, ok / conflicts / errors / lock_failures and error_rate.
+    """
+    scheme, _, address = base_url.rstrip('/').partition('://')
+    if scheme != 'http':
+        raise ValueError('Only http:// servers are supported.')
+    host, _, port = address.partition(':')
+    port = int(port or 80)
+    rng = random.Random(seed)
+    recorder = Recorder()
+
+    def connect():
+        return HttpClient(host, port, timeout)
+
+    async def arrive(email, delay, student_rng):
+        await asyncio.sleep(delay)
+        await student_session(recorder, connect, email, personas['password'], personas['subjects'],
+                              student_rng, duplicate_rate, think)
+
+    async def main():
+        done = asyncio.Event()
+        graders = [asyncio.ensure_future(grader_session(
+            recorder, connect, email, personas['password'], personas['subjects'],
+            random.Random(rng.random()), done, think)) for email in personas['graders']]
+        start = time.perf_counter()
+        try:
+            await asyncio.gather(*(arrive(email, rng.uniform(0, ramp), random.Random(rng.random()))
+                                   for email in personas['students']))
+        finally:
+            done.set()
+            await asyncio.gather(*graders)
+        return time.perf_counter() - start
+
+    elapsed = asyncio.run(main())
+    return recorder.summary(elapsed)
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from grades.archive import archive_term, closed_terms
+from grades.models import Term
+
+
+class Command(BaseCommand):
+    """
+    Move the enrollments of closed terms (ends_on in the past) to the ArchivedEnrollment table.
+
+    Runs in batches of --batch-size rows (default GRADES_ARCHIVE_BATCH_SIZE), one transaction
+    each, so it can run next to live traffic and be interrupted and resumed. Terms that were
+    archived before are checked again for late rows. Run it once a term's grades are final.
+    """
+    help = 'Archive the enrollments of closed terms, keeping the Enrollment table to current terms.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--term', action='append', dest='terms', metavar='NAME',
+                            help='Archive only this closed term (repeatable). Default: every closed term.')
+        parser.add_argument('--batch-size', type=int, default=None, help='Enrollments moved per transaction.')
+
+    def handle(self, *args, terms, batch_size, **options):
+        closed = closed_terms()
+        if terms:
+            found = {term.name: term for term in Term.objects.filter(name__in=terms)}
+            missing = [name for name in terms if name not in found]
+            if missing:
+                raise CommandError(f"Unknown term(s): {', '.join(missing)}")
+            still_open = [name for name in terms if not closed.filter(pk=found[name].pk).exists()]
+            if still_open:
+                raise CommandError(f"Term(s) not closed yet: {', '.join(still_open)}")
+            closed = [found[name] for name in terms]
+
+        total = 0
+        for term in closed:
+            moved = archive_term(term, batch_size=batch_size)
+            total += moved
+            self.stdout.write(f'{term.name}: archived {moved} enrollments')
+        self.stdout.write(self.style.SUCCESS(f'Archived {total} enrollments.'))
@@ -0,0 +1,86 @@
+import logging
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from grades.benchmarks import (
+    check_baseline, check_query_scaling, load_baseline, run_benchmarks, save_results,
+)
+from grades.seeding import seed_data
+
+
+class Command(BaseCommand):
+    """
+    Query-count and latency regression benchmark for every API route.
+
+    Runs in a throwaway test database: seeds 1/--scale-factor of the requested volume, measures
+    every route as anonymous/student/staff, seeds the rest and measures again.
+    Fails when a route's query count changes between the two volumes, or (when a baseline file
+    exists) when p95 latency or query counts regress past it.
+    """
+    help = 'Benchmark every API route at two data volumes and compare against a stored baseline.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10000)
+        parser.add_argument('--subjects', type=int, default=500)
+        parser.add_argument('--enrollments', type=int, default=200000)
+        parser.add_argument('--scale-factor', type=int, default=10,
+                            help='The first measurement uses 1/N of the requested volume.')
+        parser.add_argument('--repeat', type=int, default=5, help='Timed requests per route and role.')
+        parser.add_argument('--baseline', default=str(settings.BASE_DIR / 'benchmark_baseline.json'))
+        parser.add_argument('--update-baseline', action='store_true',
+                            help='Write this run as the new baseline instead of comparing against it.')
+        parser.add_argument('--tolerance', type=float, default=1.5,
+                            help='Allowed p95 slowdown factor versus the baseline.')
+        parser.add_argument('--output', help='Also write the full results as JSON to this path.')
+
+    def handle(self, *args, **options):
+        factor = max(1, options['scale_factor'])
+        small = {k: max(1, options[k] // factor) for k in ('users', 'subjects', 'enrollments')}
+        small['enrollments'] = min(small['enrollments'], small['users'] * small['subjects'])
+        rest = {k: options[k] - small[k] for k in small}
+
+        # test environment: the test client's 'testserver' host is allowed, mail is captured;
+        # 4xx responses are expected for some roles, so keep django.request quiet
+        setup_test_environment()
+        logging.getLogger('django.request').setLevel(logging.ERROR)
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            self.stdout.write(f"Seeding {small['users']} users, {small['subjects']} subjects, {small['enrollments']} enrollments")
+            seed_data(prefix='bench-a', **small)
+            small_results = run_benchmarks(options['repeat'])
+            if rest['users'] > 0 and rest['subjects'] > 0:
+                self.stdout.write(f"Seeding {rest['users']} users, {rest['subjects']} subjects, {rest['enrollments']} enrollments")
+                seed_data(prefix='bench-b', **rest)
+            results = run_benchmarks(options['repeat'])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        self.stdout.write(f"{'route':<55} {'status':>6} {'queries':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+        for key, row in sorted(results.items()):
+            self.stdout.write(
+                f"{key:<55} {row['status']:>6} {row['queries']:>7} {row['p50_ms']:>9.2f} {row['p95_ms']:>9.2f} {row['p99_ms']:>9.2f}"
+            )
+        if options['output']:
+            save_results(options['output'], results)
+
+        failures = check_query_scaling(small_results, results)
+        failures += [f"{key}: HTTP {row['status']}" for key, row in sorted(results.items()) if row['status'] >= 500]
+        if options['update_baseline']:
+            save_results(options['baseline'], results)
+            self.stdout.write(f"Baseline written to {options['baseline']}")
+        else:
+            try:
+                baseline = load_baseline(options['baseline'])
+            except FileNotFoundError:
+                self.stdout.write(f"No baseline at {options['baseline']}; latency check skipped (use --update-baseline).")
+            else:
+                failures += check_baseline(results, baseline, tolerance=options['tolerance'])
+
+        if failures:
+            raise CommandError('Benchmark regressions:\n' + '\n'.join(failures))
+        self.stdout.write(self.style.SUCCESS('No query-count or latency regressions.'))
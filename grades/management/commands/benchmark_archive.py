@@ -0,0 +1,46 @@
+import logging
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from grades.benchmarks import run_archive_benchmark
+from grades.seeding import seed_data
+
+
+class Command(BaseCommand):
+    """
+    Effect of term archival on the hot enrollment paths, in a throwaway seeded test database:
+    --archive-share of the enrollments are back-dated into a closed term, and the requests of
+    grades.benchmarks.archive_routes are measured before and after `archive_terms` moves them.
+    """
+    help = 'Compare hot-path enrollment request latency before and after archiving closed terms.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10000)
+        parser.add_argument('--subjects', type=int, default=500)
+        parser.add_argument('--enrollments', type=int, default=200000)
+        parser.add_argument('--archive-share', type=float, default=0.9,
+                            help='Share of the enrollments that belong to the closed term.')
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        logging.getLogger('django.request').setLevel(logging.ERROR)
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            self.stdout.write(f"Seeding {options['users']} users, {options['subjects']} subjects, {options['enrollments']} enrollments")
+            seed_data(users=options['users'], subjects=options['subjects'], enrollments=options['enrollments'], prefix='arch')
+            results = run_archive_benchmark(options['archive_share'], options['repeat'])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        rows = results['rows']
+        self.stdout.write(f"Enrollment rows: {rows['before']} before, {rows['after']} after ({rows['archived']} archived)")
+        self.stdout.write(f"{'route':<28} {'queries':>9} {'p50 before':>11} {'p50 after':>10} {'p95 before':>11} {'p95 after':>10}")
+        for name, row in results['routes'].items():
+            before, after = row['before'], row['after']
+            self.stdout.write(f"{name:<28} {before['queries']:>4}/{after['queries']:<4} {before['p50_ms']:>11.2f} "
+                              f"{after['p50_ms']:>10.2f} {before['p95_ms']:>11.2f} {after['p95_ms']:>10.2f}")
@@ -0,0 +1,49 @@
+import logging
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from grades.benchmarks import run_concurrency_benchmark, save_results
+from grades.seeding import seed_data
+
+
+class Command(BaseCommand):
+    """
+    Concurrent-client throughput of the list/detail reads: sync views under the WSGI handler
+    versus the async views (grades.async_views) under the ASGI handler, in a throwaway seeded
+    test database. Reports requests/second and p50/p95 latency per route; it does not fail.
+    """
+    help = 'Compare WSGI (sync views) and ASGI (async views) read throughput under concurrent clients.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=2000)
+        parser.add_argument('--subjects', type=int, default=100)
+        parser.add_argument('--enrollments', type=int, default=20000)
+        parser.add_argument('--concurrency', type=int, default=32, help='Simultaneous clients.')
+        parser.add_argument('--requests', type=int, default=320, help='GETs per route, shared by the clients.')
+        parser.add_argument('--output', help='Also write the full results as JSON to this path.')
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        logging.getLogger('django.request').setLevel(logging.ERROR)
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            self.stdout.write(f"Seeding {options['users']} users, {options['subjects']} subjects, {options['enrollments']} enrollments")
+            seed_data(users=options['users'], subjects=options['subjects'], enrollments=options['enrollments'], prefix='conc')
+            results = run_concurrency_benchmark(options['concurrency'], options['requests'])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        self.stdout.write(f"{'route':<28} {'wsgi rps':>9} {'asgi rps':>9} {'ratio':>6} "
+                          f"{'wsgi p95':>9} {'asgi p95':>9} {'non-200':>8}")
+        for name in sorted({key.rsplit(' ', 1)[0] for key in results}):
+            wsgi, asgi = results[f'{name} wsgi'], results[f'{name} asgi']
+            self.stdout.write(
+                f"{name:<28} {wsgi['rps']:>9.1f} {asgi['rps']:>9.1f} {asgi['rps'] / wsgi['rps']:>6.2f} "
+                f"{wsgi['p95_ms']:>9.2f} {asgi['p95_ms']:>9.2f} {wsgi['non_200'] + asgi['non_200']:>8}"
+            )
+        if options['output']:
+            save_results(options['output'], results)
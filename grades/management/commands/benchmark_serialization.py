@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from grades.benchmarks import run_serialization_benchmark
+from grades.seeding import seed_data
+
+
+class Command(BaseCommand):
+    """
+    List serialisation speed: ModelSerializer + JSONRenderer versus the `.values()` fast path
+    (grades.fast_list) + ORJSONRenderer, over every row of a throwaway seeded test database.
+    Fails if the two paths do not produce identical bytes.
+    """
+    help = 'Compare list serialisation through ModelSerializer/JSONRenderer and the values()/orjson fast path.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10000)
+        parser.add_argument('--subjects', type=int, default=100)
+        parser.add_argument('--enrollments', type=int, default=50000)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            self.stdout.write(f"Seeding {options['users']} users, {options['subjects']} subjects, {options['enrollments']} enrollments")
+            seed_data(users=options['users'], subjects=options['subjects'], enrollments=options['enrollments'], prefix='ser')
+            results = run_serialization_benchmark(options['repeat'])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        self.stdout.write(f"{'list':<12} {'rows':>7} {'bytes':>10} {'serializer ms':>14} {'fast ms':>9} {'speedup':>8}")
+        for name, row in results.items():
+            self.stdout.write(f"{name:<12} {row['rows']:>7} {row['bytes']:>10} {row['serializer_ms']:>14.1f} "
+                              f"{row['fast_ms']:>9.1f} {row['speedup']:>7.1f}x")
+        mismatched = [name for name, row in results.items() if not row['identical']]
+        if mismatched:
+            raise CommandError(f"Fast path output differs from the serializer for: {', '.join(mismatched)}")
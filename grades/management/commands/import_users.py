@@ -0,0 +1,49 @@
+import csv
+
+from django.core.management.base import BaseCommand, CommandError
+
+from grades.imports import import_users, read_user_csv
+
+
+class Command(BaseCommand):
+    """
+    Bulk-create users from a CSV file (columns: email, password, first_name, last_name).
+
+    Passwords are hashed in a process pool and users are inserted with bulk_create in
+    batches. Duplicate emails and invalid rows are reported at the end instead of
+    stopping the import.
+    """
+    help = 'Import users from a CSV file (email,password,first_name,last_name).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('csv_path')
+        parser.add_argument('--workers', type=int, default=None,
+                            help='Password hashing processes (default: all cores).')
+        parser.add_argument('--batch-size', type=int, default=None,
+                            help='Users per bulk_create batch (default: GRADES_IMPORT_BATCH_SIZE).')
+
+    def handle(self, *args, **options):
+        def progress(processed, created):
+            self.stdout.write(f'processed {processed} rows, created {created} users')
+
+        try:
+            with open(options['csv_path'], newline='', encoding='utf-8-sig') as fh:
+                report = import_users(
+                    read_user_csv(fh),
+                    workers=options['workers'],
+                    batch_size=options['batch_size'],
+                    progress=progress,
+                )
+        except (OSError, ValueError) as exc:
+            raise CommandError(str(exc))
+        except csv.Error as exc:
+            raise CommandError(f'Malformed CSV: {exc}')
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {report['created']} of {report['total']} users "
+            f"({len(report['duplicates'])} duplicates, {len(report['failures'])} failures)."
+        ))
+        for email in report['duplicates']:
+            self.stdout.write(f'duplicate: {email}')
+        for failure in report['failures']:
+            self.stdout.write(self.style.WARNING(f"line {failure['line']}: {dict(failure['errors'])}"))
@@ -0,0 +1,82 @@
+import logging
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from grades.benchmarks import save_results
+from grades.loadtest import LocalServer, load_personas, run_load_test
+from grades.seeding import seed_data
+
+
+class Command(BaseCommand):
+    """
+    End-to-end load test: boots the project on a local port against a throwaway seeded test
+    database and replays a registration-time mix (token login, subject browsing and search,
+    racing enrollment creation, staff grade patches) with every student active at once.
+    Reports throughput, p50/p95/p99 latency, conflicts (lost enrollment races, expected),
+    errors and database lock failures per endpoint; it does not fail.
+
+    With --url the load goes to an already running server instead; its users and subjects
+    are read from the configured database, nothing is seeded.
+    """
+    help = 'Load-test the API over HTTP with concurrent students enrolling and staff grading.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--students', type=int, default=200, help='Concurrent students.')
+        parser.add_argument('--graders', type=int, default=4, help='Concurrent staff graders.')
+        parser.add_argument('--hot-subjects', type=int, default=5, help='Subjects every student competes for.')
+        parser.add_argument('--duplicate-rate', type=float, default=0.2,
+                            help='Share of students who double-submit their enrollment.')
+        parser.add_argument('--think-ms', type=int, default=100, help='Maximum pause between a user\'s requests.')
+        parser.add_argument('--ramp', type=float, default=2.0, help='Seconds over which students arrive.')
+        parser.add_argument('--timeout', type=float, default=30.0, help='Seconds before a request counts as failed.')
+        parser.add_argument('--seed', type=int, help='Random seed, for a repeatable mix.')
+        parser.add_argument('--users', type=int, default=2000)
+        parser.add_argument('--subjects', type=int, default=100)
+        parser.add_argument('--enrollments', type=int, default=20000)
+        parser.add_argument('--server', help='Server command with a {port} placeholder '
+                                             '(default: manage.py runserver), e.g. "uvicorn project.asgi:application --port {port}".')
+        parser.add_argument('--url', help='Load an already running server (e.g. http://127.0.0.1:8000) instead.')
+        parser.add_argument('--output', help='Also write the results as JSON to this path.')
+
+    def handle(self, *args, **options):
+        if options['users'] < options['students']:
+            raise CommandError('--users must be at least --students.')
+        load = dict(duplicate_rate=options['duplicate_rate'], think=options['think_ms'] / 1000,
+                    ramp=options['ramp'], timeout=options['timeout'], seed=options['seed'])
+        persona_counts = dict(students=options['students'], graders=options['graders'],
+                              hot_subjects=options['hot_subjects'])
+        if options['url']:
+            results = run_load_test(options['url'], load_personas(**persona_counts), **load)
+        else:
+            results = self._run_local(options, persona_counts, load)
+
+        self.stdout.write(f"{'endpoint':<22} {'requests':>8} {'rps':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+                          f"{'ok':>6} {'conflict':>8} {'errors':>6} {'locks':>5} {'err %':>6}")
+        for name, row in results.items():
+            self.stdout.write(
+                f"{name:<22} {row['requests']:>8} {row['rps']:>7.1f} {row['p50_ms']:>8.1f} {row['p95_ms']:>8.1f} "
+                f"{row['p99_ms']:>8.1f} {row['ok']:>6} {row['conflicts']:>8} {row['errors']:>6} "
+                f"{row['lock_failures']:>5} {row['error_rate'] * 100:>6.2f}"
+            )
+        if options['output']:
+            save_results(options['output'], results)
+
+    def _run_local(self, options, persona_counts, load):
+        setup_test_environment()
+        logging.getLogger('django.request').setLevel(logging.ERROR)
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            self.stdout.write(f"Seeding {options['users']} users, {options['subjects']} subjects, {options['enrollments']} enrollments")
+            seed_data(users=options['users'], subjects=options['subjects'], enrollments=options['enrollments'], prefix='load')
+            personas = load_personas(**persona_counts)
+            # the server process gets the database to itself
+            connections.close_all()
+            with LocalServer(connection.settings_dict['NAME'], options['server']) as server:
+                self.stdout.write(f"Server up at {server.url}; {options['students']} students, {options['graders']} graders")
+                return run_load_test(server.url, personas, **load)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from grades.models import Tombstone
+from grades.sync import tombstone_retention
+
+
+class Command(BaseCommand):
+    """
+    Delete Tombstone rows older than settings.GRADES_SYNC_TOMBSTONE_DAYS.
+
+    /api/sync/ refuses tokens older than the retention (410), so pruned deletions are never
+    needed again. Run it periodically (e.g. daily from cron).
+    """
+    help = 'Delete deletion records older than the delta sync retention.'
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - tombstone_retention()
+        count, _ = Tombstone.objects.filter(deleted_at__lt=cutoff).delete()
+        self.stdout.write(self.style.SUCCESS(f'Deleted {count} tombstones older than {cutoff:%Y-%m-%d %H:%M}.'))
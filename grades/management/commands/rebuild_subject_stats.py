@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from grades.stats import rebuild_subject_stats
+
+
+class Command(BaseCommand):
+    """
+    Recompute the SubjectStats summary table from Enrollment.
+
+    The table is normally kept current by signals; run this after writes that bypass them
+    (QuerySet.update(), raw SQL, restored backups).
+    """
+    help = 'Rebuild per-subject enrollment/grade statistics from the Enrollment table.'
+
+    def handle(self, *args, **options):
+        count = rebuild_subject_stats()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt statistics for {count} subjects.'))
@@ -0,0 +1,50 @@
+import signal
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from grades.jobs import work
+
+
+class Command(BaseCommand):
+    """
+    Background job worker: claims queued jobs (grades.jobs) and runs them in `--threads` threads.
+
+    Any number of these processes, on any host that shares the database, can serve one queue:
+    claims and leases are arbitrated by the database, with no broker. SIGTERM / Ctrl-C stop
+    claiming new jobs and let the running ones finish.
+    """
+    help = 'Run queued background jobs (user imports, gradebook exports, statistics rebuilds).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=1, help='Jobs run concurrently by this process.')
+        parser.add_argument('--poll', type=float, default=None,
+                            help='Seconds between queue checks when idle (default: GRADES_JOBS_POLL_SECONDS).')
+        parser.add_argument('--burst', action='store_true', help='Exit once the queue is empty.')
+
+    def handle(self, *args, threads, poll, burst, **options):
+        stop = threading.Event()
+        previous = {}
+        if threading.current_thread() is threading.main_thread():
+            for signum in (signal.SIGTERM, signal.SIGINT):
+                previous[signum] = signal.signal(signum, lambda *_: stop.set())
+
+        def run(_):
+            try:
+                return work(stop=stop, poll=poll, burst=burst)
+            finally:
+                # pool threads own their connections
+                connection.close()
+
+        try:
+            if threads <= 1:
+                count = work(stop=stop, poll=poll, burst=burst)
+            else:
+                with ThreadPoolExecutor(threads, thread_name_prefix='grades-job') as pool:
+                    count = sum(pool.map(run, range(threads)))
+        finally:
+            for signum, handler in previous.items():
+                signal.signal(signum, handler)
+        self.stdout.write(self.style.SUCCESS(f'Ran {count} jobs.'))
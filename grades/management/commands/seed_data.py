@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from grades.models import User
+from grades.seeding import SEED_PASSWORD, seed_data
+
+
+class Command(BaseCommand):
+    """
+    Fill the database with synthetic users, subjects and enrollments.
+
+    Meant for benchmarks and local load testing; all seeded users share the password
+    grades.seeding.SEED_PASSWORD.
+    """
+    help = 'Seed synthetic users/subjects/enrollments (e.g. --users 10000 --subjects 500 --enrollments 200000).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10000)
+        parser.add_argument('--subjects', type=int, default=500)
+        parser.add_argument('--enrollments', type=int, default=200000)
+        parser.add_argument('--graded-every', type=int, default=2,
+                            help='Give every Nth enrollment a grade (0 = leave all ungraded).')
+        parser.add_argument('--prefix', default='seed', help='Email / subject name prefix for seeded rows.')
+
+    def handle(self, *args, **options):
+        prefix = options['prefix']
+        if User.objects.filter(email=f'{prefix}0@example.com').exists():
+            raise CommandError(f"Rows with prefix '{prefix}' already exist; pick another --prefix.")
+        try:
+            result = seed_data(
+                users=options['users'], subjects=options['subjects'], enrollments=options['enrollments'],
+                graded_every=options['graded_every'], prefix=prefix,
+            )
+        except ValueError as exc:
+            raise CommandError(str(exc))
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded {result['users']} users, {result['subjects']} subjects and {result['enrollments']} "
+            f"enrollments (password: {SEED_PASSWORD})."
+        ))
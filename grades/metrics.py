@@ -0,0 +1,210 @@
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+# Histogram bucket upper bounds (Prometheus `le` labels); +Inf is implicit.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+
+
+class _Histogram:
+    __slots__ = ('bounds', 'counts', 'total', 'count')
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.total += value
+        self.count += 1
+
+
+class MetricsRegistry:
+    """
+    Process-local request metrics keyed by (view, action).
+
+    - requests: counter per (view, action, method, status)
+    - latency / queries: histograms of seconds and DB queries per request
+    - db_seconds: total time spent in DB calls
+
+    Every worker process keeps its own registry; scrape each one (or aggregate in Prometheus).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.requests = {}
+            self.latency = {}
+            self.queries = {}
+            self.db_seconds = {}
+
+    def observe(self, view, action, method, status, seconds, queries, db_seconds):
+        key = (view, action)
+        with self._lock:
+            request_key = (view, action, method, str(status))
+            self.requests[request_key] = self.requests.get(request_key, 0) + 1
+            if key not in self.latency:
+                self.latency[key] = _Histogram(LATENCY_BUCKETS)
+                self.queries[key] = _Histogram(QUERY_BUCKETS)
+                self.db_seconds[key] = 0.0
+            self.latency[key].observe(seconds)
+            self.queries[key].observe(queries)
+            self.db_seconds[key] += db_seconds
+
+    def render(self, extra=()):
+        """Prometheus text exposition format (version 0.0.4)."""
+        lines = []
+        with self._lock:
+            lines += ['# HELP grades_http_requests_total Requests served, per view/action/method/status.',
+                      '# TYPE grades_http_requests_total counter']
+            for (view, action, method, status), n in sorted(self.requests.items()):
+                lines.append(f'grades_http_requests_total{_labels(view=view, action=action, method=method, status=status)} {n}')
+            _render_histogram(lines, 'grades_http_request_duration_seconds',
+                              'Time spent in the view, per view/action.', self.latency)
+            _render_histogram(lines, 'grades_db_queries_per_request',
+                              'DB queries executed per request, per view/action.', self.queries)
+            lines += ['# HELP grades_db_query_seconds_total Time spent executing DB queries, per view/action.',
+                      '# TYPE grades_db_query_seconds_total counter']
+            for (view, action), seconds in sorted(self.db_seconds.items()):
+                lines.append(f'grades_db_query_seconds_total{_labels(view=view, action=action)} {seconds:.6f}')
+        for name, kind, help_text, value in extra:
+            lines += [f'# HELP {name} {help_text}', f'# TYPE {name} {kind}', f'{name} {value}']
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(**labels):
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + '}'
+
+
+def _render_histogram(lines, name, help_text, histograms):
+    lines += [f'# HELP {name} {help_text}', f'# TYPE {name} histogram']
+    for (view, action), hist in sorted(histograms.items()):
+        cumulative = 0
+        for bound, n in zip(hist.bounds + ('+Inf',), hist.counts):
+            cumulative += n
+            lines.append(f'{name}_bucket{_labels(view=view, action=action, le=bound)} {cumulative}')
+        lines.append(f'{name}_sum{_labels(view=view, action=action)} {hist.total:.6f}')
+        lines.append(f'{name}_count{_labels(view=view, action=action)} {hist.count}')
+
+
+registry = MetricsRegistry()
+
+
+class _QueryCounter:
+    """connection.execute_wrapper hook: counts queries and DB time without needing DEBUG."""
+    __slots__ = ('count', 'seconds')
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.seconds += time.perf_counter() - start
+
+
+# the _QueryCounter of the request being served. A context variable rather than a wrapper
+# entered around the request: under ASGI the queries run in sync_to_async's worker thread, on
+# that thread's connections, and the context (not the thread) is what follows the request there.
+_active_counter = ContextVar('grades_query_counter', default=None)
+
+
+def _count_queries(execute, sql, params, many, context):
+    counter = _active_counter.get()
+    if counter is None:
+        return execute(sql, params, many, context)
+    return counter(execute, sql, params, many, context)
+
+
+@receiver(connection_created)
+def install_query_counter(sender=None, connection=None, **kwargs):
+    # outermost, so connection.execute_wrapper()'s pop() of the last wrapper never removes it
+    if _count_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, _count_queries)
+
+
+class ViewMetricsMiddleware:
+    """
+    Record per-view/action request counts, latency, DB query count and DB time.
+
+    - The view label is the resolved URL name (`api:subject-list`); the action is the viewset
+      action for the request method (`list`, `remove_student`, ...) or the lowercased method
+      for plain views. Unresolved URLs are not recorded.
+    - Streaming responses are timed until the view returns, not until the body is sent.
+    - Disabled (removed from the stack) when settings.GRADES_METRICS_ENABLED is False.
+    - Async-capable: under ASGI the stack stays async and queries made in sync_to_async
+      threads are still counted.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'GRADES_METRICS_ENABLED', True):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        # connections opened before this module was imported never sent connection_created
+        for conn in connections.all():
+            install_query_counter(connection=conn)
+        counter = _QueryCounter()
+        token = _active_counter.set(counter)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _active_counter.reset(token)
+        self._observe(request, response, time.perf_counter() - start, counter)
+        return response
+
+    async def __acall__(self, request):
+        counter = _QueryCounter()
+        token = _active_counter.set(counter)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _active_counter.reset(token)
+        self._observe(request, response, time.perf_counter() - start, counter)
+        return response
+
+    @staticmethod
+    def _observe(request, response, elapsed, counter):
+        match = getattr(request, 'resolver_match', None)
+        if match is not None and match.view_name:
+            action = getattr(request, '_metrics_action', None) or request.method.lower()
+            registry.observe(match.view_name, action, request.method, response.status_code,
+                             elapsed, counter.count, counter.seconds)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        actions = getattr(view_func, 'actions', None)
+        if actions:
+            request._metrics_action = actions.get(request.method.lower())
+        return None
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-17 00:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('grades', '0004_rename_is_student_user_is_staff'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='enrollment',
+            index=models.Index(fields=['updated_at', 'id'], name='enrollment_updated_id_idx'),
+        ),
+    ]
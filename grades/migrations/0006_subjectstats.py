@@ -0,0 +1,53 @@
+# Generated by Django 4.2.30 on 2026-10-17 00:29
+
+from collections import defaultdict
+
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import Trim
+import django.db.models.deletion
+
+
+def build_subject_stats(apps, schema_editor):
+    # seed the summary table for subjects/enrollments that already exist (a frozen copy of
+    # grades.stats.compute_subject_stats as of this migration, on the historical models)
+    Subject = apps.get_model('grades', 'Subject')
+    Enrollment = apps.get_model('grades', 'Enrollment')
+    SubjectStats = apps.get_model('grades', 'SubjectStats')
+    totals = dict(Enrollment.objects.values_list('subject_id').annotate(n=Count('id')).order_by())
+    distributions = defaultdict(dict)
+    grade_counts = (Enrollment.objects.filter(grade__isnull=False).annotate(g=Trim('grade')).exclude(g='')
+                    .values_list('subject_id', 'g').annotate(n=Count('id')).order_by())
+    for subject_id, grade, n in grade_counts:
+        distributions[subject_id][grade] = n
+    SubjectStats.objects.bulk_create(
+        (SubjectStats(
+            subject_id=subject_id,
+            enrollment_count=totals.get(subject_id, 0),
+            graded_count=sum(distributions[subject_id].values()),
+            grade_distribution=distributions[subject_id],
+        ) for subject_id in Subject.objects.values_list('id', flat=True)),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('grades', '0005_enrollment_updated_id_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SubjectStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('enrollment_count', models.PositiveIntegerField(default=0)),
+                ('graded_count', models.PositiveIntegerField(default=0)),
+                ('grade_distribution', models.JSONField(default=dict)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('subject', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='stats', to='grades.subject')),
+            ],
+        ),
+        migrations.RunPython(build_subject_stats, migrations.RunPython.noop),
+    ]
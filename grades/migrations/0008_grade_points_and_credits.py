@@ -0,0 +1,58 @@
+# Generated by Django 4.2.30 on 2026-10-17 01:19
+
+from decimal import Decimal, InvalidOperation
+
+from django.db import migrations, models
+
+# frozen copy of grades.grading as of this migration
+GRADE_POINTS = {
+    'A+': Decimal('4.00'), 'A': Decimal('4.00'), 'A-': Decimal('3.70'),
+    'B+': Decimal('3.30'), 'B': Decimal('3.00'), 'B-': Decimal('2.70'),
+    'C+': Decimal('2.30'), 'C': Decimal('2.00'), 'C-': Decimal('1.70'),
+    'D+': Decimal('1.30'), 'D': Decimal('1.00'), 'D-': Decimal('0.70'),
+    'F': Decimal('0.00'),
+}
+MAX_GRADE_POINTS = Decimal('4.00')
+
+
+def grade_points(grade):
+    text = str(grade).strip().upper()
+    if text in GRADE_POINTS:
+        return GRADE_POINTS[text]
+    try:
+        value = Decimal(text)
+    except InvalidOperation:
+        return None
+    if not value.is_finite() or not 0 <= value <= MAX_GRADE_POINTS:
+        return None
+    return value.quantize(Decimal('0.01'))
+
+
+def fill_grade_points(apps, schema_editor):
+    # one UPDATE per distinct grade text rather than one per enrollment
+    Enrollment = apps.get_model('grades', 'Enrollment')
+    for grade in Enrollment.objects.exclude(grade__isnull=True).values_list('grade', flat=True).distinct():
+        points = grade_points(grade)
+        if points is not None:
+            Enrollment.objects.filter(grade=grade).update(grade_points=points)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('grades', '0007_updated_at_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='enrollment',
+            name='grade_points',
+            field=models.DecimalField(blank=True, db_index=True, decimal_places=2, editable=False, max_digits=3, null=True),
+        ),
+        migrations.AddField(
+            model_name='subject',
+            name='credits',
+            field=models.PositiveSmallIntegerField(default=1),
+        ),
+        migrations.RunPython(fill_grade_points, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,107 @@
+# Generated by Django 4.2.30 on 2026-10-17 01:25
+
+from django.db import migrations, models
+import django.db.models.functions.comparison
+import django.db.models.functions.text
+import django.db.models.lookups
+
+# Subject name search (grades.filters.SubjectSearchFilter).
+# SQLite: an external-content FTS5 table kept in step with grades_subject by triggers. A later
+# migration that makes SQLite rebuild grades_subject drops the triggers and must recreate them.
+SQLITE_SEARCH = [
+    """CREATE VIRTUAL TABLE grades_subject_fts USING fts5(
+        name, content='grades_subject', content_rowid='id', tokenize='unicode61 remove_diacritics 2', prefix='2 3')""",
+    """CREATE TRIGGER grades_subject_fts_insert AFTER INSERT ON grades_subject BEGIN
+        INSERT INTO grades_subject_fts(rowid, name) VALUES (new.id, new.name);
+    END""",
+    """CREATE TRIGGER grades_subject_fts_delete AFTER DELETE ON grades_subject BEGIN
+        INSERT INTO grades_subject_fts(grades_subject_fts, rowid, name) VALUES ('delete', old.id, old.name);
+    END""",
+    """CREATE TRIGGER grades_subject_fts_update AFTER UPDATE OF name ON grades_subject BEGIN
+        INSERT INTO grades_subject_fts(grades_subject_fts, rowid, name) VALUES ('delete', old.id, old.name);
+        INSERT INTO grades_subject_fts(rowid, name) VALUES (new.id, new.name);
+    END""",
+    "INSERT INTO grades_subject_fts(grades_subject_fts) VALUES ('rebuild')",
+]
+SQLITE_SEARCH_REVERSE = [
+    'DROP TRIGGER IF EXISTS grades_subject_fts_insert',
+    'DROP TRIGGER IF EXISTS grades_subject_fts_delete',
+    'DROP TRIGGER IF EXISTS grades_subject_fts_update',
+    'DROP TABLE IF EXISTS grades_subject_fts',
+]
+# PostgreSQL: a trigram index for the icontains (UPPER(...) LIKE) name search, and pattern-ops
+# indexes so LIKE 'prefix%' on the lowered email / names can use an index under any collation.
+POSTGRESQL_SEARCH = [
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    'CREATE INDEX subject_name_trgm_idx ON grades_subject USING gin ((UPPER("name"::text)) gin_trgm_ops)',
+    'CREATE INDEX user_email_lower_like_idx ON grades_user ((LOWER("email"::text)) text_pattern_ops)',
+    'CREATE INDEX user_first_name_lower_like_idx ON grades_user ((LOWER("first_name"::text)) text_pattern_ops)',
+    'CREATE INDEX user_last_name_lower_like_idx ON grades_user ((LOWER("last_name"::text)) text_pattern_ops)',
+]
+POSTGRESQL_SEARCH_REVERSE = [
+    'DROP INDEX IF EXISTS subject_name_trgm_idx',
+    'DROP INDEX IF EXISTS user_email_lower_like_idx',
+    'DROP INDEX IF EXISTS user_first_name_lower_like_idx',
+    'DROP INDEX IF EXISTS user_last_name_lower_like_idx',
+]
+
+
+def _run(statements_by_vendor):
+    def run(apps, schema_editor):
+        for statement in statements_by_vendor.get(schema_editor.connection.vendor, ()):
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('grades', '0008_grade_points_and_credits'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='enrollment',
+            index=models.Index(fields=['subject', 'updated_at', 'id'], name='enrollment_subject_upd_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='enrollment',
+            index=models.Index(fields=['student', 'updated_at', 'id'], name='enrollment_student_upd_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='enrollment',
+            index=models.Index(django.db.models.functions.text.Trim('grade'), models.F('updated_at'), models.F('id'), name='enrollment_grade_upd_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='enrollment',
+            index=models.Index(condition=models.Q(django.db.models.lookups.GreaterThan(django.db.models.functions.comparison.Coalesce(django.db.models.functions.text.Length(django.db.models.functions.text.Trim('grade')), 0), 0)), fields=['updated_at', 'id'], name='enrollment_graded_upd_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='enrollment',
+            index=models.Index(condition=models.Q(django.db.models.lookups.Exact(django.db.models.functions.comparison.Coalesce(django.db.models.functions.text.Length(django.db.models.functions.text.Trim('grade')), 0), 0)), fields=['updated_at', 'id'], name='enrollment_ungraded_upd_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(django.db.models.functions.text.Lower('email'), name='user_email_lower_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(django.db.models.functions.text.Lower('first_name'), name='user_first_name_lower_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(django.db.models.functions.text.Lower('last_name'), name='user_last_name_lower_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(condition=models.Q(('is_admin', False), ('is_staff', False)), fields=['id'], name='user_student_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(condition=models.Q(('is_staff', True), ('is_admin', True), _connector='OR'), fields=['id'], name='user_staff_idx'),
+        ),
+        migrations.RunPython(
+            _run({'sqlite': SQLITE_SEARCH, 'postgresql': POSTGRESQL_SEARCH}),
+            _run({'sqlite': SQLITE_SEARCH_REVERSE, 'postgresql': POSTGRESQL_SEARCH_REVERSE}),
+        ),
+    ]
@@ -0,0 +1,36 @@
+from django.db import migrations
+
+TEACHER_PERMISSIONS = [
+    ('add', 'subject'), ('change', 'subject'), ('view', 'subject'),
+    ('add', 'enrollment'), ('change', 'enrollment'), ('view', 'enrollment'),
+]
+
+
+def grant_teacher_permissions(apps, schema_editor):
+    # 0003 ran before Django created the permission rows (they are created after `migrate`),
+    # so on a fresh database the Teacher group ended up empty. Create the rows now, as Django's
+    # post_migrate handler would (it then finds them and skips them), and re-grant.
+    ContentType = apps.get_model('contenttypes', 'ContentType')
+    Group = apps.get_model('auth', 'Group')
+    Permission = apps.get_model('auth', 'Permission')
+    teacher_group, _ = Group.objects.get_or_create(name='Teacher')
+    for action, model_name in TEACHER_PERMISSIONS:
+        content_type, _ = ContentType.objects.get_or_create(app_label='grades', model=model_name)
+        verbose_name = apps.get_model('grades', model_name)._meta.verbose_name
+        permission, _ = Permission.objects.get_or_create(
+            content_type=content_type, codename=f'{action}_{model_name}',
+            defaults={'name': f'Can {action} {verbose_name}'})
+        teacher_group.permissions.add(permission)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('grades', '0011_jobs'),
+    ]
+
+    operations = [
+        migrations.RunPython(grant_teacher_permissions, migrations.RunPython.noop),
+    ]
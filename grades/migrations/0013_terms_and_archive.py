@@ -0,0 +1,51 @@
+# Generated by Django 4.2.30 on 2026-10-17 02:13
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('grades', '0012_grant_teacher_permissions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Term',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('starts_on', models.DateField()),
+                ('ends_on', models.DateField()),
+                ('archived_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ('starts_on',),
+                'constraints': [
+                    models.CheckConstraint(check=models.Q(('ends_on__gte', models.F('starts_on'))), name='term_ends_after_start'),
+                ],
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedEnrollment',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('grade', models.CharField(blank=True, max_length=10, null=True)),
+                ('grade_points', models.DecimalField(blank=True, decimal_places=2, max_digits=3, null=True)),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_enrollments', to=settings.AUTH_USER_MODEL)),
+                ('subject', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='archived_enrollments', to='grades.subject')),
+                ('term', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='archived_enrollments', to='grades.term')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='enrollment',
+            index=models.Index(fields=['created_at', 'id'], name='enrollment_created_id_idx'),
+        ),
+    ]
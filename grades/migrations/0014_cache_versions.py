@@ -0,0 +1,30 @@
+# Generated by Django 4.2.30 on 2026-10-17 02:32
+
+import time
+
+from django.db import migrations, models
+
+
+def create_scopes(apps, schema_editor):
+    # like response_cache._create_missing: start from the clock, above any version cached so far
+    CacheVersion = apps.get_model('grades', 'CacheVersion')
+    CacheVersion.objects.bulk_create(
+        [CacheVersion(scope=scope, version=time.time_ns()) for scope in ('subjects', 'enrollments')])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('grades', '0013_terms_and_archive'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CacheVersion',
+            fields=[
+                ('scope', models.CharField(max_length=20, primary_key=True, serialize=False)),
+                ('version', models.BigIntegerField()),
+            ],
+        ),
+        migrations.RunPython(create_scopes, migrations.RunPython.noop),
+    ]
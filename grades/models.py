@@ -1,6 +1,20 @@
 from django.db import models
+from django.db.models import F, Q
+from django.db.models.functions import Coalesce, Length, Lower, Trim
+from django.db.models.lookups import Exact, GreaterThan
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, PermissionsMixin
 
+from .grading import grade_points
+
+# Row conditions shared by the list filters (grades.filters) and the partial indexes backing them;
+# a partial index is only used when the query repeats its condition exactly.
+STUDENT = Q(is_staff=False, is_admin=False)
+STAFF = Q(is_staff=True) | Q(is_admin=True)
+# same "graded" rule as grades.stats.is_graded: a grade that is not blank after trimming
+_GRADE_LENGTH = Coalesce(Length(Trim('grade')), 0)
+GRADED = Q(GreaterThan(_GRADE_LENGTH, 0))
+UNGRADED = Q(Exact(_GRADE_LENGTH, 0))
+
 
 class UserManager(BaseUserManager):
     """
@@ -36,6 +50,7 @@ class User(AbstractBaseUser, PermissionsMixin):
     - is_staff: standard Django flag used by admin checks (grants admin access in many places).
     - is_admin: an explicit boolean used in our permission helpers to mark admin roles.
     - date_joined: timestamp when the account was created.
+    - updated_at: last time the account changed (indexed; drives ETags of payloads that embed users).
 
     Notes:
     - We set USERNAME_FIELD = 'email' so all auth uses the email address.
@@ -49,10 +64,21 @@ class User(AbstractBaseUser, PermissionsMixin):
     is_staff = models.BooleanField(default=False)
     is_admin = models.BooleanField(default=False)
     date_joined = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     # attach the custom manager
     objects = UserManager()
 
+    class Meta:
+        # case-insensitive email / name prefix filters and the student / staff lists (grades.filters)
+        indexes = [
+            models.Index(Lower('email'), name='user_email_lower_idx'),
+            models.Index(Lower('first_name'), name='user_first_name_lower_idx'),
+            models.Index(Lower('last_name'), name='user_last_name_lower_idx'),
+            models.Index(fields=['id'], condition=STUDENT, name='user_student_idx'),
+            models.Index(fields=['id'], condition=STAFF, name='user_staff_idx'),
+        ]
+
     # use email as the unique identifier for authentication
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = []
@@ -69,6 +95,7 @@ class Subject(models.Model):
 
     Fields:
     - name: human-readable subject name. Unique to prevent duplicate subject names.
+    - credits: weight of the subject in transcript GPAs / credit totals.
     - created_at / updated_at: automatic timestamps for auditing (bonus requirement).
 
     Important constraint:
@@ -76,8 +103,10 @@ class Subject(models.Model):
     """
 
     name = models.CharField(max_length=100, unique=True)
+    credits = models.PositiveSmallIntegerField(default=1)
     created_at = models.DateTimeField(auto_now_add=True)
-    updated_at = models.DateTimeField(auto_now=True)
+    # indexed: MAX(updated_at) is read on every conditional GET of the subject catalog
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     class Meta:
         # name is unique via the field attribute; kept explicit for clarity
@@ -96,6 +125,8 @@ class Enrollment(models.Model):
       convenient reverse lookups: student.enrollments.all().
     - subject: FK to `Subject` with `related_name='enrollments'` so subject.enrollments.all() works.
     - grade: short string for grade (blank/null allowed per requirement: a student may initially have a blank grade).
+    - grade_points: `grade` on the 4.0 scale (grades.grading.grade_points), or null when the grade
+      has no numeric value. Set by save(); bulk_create / bulk_update callers set it themselves.
     - created_at / updated_at: timestamps for audit/history.
 
     Constraints / business rules:
@@ -108,12 +139,242 @@ class Enrollment(models.Model):
     subject = models.ForeignKey(Subject, on_delete=models.CASCADE, related_name='enrollments')
     # grade is allowed to be blank initially (blank=True, null=True)
     grade = models.CharField(max_length=10, blank=True, null=True)
+    # indexed for GPA aggregates and grade range filters
+    grade_points = models.DecimalField(max_digits=3, decimal_places=2, null=True, blank=True,
+                                       editable=False, db_index=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         # Ensure a given (student, subject) pair can only exist once at DB-level
         unique_together = (('student', 'subject'),)
+        # backs the (updated_at, id) keyset ordering used to paginate enrollments, alone and
+        # under each list filter (grades.filters)
+        indexes = [
+            models.Index(fields=['updated_at', 'id'], name='enrollment_updated_id_idx'),
+            models.Index(fields=['subject', 'updated_at', 'id'], name='enrollment_subject_upd_idx'),
+            models.Index(fields=['student', 'updated_at', 'id'], name='enrollment_student_upd_idx'),
+            models.Index(Trim('grade'), F('updated_at'), F('id'), name='enrollment_grade_upd_idx'),
+            models.Index(fields=['updated_at', 'id'], condition=GRADED, name='enrollment_graded_upd_idx'),
+            models.Index(fields=['updated_at', 'id'], condition=UNGRADED, name='enrollment_ungraded_upd_idx'),
+            # term archival (grades.archive) selects a closed term's rows by creation time
+            models.Index(fields=['created_at', 'id'], name='enrollment_created_id_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        # keep the numeric grade in step with the free-text one
+        self.grade_points = grade_points(self.grade)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'grade' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'grade_points'}
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.student.email} - {self.subject.name} ({self.grade})"
+
+
+class Term(models.Model):
+    """
+    Academic period (semester, trimester, ...). An enrollment belongs to the term its
+    created_at falls in.
+
+    Fields:
+    - name: unique label ("2024 Fall").
+    - starts_on / ends_on: first and last day of the term (inclusive, in settings.TIME_ZONE).
+    - archived_at: when `manage.py archive_terms` last moved the term's enrollments to
+      ArchivedEnrollment; null while the term is current or not archived yet.
+    - created_at / updated_at: timestamps.
+
+    A term is closed once ends_on has passed; only closed terms are archived.
+    """
+
+    name = models.CharField(max_length=50, unique=True)
+    starts_on = models.DateField()
+    ends_on = models.DateField()
+    archived_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ('starts_on',)
+        constraints = [
+            models.CheckConstraint(check=Q(ends_on__gte=F('starts_on')), name='term_ends_after_start'),
+        ]
+
+    def __str__(self):
+        return self.name
+
+
+class ArchivedEnrollment(models.Model):
+    """
+    Enrollment of a closed term, moved out of the Enrollment table by `manage.py archive_terms`
+    (grades.archive) so the table every enrollment request queries only holds current terms.
+
+    Fields:
+    - id: the enrollment's id (ids are never reused, so they stay unique across both tables).
+    - term: the term it was archived with.
+    - student / subject / grade / grade_points / created_at / updated_at: copied unchanged.
+    - archived_at: when the row was moved.
+
+    Archived rows are read-only history: transcripts and gradebook exports include them, the
+    enrollment list / detail / sync endpoints do not. A subject with archived enrollments
+    cannot be deleted; deleting a student deletes theirs.
+    """
+
+    id = models.BigIntegerField(primary_key=True)
+    term = models.ForeignKey(Term, on_delete=models.PROTECT, related_name='archived_enrollments')
+    student = models.ForeignKey(User, on_delete=models.CASCADE, related_name='archived_enrollments')
+    subject = models.ForeignKey(Subject, on_delete=models.PROTECT, related_name='archived_enrollments')
+    grade = models.CharField(max_length=10, blank=True, null=True)
+    grade_points = models.DecimalField(max_digits=3, decimal_places=2, null=True, blank=True)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.student.email} - {self.subject.name} ({self.grade}, {self.term.name})"
+
+
+class SubjectStats(models.Model):
+    """
+    Per-subject enrollment/grade summary, maintained incrementally.
+
+    Fields:
+    - subject: the Subject summarized (one row per subject).
+    - enrollment_count: number of enrollments in the subject.
+    - graded_count: enrollments with a non-blank grade (same "graded" rule as the delete guards).
+    - grade_distribution: {grade: count} over graded enrollments (grade stripped of whitespace).
+    - updated_at: last time the row changed.
+
+    Rows are updated by Enrollment signals and the bulk enrollment endpoint (see grades.stats),
+    and can be recomputed from scratch with `manage.py rebuild_subject_stats`.
+    """
+
+    subject = models.OneToOneField(Subject, on_delete=models.CASCADE, related_name='stats')
+    enrollment_count = models.PositiveIntegerField(default=0)
+    graded_count = models.PositiveIntegerField(default=0)
+    grade_distribution = models.JSONField(default=dict)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    @property
+    def ungraded_count(self):
+        return self.enrollment_count - self.graded_count
+
+    def __str__(self):
+        return f"{self.subject_id}: {self.graded_count}/{self.enrollment_count} graded"
+
+
+class Tombstone(models.Model):
+    """
+    Record of a deleted Subject / Enrollment / User, served by the delta sync endpoint
+    (grades.sync) so clients mirroring the data can drop the row.
+
+    Fields:
+    - model: which table the row was deleted from ('subject', 'enrollment' or 'user').
+    - object_id: primary key of the deleted row.
+    - student_id: the student of a deleted enrollment (scopes students' syncs), else null.
+      A plain integer: the student may be deleted as well.
+    - deleted_at: when the row was deleted; (deleted_at, id) is the sync cursor.
+
+    Rows are written by post_delete signals and removed after settings.GRADES_SYNC_TOMBSTONE_DAYS
+    by `manage.py prune_tombstones`; sync tokens older than that are refused.
+    """
+
+    SUBJECT = 'subject'
+    ENROLLMENT = 'enrollment'
+    USER = 'user'
+    MODEL_CHOICES = ((SUBJECT, 'Subject'), (ENROLLMENT, 'Enrollment'), (USER, 'User'))
+
+    model = models.CharField(max_length=20, choices=MODEL_CHOICES)
+    object_id = models.BigIntegerField()
+    student_id = models.BigIntegerField(null=True, blank=True)
+    deleted_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        # sync cursor; students' syncs filter the same range (recent deletions are few)
+        indexes = [
+            models.Index(fields=['deleted_at', 'id'], name='tombstone_deleted_id_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.model} {self.object_id} deleted {self.deleted_at:%Y-%m-%d %H:%M:%S}"
+
+
+class CacheVersion(models.Model):
+    """
+    Invalidation counter of one response cache scope (grades.response_cache).
+
+    Fields:
+    - scope: what cached payloads were built from ('subjects', 'enrollments').
+    - version: part of every cache key built from the scope. Incremented once the write that
+      changes the scope commits (one UPDATE per transaction), so every worker process sees the
+      new version right after it, whatever cache backend holds the payloads.
+    """
+
+    scope = models.CharField(max_length=20, primary_key=True)
+    version = models.BigIntegerField()
+
+    def __str__(self):
+        return f"{self.scope} v{self.version}"
+
+
+class Job(models.Model):
+    """
+    Background job (CSV user import, gradebook export, statistics rebuild) run by
+    `manage.py run_jobs` workers instead of the request thread; see grades.jobs.
+
+    Fields:
+    - kind: which handler runs it (grades.jobs.HANDLERS).
+    - params: handler options (e.g. export output / subject).
+    - input_file: uploaded input (the import CSV); result_file: downloadable output (the export).
+    - status: queued -> running -> succeeded | failed.
+    - progress / total: rows processed so far, and the expected number when known.
+    - result: the handler's report (e.g. the import report); error: why a failed job failed.
+    - created_by: who queued it; staff see every job, others only their own.
+    - locked_by / locked_until: the worker holding the job and its lease. A running job whose
+      lease expired (crashed worker) is claimed again, up to GRADES_JOBS_MAX_ATTEMPTS times.
+    - attempts, created_at / started_at / finished_at / updated_at: bookkeeping.
+    """
+
+    IMPORT_USERS = 'import_users'
+    EXPORT_GRADEBOOK = 'export_gradebook'
+    REBUILD_STATS = 'rebuild_stats'
+    KIND_CHOICES = (
+        (IMPORT_USERS, 'Import users'),
+        (EXPORT_GRADEBOOK, 'Export gradebook'),
+        (REBUILD_STATS, 'Rebuild subject statistics'),
+    )
+
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+    STATUS_CHOICES = ((QUEUED, 'Queued'), (RUNNING, 'Running'), (SUCCEEDED, 'Succeeded'), (FAILED, 'Failed'))
+
+    kind = models.CharField(max_length=30, choices=KIND_CHOICES)
+    params = models.JSONField(default=dict, blank=True)
+    input_file = models.FileField(upload_to='jobs/input/', blank=True)
+    result_file = models.FileField(upload_to='jobs/results/', blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    progress = models.PositiveIntegerField(default=0)
+    total = models.PositiveIntegerField(null=True, blank=True)
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    created_by = models.ForeignKey(User, null=True, blank=True, on_delete=models.SET_NULL, related_name='jobs')
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_until = models.DateTimeField(null=True, blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        # workers claim the oldest queued job, or a running one whose lease expired
+        indexes = [
+            models.Index(fields=['status', 'id'], name='job_status_idx'),
+            models.Index(fields=['created_by', 'id'], name='job_created_by_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} #{self.pk} ({self.status})"
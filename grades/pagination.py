@@ -0,0 +1,108 @@
+import json
+import operator
+from functools import reduce
+
+from django.conf import settings
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination, _reverse_ordering
+
+
+class IdCursorPagination(CursorPagination):
+    """
+    Keyset (cursor) pagination ordered by primary key.
+
+    - Cursors encode the last seen position, so each page is a `WHERE id > ...` range scan
+      on the primary key index and no COUNT(*) is issued.
+    - Clients may ask for smaller/larger pages with ?page_size=, capped by
+      settings.GRADES_MAX_PAGE_SIZE.
+    """
+    ordering = ('id',)
+    page_size_query_param = 'page_size'
+    max_page_size = getattr(settings, 'GRADES_MAX_PAGE_SIZE', 500)
+
+
+class KeysetCursorPagination(IdCursorPagination):
+    """
+    Cursor pagination over several columns whose last one is unique, e.g. ('updated_at', 'id').
+
+    DRF's CursorPagination keeps only the first column in the cursor and steps over rows that
+    share it with an OFFSET. Here the cursor holds the last row's value of every column and each
+    page is a true keyset range, `WHERE (updated_at, id) > (x, y)`: rows touched in the same
+    instant are neither skipped nor repeated, however many there are.
+    """
+
+    def paginate_queryset(self, queryset, request, view=None):
+        # CursorPagination.paginate_queryset with its first-column filter replaced by keyset()
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+        offset, reverse, current_position = self.cursor or (0, False, None)
+
+        queryset = queryset.order_by(*(_reverse_ordering(self.ordering) if reverse else self.ordering))
+        if current_position is not None:
+            queryset = queryset.filter(self.keyset(json.loads(current_position), reverse))
+
+        results = list(queryset[offset:offset + self.page_size + 1])
+        self.page = results[:self.page_size]
+        following_position = None
+        if len(results) > len(self.page):
+            following_position = self._get_position_from_instance(results[-1], self.ordering)
+
+        if reverse:
+            self.page.reverse()
+            self.has_next = current_position is not None or offset > 0
+            self.has_previous = following_position is not None
+            self.next_position, self.previous_position = current_position, following_position
+        else:
+            self.has_next = following_position is not None
+            self.has_previous = current_position is not None or offset > 0
+            self.next_position, self.previous_position = following_position, current_position
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+        return self.page
+
+    def keyset(self, values, reverse):
+        """Rows after `values` in the ordering (before them for a reversed cursor)."""
+        # (a, b) > (x, y)  is  a > x OR (a = x AND b > y); the leading a >= x lets the database
+        # range-scan the composite index
+        clauses, equal = [], {}
+        for field, value in zip(self.ordering, values):
+            name = field.lstrip('-')
+            lookup = '__lt' if reverse != field.startswith('-') else '__gt'
+            clauses.append(Q(**equal, **{name + lookup: value}))
+            equal[name] = value
+        first = self.ordering[0].lstrip('-')
+        bound = '__lte' if reverse != self.ordering[0].startswith('-') else '__gte'
+        return Q(**{first + bound: values[0]}) & reduce(operator.or_, clauses)
+
+    def decode_cursor(self, request):
+        cursor = super().decode_cursor(request)
+        if cursor is not None and cursor.position is not None:
+            try:
+                values = json.loads(cursor.position)
+            except ValueError:
+                raise NotFound(self.invalid_cursor_message)
+            if not isinstance(values, list) or len(values) != len(self.ordering):
+                raise NotFound(self.invalid_cursor_message)
+        return cursor
+
+    def _get_position_from_instance(self, instance, ordering):
+        # every ordering column, not just the first (JSON keeps the cursor ASCII)
+        names = [field.lstrip('-') for field in ordering]
+        if isinstance(instance, dict):
+            values = [instance[name] for name in names]
+        else:
+            values = [getattr(instance, name) for name in names]
+        return json.dumps([str(value) for value in values], separators=(',', ':'))
+
+
+class UpdatedAtCursorPagination(KeysetCursorPagination):
+    """Keyset pagination ordered by (updated_at, id), backed by a composite index."""
+    ordering = ('updated_at', 'id')
@@ -1,9 +1,24 @@
 from rest_framework import permissions
 
+from .roles import request_access
+
+
+class IsStaffRole(permissions.BasePermission):
+    """
+    Staff-only endpoints: users with is_staff or is_admin (role admin / staff in grades.roles).
+    Resolved from the cached Access, so no queries once the user's entry is warm.
+    """
+
+    def has_permission(self, request, view):
+        return request_access(request).is_staff
+
+
 class IsAdminOrReadOnly(permissions.BasePermission):
     """
-    Allow safe (read-only) methods for everyone; only staff/admin users may create/update/delete.
-    Uses getattr(...) to avoid AttributeError when request.user is AnonymousUser.
+    Allow safe (read-only) methods for everyone; writes need the model permission for the
+    method (POST add, PUT/PATCH change, DELETE delete) on the view's model.
+    - staff/admin users hold every permission (grades.roles.Access.can)
+    - Teachers get add/change on subjects through the Teacher group, but not delete
     """
 
     def has_permission(self, request, view):
@@ -11,17 +26,20 @@ class IsAdminOrReadOnly(permissions.BasePermission):
         if request.method in permissions.SAFE_METHODS:
             return True
 
-        # For non-safe methods require an authenticated user who is staff or has is_admin flag.
-        user = request.user
-        # Make sure user is authenticated and check attributes safely
-        return bool(user and user.is_authenticated and (user.is_staff or getattr(user, "is_admin", False)))
+        access = request_access(request)
+        queryset = getattr(view, 'queryset', None)
+        if queryset is None:
+            # no model to check a permission against: staff only, as before
+            return access.is_staff
+        return access.can_model(queryset.model, request.method)
 
 
 class IsOwnerOrAdmin(permissions.BasePermission):
     """
     Object-level permission for Enrollment objects:
-    - Safe methods: allowed for owner (student) or admin/staff
-    - Write methods: allowed for owner (student) or admin/staff
+    - Owner (student): any method, as before
+    - Anyone else: the model permission for the method (view / change / delete_enrollment);
+      staff/admin hold all of them, Teachers view and change but not delete
     """
 
     def has_object_permission(self, request, view, obj):
@@ -30,11 +48,6 @@ class IsOwnerOrAdmin(permissions.BasePermission):
         if not user or not user.is_authenticated:
             return False
 
-        is_admin_or_staff = user.is_staff or getattr(user, "is_admin", False)
-        is_owner = getattr(obj, "student", None) == user
-
-        if request.method in permissions.SAFE_METHODS:
-            return is_admin_or_staff or is_owner
-
-        # For unsafe methods allow owner or admin/staff
-        return is_admin_or_staff or is_owner
\ No newline at end of file
+        if getattr(obj, "student_id", None) == user.pk:
+            return True
+        return request_access(request).can_model(type(obj), request.method)
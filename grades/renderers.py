@@ -0,0 +1,51 @@
+import io
+
+import orjson
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+
+class ORJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer producing the same bytes with orjson.
+
+    - Types orjson does not handle natively (lazy strings, Decimal, datetimes, querysets, ...)
+      go through DRF's JSONEncoder.default, so they render exactly as before.
+    - Falls back to the stdlib encoder for indented output (`; indent=` media type parameter,
+      browsable API), non-compact or ASCII-only settings and integers beyond 64 bits.
+    - NaN/Infinity floats render as null (the stdlib encoder rejects them under the default
+      STRICT_JSON); no API field produces them.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if (self.ensure_ascii or not self.compact
+                or self.get_indent(accepted_media_type, renderer_context or {}) is not None):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(data, default=self.encoder_class().default,
+                               option=orjson.OPT_PASSTHROUGH_DATETIME)
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        # same strict-javascript-subset escaping as JSONRenderer
+        return ret.replace('\u2028'.encode(), b'\\u2028').replace('\u2029'.encode(), b'\\u2029')
+
+
+class ORJSONParser(JSONParser):
+    """
+    JSONParser using orjson for UTF-8 bodies. Bodies orjson rejects are re-parsed by the
+    stdlib parser, so accepted input (NaN/Infinity unless STRICT_JSON) and error messages
+    are unchanged.
+    """
+    renderer_class = ORJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        body = stream.read()
+        encoding = (parser_context or {}).get('encoding', 'utf-8')
+        if encoding.lower().replace('-', '') == 'utf8':
+            try:
+                return orjson.loads(body)
+            except orjson.JSONDecodeError:
+                pass
+        return super().parse(io.BytesIO(body), media_type, parser_context)
@@ -0,0 +1,96 @@
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import F
+
+from .models import CacheVersion
+
+# Version scopes: what a cached payload was built from.
+SUBJECTS = 'subjects'        # Subject rows
+ENROLLMENTS = 'enrollments'  # Enrollment rows and the student emails embedded next to them
+
+_stats = {'hits': 0, 'misses': 0}
+_stats_lock = threading.Lock()
+
+# scopes bumped by this thread's open transaction, written once it commits
+_pending = threading.local()
+
+
+def _cache():
+    return caches[getattr(settings, 'GRADES_RESPONSE_CACHE_ALIAS', 'default')]
+
+
+def _create_missing(scopes):
+    # a scope without a row starts from the clock, so it can never fall back to a number
+    # that entries cached before its row was lost (e.g. a flushed table) used
+    CacheVersion.objects.bulk_create(
+        [CacheVersion(scope=scope, version=time.time_ns()) for scope in scopes], ignore_conflicts=True)
+
+
+def current_versions(*scopes):
+    """
+    Current version number of each scope, read from the CacheVersion table (one query). The
+    database, not the cache, holds the versions, so a bump is seen by every worker process.
+    """
+    found = dict(CacheVersion.objects.filter(scope__in=scopes).values_list('scope', 'version'))
+    missing = [scope for scope in scopes if scope not in found]
+    if missing:
+        _create_missing(missing)
+        found.update(CacheVersion.objects.filter(scope__in=missing).values_list('scope', 'version'))
+    return tuple(found[scope] for scope in scopes)
+
+
+def bump_versions(*scopes):
+    """
+    Invalidate every cached payload built from `scopes`.
+
+    The counters are incremented once the current transaction commits (right away in
+    autocommit), in one UPDATE however many writes the transaction made. Incrementing them
+    inside it would hold the shared 'enrollments' row locked until every writer commits, so
+    writers to unrelated enrollments would queue behind each other. The cost is a window between
+    the commit and the bump in which a reader can still be answered from the old version.
+    """
+    pending = getattr(_pending, 'scopes', None)
+    if pending is None:
+        pending = _pending.scopes = set()
+    pending.update(scopes)
+    # every call registers the flush: rolling back a savepoint drops the callbacks registered
+    # in it, and the transaction's later writes still need one. The scopes of a transaction
+    # that rolled back are flushed with the next commit, an extra (harmless) invalidation.
+    transaction.on_commit(_flush_versions)
+
+
+def _flush_versions():
+    scopes = sorted(getattr(_pending, 'scopes', ()))
+    if not scopes:
+        return
+    _pending.scopes = set()
+    if CacheVersion.objects.filter(scope__in=scopes).update(version=F('version') + 1) < len(scopes):
+        present = set(CacheVersion.objects.filter(scope__in=scopes).values_list('scope', flat=True))
+        _create_missing([scope for scope in scopes if scope not in present])
+
+
+def response_cache_stats():
+    """Snapshot of hit/miss counters for this process."""
+    with _stats_lock:
+        return dict(_stats)
+
+
+def _count(name):
+    with _stats_lock:
+        _stats[name] += 1
+
+
+def get_cached(key):
+    entry = _cache().get(key)
+    _count('hits' if entry is not None else 'misses')
+    return entry
+
+
+def set_cached(key, entry):
+    # Freshness comes from the version in the key; the timeout only reclaims space held by
+    # entries of superseded versions.
+    _cache().set(key, entry, timeout=getattr(settings, 'GRADES_RESPONSE_CACHE_TTL', 3600))
@@ -0,0 +1,204 @@
+import time
+from dataclasses import dataclass
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.models import Permission
+from django.db.models import Q
+
+from .caching import invalidated_cache
+
+ADMIN = 'admin'
+STAFF = 'staff'
+TEACHER = 'teacher'
+STUDENT = 'student'
+
+# group created by migration 0003 (permissions re-granted by 0012)
+TEACHER_GROUP = 'Teacher'
+
+# model permission needed for each HTTP method (DjangoModelPermissions' mapping)
+METHOD_ACTIONS = {
+    'GET': 'view', 'HEAD': 'view', 'OPTIONS': 'view',
+    'POST': 'add', 'PUT': 'change', 'PATCH': 'change', 'DELETE': 'delete',
+}
+
+_VERSION_KEY = 'grades:access-version'
+
+
+@dataclass(frozen=True)
+class Access:
+    """
+    A user's effective role and Django permissions ('app_label.codename').
+
+    - role: admin (is_admin / superuser), staff (is_staff), teacher (Teacher group) or
+      student; None for anonymous users.
+    - can(perm): staff and admins may do everything in the API, as before; other roles need
+      the permission through their groups or user permissions.
+    - permissions is None for staff and admins: their role comes from the user's flags and
+      the API never needs the set, so it is only loaded for has_perm() (RoleBackend).
+    """
+    role: object = None
+    permissions: frozenset = frozenset()
+
+    @property
+    def is_staff(self):
+        return self.role in (ADMIN, STAFF)
+
+    def can(self, perm):
+        # the API's "staff may do everything" rule; `permissions` stays the real set, which
+        # RoleBackend hands to has_perm() and the admin site
+        return self.is_staff or perm in self.permissions
+
+    def can_model(self, model, method):
+        """can() for the model permission matching an HTTP method (view / add / change / delete)."""
+        action = METHOD_ACTIONS.get(method.upper(), 'change')
+        return self.can(f'{model._meta.app_label}.{action}_{model._meta.model_name}')
+
+
+ANONYMOUS = Access()
+
+
+def _cache():
+    # (cache, timeout); short-lived when the alias is per-process, see grades.caching
+    return invalidated_cache(getattr(settings, 'GRADES_ROLE_CACHE_ALIAS', 'default'),
+                             getattr(settings, 'GRADES_ROLE_CACHE_TTL', 300))
+
+
+def _user_key(user_id):
+    return f'grades:access:{user_id}'
+
+
+def _version(cache, found):
+    # like the response cache versions: a missing version starts from the clock
+    version = found.get(_VERSION_KEY)
+    if version is None:
+        cache.add(_VERSION_KEY, time.time_ns(), timeout=None)
+        version = cache.get(_VERSION_KEY)
+    return version
+
+
+def _flag_role(user):
+    # admin / staff come from the user's own columns: no query
+    if user.is_superuser or getattr(user, 'is_admin', False):
+        return ADMIN
+    if user.is_staff:
+        return STAFF
+    return None
+
+
+def compute_permissions(user):
+    """The user's permissions ('app_label.codename') from the database: one query."""
+    perms = Permission.objects.order_by()
+    if not user.is_superuser:
+        perms = perms.filter(Q(group__user=user) | Q(user=user))
+    return frozenset(f'{app}.{codename}' for app, codename in perms.values_list('content_type__app_label', 'codename'))
+
+
+def compute_access(user):
+    """Access from the database: two queries (groups, permissions), none for staff and admins."""
+    role = _flag_role(user)
+    if role is not None:
+        return Access(role, None)
+    groups = set(user.groups.values_list('name', flat=True))
+    return Access(TEACHER if TEACHER_GROUP in groups else STUDENT, compute_permissions(user))
+
+
+def _cached(user):
+    # (cache, timeout, key, current version, cached Access or None); one cache round-trip when warm
+    cache, timeout = _cache()
+    key = _user_key(user.pk)
+    found = cache.get_many([_VERSION_KEY, key])
+    version = _version(cache, found)
+    entry = found.get(key)
+    return cache, timeout, key, version, entry[1] if entry is not None and entry[0] == version else None
+
+
+def access_for(user):
+    """
+    The user's Access, cached for settings.GRADES_ROLE_CACHE_TTL seconds.
+
+    No queries on a hit, and none at all for staff and admins. Entries are dropped by
+    grades.signals when the user, their groups or their own permissions change; changes to a
+    group's permissions (or to groups / permissions themselves) bump a version that retires
+    every entry. With a per-process cache (the default LocMemCache) other workers miss those
+    signals, so entries are kept only settings.GRADES_LOCAL_CACHE_TTL seconds there.
+    """
+    if user is None or not user.is_authenticated:
+        return ANONYMOUS
+    if not user.is_active:
+        return Access(STUDENT)
+    role = _flag_role(user)
+    if role is not None:
+        return Access(role, None)
+    cache, timeout, key, version, access = _cached(user)
+    if access is None:
+        access = compute_access(user)
+        cache.set(key, (version, access), timeout)
+    return access
+
+
+async def aaccess_for(user):
+    """access_for() for async code: a cached Access is returned without leaving the event loop."""
+    if user is None or not user.is_authenticated:
+        return ANONYMOUS
+    if not user.is_active:
+        return Access(STUDENT)
+    role = _flag_role(user)
+    if role is not None:
+        return Access(role, None)
+    cache, timeout, key, version, access = _cached(user)
+    if access is None:
+        access = await sync_to_async(compute_access)(user)
+        cache.set(key, (version, access), timeout)
+    return access
+
+
+def request_access(request):
+    """access_for(request.user), resolved once per request."""
+    access = getattr(request, '_grades_access', None)
+    if access is None:
+        access = access_for(request.user)
+        request._grades_access = access
+    return access
+
+
+async def arequest_access(request):
+    """request_access() for async views (grades.async_views): resolves without blocking the loop."""
+    access = getattr(request, '_grades_access', None)
+    if access is None:
+        access = await aaccess_for(request.user)
+        request._grades_access = access
+    return access
+
+
+def invalidate_user(user_id):
+    _cache()[0].delete(_user_key(user_id))
+
+
+def invalidate_all():
+    cache = _cache()[0]
+    try:
+        cache.incr(_VERSION_KEY)
+    except ValueError:
+        cache.add(_VERSION_KEY, time.time_ns(), timeout=None)
+
+
+class RoleBackend(ModelBackend):
+    """
+    ModelBackend whose permission lookups (user.has_perm, the admin site) are answered from
+    the cached Access instead of the group / permission queries ModelBackend runs per request.
+    Object permissions are not supported, as with ModelBackend.
+    """
+
+    def get_all_permissions(self, user_obj, obj=None):
+        if not user_obj.is_active or user_obj.is_anonymous or obj is not None:
+            return set()
+        if not hasattr(user_obj, '_grades_perm_cache'):
+            # kept on the user object like ModelBackend's _perm_cache: the admin site asks many
+            # times per request. Staff and admin Access carries no set; load theirs here.
+            permissions = access_for(user_obj).permissions
+            if permissions is None:
+                permissions = compute_permissions(user_obj)
+            user_obj._grades_perm_cache = set(permissions)
+        return user_obj._grades_perm_cache
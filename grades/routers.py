@@ -0,0 +1,246 @@
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+from django.http import HttpResponse
+from django.utils.functional import SimpleLazyObject, empty
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+# models whose reads may be served by a replica; everything else (tokens, sessions, groups,
+# jobs, tombstones, ...) stays on the primary
+REPLICA_MODELS = frozenset({'grades.subject', 'grades.enrollment', 'grades.user'})
+
+_request_state = ContextVar('grades_replica_routing', default=None)
+
+# replica alias -> time.monotonic() until which it is skipped (process-local)
+_down = {}
+_down_lock = threading.Lock()
+
+
+def replica_aliases():
+    return getattr(settings, 'GRADES_DB_REPLICAS', ())
+
+
+def _cache():
+    return caches[getattr(settings, 'GRADES_REPLICA_CACHE_ALIAS', 'default')]
+
+
+def _pin_key(user_id):
+    return f'grades:replica-pin:{user_id}'
+
+
+def pin_to_primary(user_id):
+    """Serve the user's reads from the primary for GRADES_REPLICA_STICKY_SECONDS (read-your-writes)."""
+    _cache().set(_pin_key(user_id), True, getattr(settings, 'GRADES_REPLICA_STICKY_SECONDS', 5))
+
+
+def mark_down(alias):
+    """Skip a replica for GRADES_REPLICA_RETRY_SECONDS after it failed."""
+    with _down_lock:
+        _down[alias] = time.monotonic() + getattr(settings, 'GRADES_REPLICA_RETRY_SECONDS', 30)
+    try:
+        connections[alias].close()
+    except DatabaseError:
+        pass
+
+
+def _skipped(alias):
+    until = _down.get(alias)
+    if until is None:
+        return False
+    if time.monotonic() < until:
+        return True
+    with _down_lock:
+        _down.pop(alias, None)
+    return False
+
+
+def _connect(alias):
+    try:
+        connections[alias].ensure_connection()
+    except DatabaseError:
+        mark_down(alias)
+        return False
+    return True
+
+
+def _request_user(request):
+    # the request's user once known without a query (DRF authentication stores it on the
+    # request), else `empty`: an unevaluated lazy user from AuthenticationMiddleware is left alone
+    user = request.__dict__.get('user', empty)
+    if isinstance(user, SimpleLazyObject):
+        user = user._wrapped
+    return empty if user is None else user
+
+
+class _RequestState:
+    __slots__ = ('request', 'safe', 'primary', 'alias', 'user_checked', 'failed')
+
+    def __init__(self, request):
+        self.request = request
+        self.safe = request.method in SAFE_METHODS
+        self.primary = not self.safe
+        self.alias = None
+        self.user_checked = False
+        self.failed = None  # replica alias that raised a DatabaseError while serving the request
+
+    def read_alias(self):
+        """The replica this request reads from, or None for the primary."""
+        if self.primary:
+            return None
+        if not self.user_checked:
+            user = _request_user(self.request)
+            if user is empty:
+                # not authenticated yet: the lookups that resolve the user go to the primary
+                return None
+            self.user_checked = True
+            if user.is_authenticated and _cache().get(_pin_key(user.pk)):
+                self.primary = True
+                return None
+        if self.alias is None:
+            # one replica per request, so paginated / related reads see one snapshot; only the
+            # one picked is connected to, replicas marked down are skipped without trying them
+            candidates = [alias for alias in replica_aliases() if not _skipped(alias)]
+            random.shuffle(candidates)
+            self.alias = next((alias for alias in candidates if _connect(alias)), None)
+        return self.alias
+
+
+@contextmanager
+def use_primary():
+    """Read from the primary for the rest of the block (e.g. to render a payload that gets cached)."""
+    state = _request_state.get()
+    if state is None or state.primary:
+        yield
+        return
+    state.primary = True
+    try:
+        yield
+    finally:
+        state.primary = False
+
+
+class ReadReplicaRouter:
+    """
+    Send reads of Subject, Enrollment and User made while serving a GET / HEAD / OPTIONS request
+    to a read replica (settings.GRADES_DB_REPLICAS); everything else uses the primary.
+
+    - Writes always go to the primary, also for objects that were loaded from a replica.
+    - Read-your-writes: after a user's own write request their reads stay on the primary for
+      GRADES_REPLICA_STICKY_SECONDS, long enough for the replicas to catch up.
+    - Reads inside a transaction on the primary stay there.
+    - A replica that cannot be reached is skipped for GRADES_REPLICA_RETRY_SECONDS and its
+      reads fall back to the primary.
+    Requests are tracked by ReplicaRoutingMiddleware; without it (management commands, jobs)
+    every query uses the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db:
+            # related lookups from a loaded object use the database it came from
+            return instance._state.db
+        state = _request_state.get()
+        if state is None or model._meta.label_lower not in REPLICA_MODELS:
+            return None
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return None
+        return state.read_alias()
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *replica_aliases()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in replica_aliases():
+            return False
+        return None
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Track the current request for ReadReplicaRouter.
+
+    - After an unsafe request by an authenticated user, pin that user to the primary.
+    - If a safe request fails with a database error while it read from a replica, the replica
+      is marked down and the request is served once more, from the primary.
+    - Removed from the stack when no replicas are configured.
+    - Async-capable: the request state is a context variable, which sync_to_async carries to
+      the thread the ORM runs in.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not replica_aliases():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        state = _RequestState(request)
+        token = _request_state.set(state)
+        try:
+            response = self.get_response(request)
+            if state.failed is not None:
+                # a replica failed mid-request: skip it and serve the request once more, from
+                # the primary
+                mark_down(state.failed)
+                state.alias = state.failed = None
+                state.primary = True
+                response = self.get_response(request)
+        finally:
+            _request_state.reset(token)
+        if not state.safe:
+            self._pin(request)
+        return response
+
+    async def __acall__(self, request):
+        state = _RequestState(request)
+        token = _request_state.set(state)
+        try:
+            response = await self.get_response(request)
+            if state.failed is not None:
+                mark_down(state.failed)
+                state.alias = state.failed = None
+                state.primary = True
+                response = await self.get_response(request)
+        finally:
+            _request_state.reset(token)
+        if not state.safe:
+            # the pin is a blocking cache write
+            await sync_to_async(self._pin)(request)
+        return response
+
+    @staticmethod
+    def _pin(request):
+        user = _request_user(request)
+        if user is not empty and user.is_authenticated:
+            pin_to_primary(user.pk)
+
+    def process_exception(self, request, exception):
+        # Django turns a view's exception into a response before it gets back to __call__, so
+        # the replica's failure is recorded here and answered with a placeholder that __call__
+        # replaces by its retry (no 500 is logged for it)
+        state = _request_state.get()
+        if state is None or state.alias is None or not isinstance(exception, DatabaseError):
+            return None
+        state.failed = state.alias
+        return HttpResponse(status=503)
@@ -0,0 +1,67 @@
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+
+from .grading import grade_points
+from .models import User, Subject, Enrollment
+from .response_cache import ENROLLMENTS, SUBJECTS, bump_versions
+from .stats import rebuild_subject_stats
+
+SEED_PASSWORD = 'password'
+
+
+def seed_data(users=10000, subjects=500, enrollments=200000, graded_every=2, prefix='seed', batch_size=5000):
+    """
+    Insert synthetic users, subjects and enrollments with bulk_create (used by the benchmarks).
+
+    - Users are `<prefix><n>@example.com` and all share one password hash (SEED_PASSWORD),
+      hashed once; subjects are `<prefix> subject <n>`.
+    - Enrollments are spread evenly: seeded student s takes subjects s, s+1, ... (mod subjects),
+      so (student, subject) pairs are unique; every `graded_every`-th enrollment gets a grade.
+    - Calling it again with a different prefix adds more data next to the existing rows.
+
+    Returns a dict with the number of rows created and the first seeded user/subject ids.
+    """
+    if users <= 0 or subjects <= 0:
+        raise ValueError('users and subjects must be positive.')
+    if enrollments > users * subjects:
+        raise ValueError('enrollments cannot exceed users * subjects (each pair is unique).')
+
+    password = make_password(SEED_PASSWORD)
+    with transaction.atomic():
+        user_objs = User.objects.bulk_create(
+            [User(email=f'{prefix}{n}@example.com', first_name=f'First{n}', last_name=f'Last{n}', password=password)
+             for n in range(users)],
+            batch_size=batch_size,
+        )
+        subject_objs = Subject.objects.bulk_create(
+            [Subject(name=f'{prefix} subject {n}') for n in range(subjects)],
+            batch_size=batch_size,
+        )
+        user_ids = [u.pk for u in user_objs]
+        subject_ids = [s.pk for s in subject_objs]
+
+        grades = ('A', 'B', 'C', 'D', 'F')
+        batch = []
+        for i in range(enrollments):
+            student, offset = i % users, i // users
+            grade = grades[i % len(grades)] if graded_every and i % graded_every == 0 else None
+            batch.append(Enrollment(
+                student_id=user_ids[student],
+                subject_id=subject_ids[(student + offset) % subjects],
+                grade=grade,
+                grade_points=grade_points(grade),
+            ))
+            if len(batch) >= batch_size:
+                Enrollment.objects.bulk_create(batch)
+                batch = []
+        if batch:
+            Enrollment.objects.bulk_create(batch)
+
+        # bulk_create skips the signals that maintain SubjectStats and the response cache versions
+        rebuild_subject_stats()
+        bump_versions(SUBJECTS, ENROLLMENTS)
+
+    return {
+        'users': users, 'subjects': subjects, 'enrollments': enrollments,
+        'first_user_id': user_ids[0], 'first_subject_id': subject_ids[0],
+    }
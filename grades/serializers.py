@@ -1,9 +1,13 @@
-from rest_framework import serializers
+from rest_framework import exceptions, serializers
+from rest_framework.reverse import reverse
 from django.db import IntegrityError
-from .models import User, Subject, Enrollment
+from .exports import EXPORT_FORMATS
+from .fieldsets import FieldsetSerializerMixin
+from .models import User, Subject, Enrollment, SubjectStats, Job
+from .roles import request_access
 
 # --- User serializer (same as before) ---
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(FieldsetSerializerMixin, serializers.ModelSerializer):
     """
     Serializer for creating and representing users.
     - Function: create(...)  -> create a new User and hash the password.
@@ -29,7 +33,23 @@ class UserSerializer(serializers.ModelSerializer):
 
 
 # --- Subject / Enrollment serializers ---
-class EnrollmentNestedSerializer(serializers.ModelSerializer):
+class StudentSummarySerializer(serializers.ModelSerializer):
+    """Small student summary (id + email), used for nested / expanded students."""
+
+    class Meta:
+        model = User
+        fields = ('id', 'email')
+
+
+class SubjectSummarySerializer(serializers.ModelSerializer):
+    """Small subject summary (id + name), used for `?expand=subject` on enrollments."""
+
+    class Meta:
+        model = Subject
+        fields = ('id', 'name')
+
+
+class EnrollmentNestedSerializer(FieldsetSerializerMixin, serializers.ModelSerializer):
     """
     Minimal nested view of an enrollment used inside Subject detail for admin views.
     - Function: get_student(obj) -> returns a small student summary (id + email).
@@ -48,60 +68,75 @@ class EnrollmentNestedSerializer(serializers.ModelSerializer):
         return {'id': obj.student.id, 'email': obj.student.email}
 
 
-class SubjectSerializer(serializers.ModelSerializer):
+class SubjectSerializer(FieldsetSerializerMixin, serializers.ModelSerializer):
     """
     SubjectSerializer:
     - Fields:
       - student_grade: computed grade for the requesting student (if applicable).
-      - enrollments: list of enrollments for admin/staff users (nested).
+      - enrollments: list of enrollments for admin/staff users (nested). `?omit=enrollments`
+        skips it, `?omit=enrollments.student` keeps the grades without the students.
     - Functions:
       - get_student_grade(obj) -> returns grade for current user (or None).
       - get_enrollments(obj) -> returns nested enrollments for admin/staff.
     """
     student_grade = serializers.SerializerMethodField()
     enrollments = serializers.SerializerMethodField()
+    nested_serializers = {'enrollments': EnrollmentNestedSerializer}
 
     class Meta:
         model = Subject
-        fields = ('id', 'name', 'created_at', 'updated_at', 'student_grade', 'enrollments')
+        fields = ('id', 'name', 'credits', 'created_at', 'updated_at', 'student_grade', 'enrollments')
         read_only_fields = ('created_at', 'updated_at', 'student_grade', 'enrollments')
 
     # Function: get_student_grade
-    # Purpose: If request.user is an authenticated non-admin student, return their grade
-    # for this subject. Returns None for anonymous users or admin/staff.
+    # Purpose: If request.user is an authenticated student, return their grade for this
+    # subject. Returns None for anonymous users and users who see every enrollment instead.
     def get_student_grade(self, obj):
         request = self.context.get('request', None)
         if not request or not request.user or not request.user.is_authenticated:
             return None
 
-        # Admins should not see the student-specific grade here
-        if request.user.is_staff or getattr(request.user, "is_admin", False):
+        # Admins and Teachers should not see the student-specific grade here
+        if request_access(request).can('grades.view_enrollment'):
             return None
 
-        # Find the enrollment for the current user and this subject
-        enrollment = obj.enrollments.filter(student=request.user).first()
+        # Prefer the enrollments prefetched by SubjectViewSet (already filtered to
+        # request.user); fall back to a per-object query when serializing a bare instance.
+        enrollments = getattr(obj, 'student_enrollments', None)
+        if enrollments is not None:
+            enrollment = enrollments[0] if enrollments else None
+        else:
+            enrollment = obj.enrollments.filter(student=request.user).first()
         return enrollment.grade if enrollment else None
 
     # Function: get_enrollments
-    # Purpose: For admin/staff users, return nested enrollments (student summary + grade).
-    # For non-admins return an empty list (they receive their grade via student_grade).
+    # Purpose: For users who may view every enrollment (admin/staff, Teachers), return nested
+    # enrollments (student summary + grade). For students return an empty list (they receive their grade via student_grade).
     def get_enrollments(self, obj):
         request = self.context.get('request', None)
         if not request or not request.user or not request.user.is_authenticated:
             return []
 
-        if request.user.is_staff or getattr(request.user, "is_admin", False):
-            # return all enrollments for this subject to admin
-            qs = obj.enrollments.select_related('student').all()
-            # Note: pass context to nested serializer if it needs request later
-            return EnrollmentNestedSerializer(qs, many=True).data
+        if request_access(request).can('grades.view_enrollment'):
+            # return all enrollments for this subject to admin; use the prefetched
+            # list (with students joined) when the viewset provided one
+            qs = getattr(obj, 'prefetched_enrollments', None)
+            if qs is None:
+                qs = obj.enrollments.select_related('student').all()
+            # hand the `enrollments.*` part of ?fields= / ?omit= down to the nested serializer
+            fieldset = self.context.get('fieldset')
+            context = {'fieldset': fieldset.nested('enrollments')} if fieldset is not None else {}
+            return EnrollmentNestedSerializer(qs, many=True, context=context).data
 
         return []
 
 
-class EnrollmentSerializer(serializers.ModelSerializer):
+class EnrollmentSerializer(FieldsetSerializerMixin, serializers.ModelSerializer):
     
    ## EnrollmentSerializer:
+
+    # `?expand=student` / `?expand=subject` render a summary instead of the id (read only)
+    expandable_fields = {'student': StudentSummarySerializer, 'subject': SubjectSummarySerializer}
     
     # Field: student
     # Purpose: PrimaryKeyRelatedField for the student FK. Optional on input.
@@ -153,4 +188,123 @@ class EnrollmentSerializer(serializers.ModelSerializer):
             enrollment = Enrollment.objects.create(**validated_data)
         except IntegrityError:
             raise serializers.ValidationError("Student is already enrolled in this subject.")
-        return enrollment
\ No newline at end of file
+        return enrollment
+
+
+class SubjectStatsSerializer(serializers.ModelSerializer):
+    """
+    Read-only view of a SubjectStats summary row (see grades.stats).
+    - ungraded_count is derived from the two stored counters.
+    """
+    subject_name = serializers.CharField(source='subject.name', read_only=True)
+    ungraded_count = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = SubjectStats
+        fields = ('subject', 'subject_name', 'enrollment_count', 'graded_count', 'ungraded_count',
+                  'grade_distribution', 'updated_at')
+        read_only_fields = fields
+
+
+# --- Transcript serializers ---
+# Read-only; they render the dicts built by grades.transcripts.student_transcript.
+class TranscriptSubjectSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    name = serializers.CharField()
+    credits = serializers.IntegerField()
+
+
+class TranscriptEntrySerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    subject = TranscriptSubjectSerializer()
+    grade = serializers.CharField(allow_null=True)
+    grade_points = serializers.DecimalField(max_digits=3, decimal_places=2, allow_null=True)
+    # moved to the archive with a closed term (grades.archive)
+    archived = serializers.BooleanField()
+    created_at = serializers.DateTimeField()
+    updated_at = serializers.DateTimeField()
+
+
+class TranscriptSummarySerializer(serializers.Serializer):
+    """
+    Totals over the whole transcript.
+    - credits: credits of every enrollment; gpa_credits: those with grade points.
+    - gpa: quality_points / gpa_credits (credit-weighted), null when nothing has grade points.
+    """
+    enrollments = serializers.IntegerField()
+    graded = serializers.IntegerField()
+    credits = serializers.IntegerField()
+    gpa_credits = serializers.IntegerField()
+    quality_points = serializers.DecimalField(max_digits=12, decimal_places=2)
+    gpa = serializers.DecimalField(max_digits=3, decimal_places=2, allow_null=True)
+
+
+class TranscriptSerializer(serializers.Serializer):
+    student = serializers.DictField()
+    enrollments = TranscriptEntrySerializer(many=True)
+    summary = TranscriptSummarySerializer()
+
+
+# --- Bulk enrollment row serializers ---
+# These only validate the shape of each row. Foreign keys are plain integers so that
+# EnrollmentViewSet.bulk can resolve students, subjects and duplicates with one
+# set-based query each instead of one lookup per row.
+class EnrollmentBulkCreateItemSerializer(serializers.Serializer):
+    student = serializers.IntegerField(required=False, allow_null=True)
+    subject = serializers.IntegerField()
+    grade = serializers.CharField(max_length=10, required=False, allow_blank=True, allow_null=True)
+
+
+class EnrollmentBulkGradeItemSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    grade = serializers.CharField(max_length=10, allow_blank=True, allow_null=True)
+
+
+class SubjectUnenrollSerializer(serializers.Serializer):
+    """Body of DELETE /api/subjects/{id}/students/: the students to drop from the subject."""
+    students = serializers.ListField(child=serializers.IntegerField(), allow_empty=False)
+
+
+# --- Background job serializers ---
+class JobExportParamsSerializer(serializers.Serializer):
+    """Options of an export_gradebook job, as the ?output= / ?subject= of /api/enrollments/export/."""
+    output = serializers.ChoiceField(choices=tuple(EXPORT_FORMATS), default='csv')
+    subject = serializers.IntegerField(required=False)
+
+
+class JobSerializer(serializers.ModelSerializer):
+    """
+    A background job (grades.jobs). Creating one only queues it for `manage.py run_jobs`.
+    - Writable: kind, params (export_gradebook: output / subject) and file (the import_users CSV).
+    - Only export_gradebook jobs may be queued by non-staff users.
+    - result_url: where the job's output file is downloaded from, once it has one.
+    """
+    file = serializers.FileField(source='input_file', write_only=True, required=False)
+    result_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Job
+        fields = ('id', 'kind', 'params', 'file', 'status', 'progress', 'total', 'result', 'error', 'result_url',
+                  'attempts', 'created_at', 'started_at', 'finished_at')
+        read_only_fields = ('status', 'progress', 'total', 'result', 'error', 'attempts',
+                            'created_at', 'started_at', 'finished_at')
+
+    def get_result_url(self, job):
+        if not job.result_file:
+            return None
+        return reverse('api:job-result', args=[job.pk], request=self.context.get('request'))
+
+    def validate(self, attrs):
+        kind = attrs['kind']
+        if kind != Job.EXPORT_GRADEBOOK and not request_access(self.context['request']).is_staff:
+            raise exceptions.PermissionDenied("Only staff can queue this kind of job.")
+        if kind == Job.IMPORT_USERS and not attrs.get('input_file'):
+            raise serializers.ValidationError({'file': ["Upload a CSV file in this field."]})
+        if kind == Job.EXPORT_GRADEBOOK:
+            params = JobExportParamsSerializer(data=attrs.get('params') or {})
+            if not params.is_valid():
+                raise serializers.ValidationError({'params': params.errors})
+            attrs['params'] = params.validated_data
+        else:
+            attrs['params'] = {}
+        return attrs
@@ -0,0 +1,170 @@
+from django.contrib.auth.models import Group, Permission
+from django.db.models.signals import m2m_changed, post_delete, post_init, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from . import events, roles
+from .authentication import invalidate_token, invalidate_user_tokens
+from .models import User, Subject, Enrollment, SubjectStats, Tombstone
+from .stats import apply_enrollment_changes
+from .response_cache import ENROLLMENTS, SUBJECTS, bump_versions
+
+
+# --- Cached token authentication invalidation ---
+# The cached Token carries a copy of its user, so any change to the user (flags such as
+# is_active / is_staff / is_admin, but also email or names) must evict it.
+@receiver(post_delete, sender=Token)
+def drop_deleted_token(sender, instance, **kwargs):
+    invalidate_token(instance.key)
+
+
+# (deleting a user cascades to its token, which is handled by drop_deleted_token)
+@receiver(post_save, sender=User)
+def drop_user_tokens(sender, instance, **kwargs):
+    invalidate_user_tokens(instance.pk)
+
+
+# --- Cached role / permission invalidation (grades.roles) ---
+# A user's entry depends on their flags, groups and own permissions; every entry depends on
+# which permissions each group holds (and on the groups / permissions existing at all).
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def drop_user_access(sender, instance, **kwargs):
+    roles.invalidate_user(instance.pk)
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+@receiver(m2m_changed, sender=User.user_permissions.through)
+def drop_member_access(sender, instance, action, pk_set, **kwargs):
+    if not action.startswith('post_'):
+        return
+    if isinstance(instance, User):
+        roles.invalidate_user(instance.pk)
+    elif pk_set:
+        # group.user_set.add(...) / permission.user_set.remove(...): pk_set holds the users
+        for user_id in pk_set:
+            roles.invalidate_user(user_id)
+    else:
+        # cleared from the group / permission side: the members are no longer known
+        roles.invalidate_all()
+
+
+@receiver(m2m_changed, sender=Group.permissions.through)
+def drop_group_access(sender, action, **kwargs):
+    if action.startswith('post_'):
+        roles.invalidate_all()
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+@receiver(post_delete, sender=Permission)
+def drop_all_access(sender, **kwargs):
+    roles.invalidate_all()
+
+
+# --- Incremental SubjectStats maintenance ---
+# Each Enrollment remembers the (subject, grade) it was loaded/saved with, so a save can be
+# turned into a delta without re-reading the row. Bulk writes that bypass signals call
+# grades.stats.apply_enrollment_changes themselves.
+# Deferred fields (e.g. .only('id')) are read from __dict__ so loading never triggers a query;
+# a field that was never loaded cannot have been changed by save().
+_UNLOADED = object()
+
+
+@receiver(post_init, sender=Enrollment)
+def remember_enrollment_state(sender, instance, **kwargs):
+    instance._stats_state = (instance.__dict__.get('subject_id', _UNLOADED), instance.__dict__.get('grade', _UNLOADED))
+
+
+def _previous_state(instance):
+    old_subject, old_grade = instance._stats_state
+    if old_subject is _UNLOADED:
+        old_subject = instance.subject_id
+    if old_grade is _UNLOADED:
+        old_grade = instance.grade
+    return old_subject, old_grade
+
+
+# --- Live enrollment events (grades.events) ---
+# Registered before count_saved_enrollment, which moves _stats_state on to the saved values.
+@receiver(post_save, sender=Enrollment)
+def publish_saved_enrollment(sender, instance, created, **kwargs):
+    if created:
+        events.publish([events.enrollment_event(events.CREATED, instance)])
+    elif _previous_state(instance)[1] != instance.grade:
+        events.publish([events.enrollment_event(events.GRADED, instance)])
+
+
+@receiver(post_delete, sender=Enrollment)
+def publish_deleted_enrollment(sender, instance, **kwargs):
+    events.publish([events.enrollment_event(events.DELETED, instance)])
+
+
+@receiver(post_save, sender=Enrollment)
+def count_saved_enrollment(sender, instance, created, **kwargs):
+    old_subject, old_grade = _previous_state(instance)
+    if created:
+        changes = [(instance.subject_id, 1, None, instance.grade)]
+    elif old_subject != instance.subject_id:
+        changes = [(old_subject, -1, old_grade, None), (instance.subject_id, 1, None, instance.grade)]
+    else:
+        changes = [(instance.subject_id, 0, old_grade, instance.grade)]
+    apply_enrollment_changes(changes)
+    instance._stats_state = (instance.subject_id, instance.grade)
+
+
+@receiver(post_delete, sender=Enrollment)
+def count_deleted_enrollment(sender, instance, **kwargs):
+    old_subject, old_grade = _previous_state(instance)
+    apply_enrollment_changes([(old_subject, -1, old_grade, None)])
+
+
+@receiver(post_save, sender=Subject)
+def create_subject_stats(sender, instance, created, **kwargs):
+    if created:
+        SubjectStats.objects.get_or_create(subject=instance)
+
+
+# --- Subject response cache versions ---
+# Subject rows feed every cached subject payload; enrollments (and the student emails shown
+# next to them) only feed the staff payload. See SubjectViewSet._shared_response.
+@receiver(post_save, sender=Subject)
+@receiver(post_delete, sender=Subject)
+def bump_subject_version(sender, **kwargs):
+    bump_versions(SUBJECTS)
+
+
+@receiver(post_save, sender=Enrollment)
+@receiver(post_delete, sender=Enrollment)
+def bump_enrollment_version(sender, **kwargs):
+    bump_versions(ENROLLMENTS)
+
+
+@receiver(post_init, sender=User)
+def remember_user_email(sender, instance, **kwargs):
+    instance._cached_email = instance.__dict__.get('email')
+
+
+@receiver(post_save, sender=User)
+def bump_on_email_change(sender, instance, created, **kwargs):
+    if not created and instance.email != instance._cached_email:
+        bump_versions(ENROLLMENTS)
+    instance._cached_email = instance.email
+
+
+# --- Delta sync tombstones ---
+# Deletions leave a Tombstone so /api/sync/ can report them (grades.sync). Cascades run these
+# per deleted row, so deleting a user or subject also records its enrollments.
+@receiver(post_delete, sender=Subject)
+def record_deleted_subject(sender, instance, **kwargs):
+    Tombstone.objects.create(model=Tombstone.SUBJECT, object_id=instance.pk)
+
+
+@receiver(post_delete, sender=Enrollment)
+def record_deleted_enrollment(sender, instance, **kwargs):
+    Tombstone.objects.create(model=Tombstone.ENROLLMENT, object_id=instance.pk, student_id=instance.student_id)
+
+
+@receiver(post_delete, sender=User)
+def record_deleted_user(sender, instance, **kwargs):
+    Tombstone.objects.create(model=Tombstone.USER, object_id=instance.pk)
@@ -0,0 +1,112 @@
+from collections import Counter, defaultdict
+
+from django.db import connections, router, transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import Trim
+from django.utils import timezone
+
+from .models import Subject, Enrollment, SubjectStats
+
+
+def is_graded(grade):
+    # same rule as the "graded enrollment" delete guards in views.py
+    return bool(grade and str(grade).strip())
+
+
+# Function: apply_enrollment_changes
+# Purpose: fold a batch of enrollment changes into SubjectStats with one locked read and one
+# write per affected table, whatever the batch size.
+# Each change is (subject_id, enrolled_delta, removed_grade, added_grade):
+#   create -> (subject, +1, None, grade)      delete -> (subject, -1, grade, None)
+#   regrade -> (subject, 0, old, new)         a subject move is a delete plus a create.
+# Subjects without a stats row are skipped (a subject being cascade-deleted, or data that
+# predates the table); `rebuild_subject_stats` reconciles those.
+def apply_enrollment_changes(changes):
+    deltas = defaultdict(lambda: {'enrolled': 0, 'graded': 0, 'grades': Counter()})
+    for subject_id, enrolled, removed, added in changes:
+        delta = deltas[subject_id]
+        delta['enrolled'] += enrolled
+        if is_graded(removed):
+            delta['graded'] -= 1
+            delta['grades'][str(removed).strip()] -= 1
+        if is_graded(added):
+            delta['graded'] += 1
+            delta['grades'][str(added).strip()] += 1
+    deltas = {k: v for k, v in deltas.items() if v['enrolled'] or v['graded'] or any(v['grades'].values())}
+    if not deltas:
+        return
+
+    with transaction.atomic():
+        rows = list(SubjectStats.objects.select_for_update().filter(subject_id__in=deltas))
+        for stats in rows:
+            delta = deltas[stats.subject_id]
+            stats.enrollment_count = max(0, stats.enrollment_count + delta['enrolled'])
+            stats.graded_count = max(0, stats.graded_count + delta['graded'])
+            distribution = Counter(stats.grade_distribution)
+            distribution.update(delta['grades'])
+            stats.grade_distribution = {grade: n for grade, n in distribution.items() if n > 0}
+        if rows:
+            # bulk_update skips auto_now, and the rows' updated_at matters to dashboards
+            now = timezone.now()
+            for stats in rows:
+                stats.updated_at = now
+            SubjectStats.objects.bulk_update(
+                rows, ['enrollment_count', 'graded_count', 'grade_distribution', 'updated_at'])
+
+
+def delete_enrollments(queryset):
+    """
+    Delete the enrollments matched by `queryset` with one DELETE ... WHERE id IN (<queryset>),
+    without loading them or sending post_delete. For callers that apply what the receivers in
+    grades.signals maintain (statistics, tombstones, cache versions) themselves, in bulk.
+    Returns the number of rows deleted.
+    """
+    alias = router.db_for_write(Enrollment)
+    select, params = queryset.using(alias).values('pk').query.sql_with_params()
+    quote = connections[alias].ops.quote_name
+    with connections[alias].cursor() as cursor:
+        cursor.execute(f'DELETE FROM {quote(Enrollment._meta.db_table)} '
+                       f'WHERE {quote(Enrollment._meta.pk.column)} IN ({select})', params)
+        return cursor.rowcount
+
+
+def subject_enrollment_count(subject):
+    """Enrollment count from the summary table, falling back to the live table if there is no row."""
+    count = SubjectStats.objects.filter(subject=subject).values_list('enrollment_count', flat=True).first()
+    if count is None:
+        return subject.enrollments.count()
+    return count
+
+
+def enrollment_total(subject_id=None):
+    """Enrollment count (all subjects, or one) from the summary table: O(subjects), not O(enrollments)."""
+    rows = SubjectStats.objects.all() if subject_id is None else SubjectStats.objects.filter(subject_id=subject_id)
+    return rows.aggregate(total=Sum('enrollment_count'))['total'] or 0
+
+
+def compute_subject_stats():
+    """Build SubjectStats rows for every subject from two aggregate queries (not saved)."""
+    totals = dict(Enrollment.objects.values_list('subject_id').annotate(n=Count('id')).order_by())
+    distributions = defaultdict(dict)
+    grade_counts = (Enrollment.objects.filter(grade__isnull=False).annotate(g=Trim('grade')).exclude(g='')
+                    .values_list('subject_id', 'g').annotate(n=Count('id')).order_by())
+    for subject_id, grade, n in grade_counts:
+        distributions[subject_id][grade] = n
+    return [
+        SubjectStats(
+            subject_id=subject_id,
+            enrollment_count=totals.get(subject_id, 0),
+            graded_count=sum(distributions[subject_id].values()),
+            grade_distribution=distributions[subject_id],
+        )
+        for subject_id in Subject.objects.values_list('id', flat=True)
+    ]
+
+
+def rebuild_subject_stats():
+    """Recompute the whole summary table from Enrollment. Returns the number of rows written."""
+    rows = compute_subject_stats()
+    with transaction.atomic():
+        SubjectStats.objects.all().delete()
+        SubjectStats.objects.bulk_create(rows, batch_size=1000)
+    return len(rows)
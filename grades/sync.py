@@ -0,0 +1,174 @@
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core import signing
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework import exceptions, serializers, status
+
+from .fast_list import FastListSerializer, values_plan
+from .fieldsets import Fieldset
+from .models import Enrollment, Subject, Tombstone, User
+from .roles import access_for
+from .serializers import EnrollmentSerializer, SubjectSerializer, UserSerializer
+
+TOKEN_SALT = 'grades.sync'
+TOKEN_VERSION = 1
+FEEDS = ('subjects', 'enrollments', 'users')
+TOMBSTONE_FEEDS = {Tombstone.SUBJECT: 'subjects', Tombstone.ENROLLMENT: 'enrollments', Tombstone.USER: 'users'}
+# the mirrored subject rows: catalog columns only, not the per-user grade / enrollment list
+SUBJECT_FIELDSET = Fieldset(omit=frozenset({'student_grade', 'enrollments'}))
+
+
+class SyncTokenExpired(exceptions.APIException):
+    status_code = status.HTTP_410_GONE
+    default_detail = 'Sync token expired; sync again without `since` to rebuild the mirror.'
+    default_code = 'sync_token_expired'
+
+
+def _scope(access, user):
+    # a token is only valid for the rows it was computed over; a role change starts over
+    if access.is_staff:
+        return 'staff'
+    if access.can('grades.view_enrollment'):
+        return f'enrollments:{user.pk}'
+    return f'user:{user.pk}'
+
+
+def page_size():
+    return getattr(settings, 'GRADES_SYNC_PAGE_SIZE', 500)
+
+
+def grace_period():
+    return timedelta(seconds=getattr(settings, 'GRADES_SYNC_GRACE_SECONDS', 5))
+
+
+def tombstone_retention():
+    return timedelta(days=getattr(settings, 'GRADES_SYNC_TOMBSTONE_DAYS', 30))
+
+
+# --- Tokens ---
+def encode_token(scope, cursors):
+    """Signed, opaque token holding one (timestamp, id) cursor per feed."""
+    payload = {'v': TOKEN_VERSION, 's': scope,
+               'c': {name: [moment.isoformat(), pk] for name, (moment, pk) in cursors.items()}}
+    return signing.dumps(payload, salt=TOKEN_SALT, compress=True)
+
+
+def decode_token(token, scope):
+    """Cursors of a token from encode_token(); 400 when tampered with, 410 when stale."""
+    try:
+        payload = signing.loads(token, salt=TOKEN_SALT)
+        cursors = {name: (datetime.fromisoformat(moment), int(pk)) for name, (moment, pk) in payload['c'].items()}
+    except (signing.BadSignature, KeyError, TypeError, ValueError):
+        raise serializers.ValidationError({'since': ['Invalid sync token.']})
+    if payload.get('v') != TOKEN_VERSION or payload.get('s') != scope or set(cursors) != {*FEEDS, 'deleted'}:
+        raise SyncTokenExpired()
+    # deletions older than the retention may already be pruned, so the mirror can't be repaired
+    if cursors['deleted'][0] < timezone.now() - tombstone_retention():
+        raise SyncTokenExpired()
+    return cursors
+
+
+# --- Feeds ---
+def _querysets(access, user):
+    """The rows `user` may mirror, per feed (same visibility as the list endpoints)."""
+    if access.is_staff:
+        return {
+            'subjects': Subject.objects.all(),
+            'enrollments': Enrollment.objects.all(),
+            'users': User.objects.all(),
+            'deleted': Tombstone.objects.all(),
+        }
+    if access.can('grades.view_enrollment'):
+        # Teachers: every enrollment, but only their own account (/api/users/ is staff-only)
+        return {
+            'subjects': Subject.objects.all(),
+            'enrollments': Enrollment.objects.all(),
+            'users': User.objects.filter(pk=user.pk),
+            'deleted': Tombstone.objects.filter(model__in=(Tombstone.SUBJECT, Tombstone.ENROLLMENT)),
+        }
+    return {
+        'subjects': Subject.objects.all(),
+        'enrollments': Enrollment.objects.filter(student=user),
+        'users': User.objects.filter(pk=user.pk),
+        'deleted': Tombstone.objects.filter(
+            Q(model=Tombstone.SUBJECT) | Q(model=Tombstone.ENROLLMENT, student_id=user.pk)),
+    }
+
+
+def _after(queryset, column, cursor):
+    # keyset condition (column, id) > cursor, written so the (column, id) index bounds the scan
+    moment, pk = cursor
+    return queryset.filter(Q(**{f'{column}__gte': moment})
+                           & (Q(**{f'{column}__gt': moment}) | Q(pk__gt=pk)))
+
+
+def _read(queryset, column, cursor, limit, horizon):
+    """
+    Up to `limit` rows after `cursor` in (column, id) order, plus the cursor to resume from and
+    whether more rows are waiting.
+
+    A drained feed resumes from `horizon` (now minus the grace period) rather than its last row,
+    so rows saved by transactions that committed late are still picked up; clients upsert by id,
+    so the replayed rows are harmless.
+    """
+    if cursor is not None:
+        queryset = _after(queryset, column, cursor)
+    rows = list(queryset.order_by(column, 'pk')[:limit + 1])
+    if len(rows) <= limit:
+        return rows, (horizon, 0), False
+    rows = rows[:limit]
+    last = rows[-1]
+    position = (last[column], last['id']) if isinstance(last, dict) else (getattr(last, column), last.pk)
+    # a full page that already reached the grace window stops here: replaying the window
+    # would return the same page again
+    return rows, position, position[0] < horizon
+
+
+def sync_changes(user, token=None):
+    """
+    Rows changed and deleted since `token` (everything, when None), and the token to send next.
+
+    Returns {'token', 'has_more', 'subjects', 'enrollments', 'users',
+    'deleted': {'subjects': [ids], 'enrollments': [ids], 'users': [ids]}}. Each feed returns at
+    most settings.GRADES_SYNC_PAGE_SIZE rows per call; `has_more` asks the client to call again
+    right away with the new token. One query per feed, each served by its (updated_at, id) index.
+    """
+    access = access_for(user)
+    scope = _scope(access, user)
+    cursors = decode_token(token, scope) if token else {}
+    now = timezone.now()
+    horizon = now - grace_period()
+    limit = page_size()
+    querysets = _querysets(access, user)
+    result = {'token': None, 'has_more': False}
+    new_cursors = {}
+
+    subjects, new_cursors['subjects'], more = _read(
+        querysets['subjects'], 'updated_at', cursors.get('subjects'), limit, horizon)
+    result['subjects'] = SubjectSerializer(subjects, many=True, context={'fieldset': SUBJECT_FIELDSET}).data
+    result['has_more'] |= more
+
+    for name, serializer_class in (('enrollments', EnrollmentSerializer), ('users', UserSerializer)):
+        plan = values_plan(serializer_class)
+        columns = {column for _, column, _ in plan} | {'updated_at'}
+        rows, new_cursors[name], more = _read(
+            querysets[name].values(*columns), 'updated_at', cursors.get(name), limit, horizon)
+        result[name] = FastListSerializer(serializer_class, rows, plan=plan).data
+        result['has_more'] |= more
+
+    result['deleted'] = {name: [] for name in FEEDS}
+    if token:
+        rows, new_cursors['deleted'], more = _read(
+            querysets['deleted'].values('id', 'model', 'object_id', 'deleted_at'),
+            'deleted_at', cursors['deleted'], limit, horizon)
+        for row in rows:
+            result['deleted'][TOMBSTONE_FEEDS[row['model']]].append(row['object_id'])
+        result['has_more'] |= more
+    else:
+        # a first sync has nothing to delete; later deletions are reported from here on
+        new_cursors['deleted'] = (horizon, 0)
+
+    result['token'] = encode_token(scope, new_cursors)
+    return result
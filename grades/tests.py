@@ -1,10 +1,74 @@
-from django.test import TestCase
-from django.db import IntegrityError
+import asyncio
+import csv
+import io
+import json
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock, skipUnless
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.sql import emit_post_migrate_signal
+from django.core.management.base import CommandError
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.core.cache import cache
+from django.core.asgi import get_asgi_application
+from django.core.signals import request_finished, request_started
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.db import IntegrityError, close_old_connections, connection, connections, transaction
+from django.test.utils import CaptureQueriesContext
 from django.contrib.auth import get_user_model
-from grades.models import Subject, Enrollment
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import Group, Permission
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient, APITestCase
+from grades.models import UNGRADED, Subject, Enrollment, SubjectStats, Tombstone, Job, Term, ArchivedEnrollment
+from grades.archive import term_bounds
+from grades.jobs import claim_job, run_job, work
+from grades.pagination import IdCursorPagination
+from grades.serializers import SubjectSerializer, EnrollmentSerializer, UserSerializer
+from grades.fast_list import FastListSerializer, values_plan
+from grades.grading import grade_points
+from grades.renderers import ORJSONParser, ORJSONRenderer
+from grades.imports import import_users, read_user_csv
+from grades.authentication import token_cache_stats
+from grades.benchmarks import (
+    benchmark_routes, check_baseline, check_query_scaling, prepare_personas, run_benchmarks,
+    run_archive_benchmark, run_concurrency_benchmark, run_serialization_benchmark, served_routes,
+)
+from grades.seeding import seed_data
+from grades.metrics import ViewMetricsMiddleware, registry as metrics_registry
+from grades.response_cache import ENROLLMENTS, current_versions, response_cache_stats
+from grades.roles import STUDENT, TEACHER, access_for
+from grades import routers, views
+from grades.loadtest import LocalServer, load_personas, run_load_test
+from grades.async_views import read_urlconf
+from grades import events, exports
+from grades.event_stream import EVENTS_PATH, with_event_stream
+from grades.filters import SUBJECT_FTS_TRIGGERS, ensure_subject_search
+from grades.stats import compute_subject_stats, delete_enrollments
+from project.database import database_config, replica_configs
 
 User = get_user_model()
 
+# a cache backend every process sees (grades.caching.shared_cache), which turns the token and
+# role caches on; the classes using it clear it in setUp, as it outlives their transactions
+SHARED_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': tempfile.mkdtemp(prefix='grades-cache-'),
+    }
+}
+
 
 class ModelsTest(TestCase):
     def setUp(self):
@@ -40,3 +104,1993 @@ class ModelsTest(TestCase):
         e = Enrollment.objects.create(student=self.student, subject=subj)
         self.assertIsNotNone(e.created_at)
         self.assertIsNotNone(e.updated_at)
+
+
+class SubjectListQueryCountTest(APITestCase):
+    """
+    SubjectSerializer's computed fields (student_grade / enrollments) must be resolved
+    from the viewset's prefetches, so listing subjects costs a constant number of queries.
+    """
+
+    def setUp(self):
+        self.student = User.objects.create_user(email='student@example.com', password='pass')
+        self.other = User.objects.create_user(email='other@example.com', password='pass')
+        self.staff = User.objects.create_user(email='staff@example.com', password='pass', is_staff=True)
+        # resolve the roles up front: only the listing's own queries are compared
+        access_for(self.student)
+        access_for(self.staff)
+
+    def _add_subjects(self, start, count):
+        # committed, so the cached subject payloads are invalidated
+        with self.captureOnCommitCallbacks(execute=True):
+            for i in range(start, start + count):
+                subj = Subject.objects.create(name=f'Subject {i}')
+                Enrollment.objects.create(student=self.student, subject=subj, grade='A')
+                Enrollment.objects.create(student=self.other, subject=subj)
+
+    def _count_list_queries(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get('/api/subjects/')
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries), response.data['results']
+
+    def test_student_query_count_is_constant(self):
+        self.client.force_authenticate(self.student)
+        self._add_subjects(0, 2)
+        few, _ = self._count_list_queries()
+        self._add_subjects(2, 20)
+        many, rows = self._count_list_queries()
+        self.assertEqual(few, many)
+        self.assertTrue(all(row['student_grade'] == 'A' for row in rows))
+        self.assertTrue(all(row['enrollments'] == [] for row in rows))
+
+    def test_staff_query_count_is_constant(self):
+        self.client.force_authenticate(self.staff)
+        self._add_subjects(0, 2)
+        few, _ = self._count_list_queries()
+        self._add_subjects(2, 20)
+        many, rows = self._count_list_queries()
+        self.assertEqual(few, many)
+        emails = {e['student']['email'] for e in rows[0]['enrollments']}
+        self.assertEqual(emails, {'student@example.com', 'other@example.com'})
+        self.assertTrue(all(row['student_grade'] is None for row in rows))
+
+    def test_anonymous_grade_fields_empty(self):
+        self._add_subjects(0, 3)
+        _, rows = self._count_list_queries()
+        self.assertTrue(all(row['student_grade'] is None and row['enrollments'] == [] for row in rows))
+
+
+class CursorPaginationTest(APITestCase):
+    """List endpoints page with keyset cursors and never issue COUNT(*)."""
+
+    def setUp(self):
+        self.staff = User.objects.create_user(email='staff@example.com', password='pass', is_staff=True)
+        self.client.force_authenticate(self.staff)
+
+    def _walk(self, url):
+        seen = []
+        while url:
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            # no pagination COUNT(*); the conditional-GET validators pair any COUNT with MAX(updated_at)
+            self.assertFalse(any('COUNT(' in q['sql'].upper() and 'MAX(' not in q['sql'].upper()
+                                 for q in ctx.captured_queries))
+            seen.extend(row['id'] for row in response.data['results'])
+            url = response.data['next']
+        return seen
+
+    def test_subjects_follow_next_cursor(self):
+        ids = [Subject.objects.create(name=f'S{i}').id for i in range(7)]
+        self.assertEqual(self._walk('/api/subjects/?page_size=3'), ids)
+
+    def test_enrollments_ordered_by_updated_at_then_id(self):
+        subj = Subject.objects.create(name='Math')
+        students = [User.objects.create_user(email=f's{i}@example.com', password='pass') for i in range(5)]
+        enrollments = [Enrollment.objects.create(student=s, subject=subj) for s in students]
+        # touching the first enrollment moves it to the end of the updated_at ordering
+        enrollments[0].grade = 'B'
+        enrollments[0].save()
+        expected = [e.id for e in enrollments[1:]] + [enrollments[0].id]
+        self.assertEqual(self._walk('/api/enrollments/?page_size=2'), expected)
+
+    def test_rows_sharing_updated_at_are_paged_by_id(self):
+        subj = Subject.objects.create(name='Math')
+        students = [User.objects.create_user(email=f's{i}@example.com', password='pass') for i in range(7)]
+        ids = [Enrollment.objects.create(student=s, subject=subj).id for s in students]
+        Enrollment.objects.update(updated_at=timezone.now())
+        self.assertEqual(self._walk('/api/enrollments/?page_size=2'), ids)
+        # the cursor holds (updated_at, id): a range, not an OFFSET past the tied rows
+        second = self.client.get('/api/enrollments/?page_size=2').data['next']
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(second)
+        self.assertFalse(any('OFFSET' in q['sql'] for q in ctx.captured_queries))
+        # and back: the previous link of the last page
+        url = '/api/enrollments/?page_size=3'
+        for _ in range(2):
+            url = self.client.get(url).data['next']
+        previous = self.client.get(self.client.get(url).data['previous']).data
+        self.assertEqual([row['id'] for row in previous['results']], ids[3:6])
+
+    def test_page_size_is_capped(self):
+        for i in range(4):
+            Subject.objects.create(name=f'S{i}')
+        with mock.patch.object(IdCursorPagination, 'max_page_size', 2):
+            response = self.client.get('/api/subjects/?page_size=1000')
+        self.assertEqual(len(response.data['results']), 2)
+        self.assertIsNotNone(response.data['next'])
+
+
+class EnrollmentBulkTest(APITestCase):
+    """POST/PATCH /api/enrollments/bulk/ write many rows with set-based checks and per-row results."""
+
+    url = '/api/enrollments/bulk/'
+
+    def setUp(self):
+        self.staff = User.objects.create_user(email='staff@example.com', password='pass', is_staff=True)
+        self.student = User.objects.create_user(email='student@example.com', password='pass')
+        self.math = Subject.objects.create(name='Math')
+        self.art = Subject.objects.create(name='Art')
+        access_for(self.staff)
+
+    def _students(self, count):
+        return [User.objects.create_user(email=f'bulk{i}@example.com', password='pass') for i in range(count)]
+
+    def test_bulk_create_reports_per_row_results(self):
+        Enrollment.objects.create(student=self.student, subject=self.math)
+        self.client.force_authenticate(self.staff)
+        response = self.client.post(self.url, [
+            {'student': self.student.id, 'subject': self.art.id},
+            {'student': self.student.id, 'subject': self.math.id},   # already enrolled
+            {'student': self.student.id, 'subject': self.art.id},    # duplicate within batch
+            {'student': self.student.id, 'subject': 9999},           # unknown subject
+            {'student': self.student.id},                            # invalid row
+        ], format='json')
+        self.assertEqual(response.status_code, 201)
+        statuses = [r['status'] for r in response.data['results']]
+        self.assertEqual(statuses, ['created', 'error', 'error', 'error', 'error'])
+        self.assertIn('subject', response.data['results'][3]['errors'])
+        self.assertEqual(Enrollment.objects.filter(student=self.student).count(), 2)
+
+    def test_bulk_create_query_count_is_constant(self):
+        self.client.force_authenticate(self.staff)
+        students = self._students(30)
+        with CaptureQueriesContext(connection) as few:
+            self.client.post(self.url, [{'student': s.id, 'subject': self.math.id} for s in students[:3]], format='json')
+        with CaptureQueriesContext(connection) as many:
+            response = self.client.post(self.url, [{'student': s.id, 'subject': self.art.id} for s in students], format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(few.captured_queries), len(many.captured_queries))
+        self.assertEqual(Enrollment.objects.count(), 33)
+
+    def test_concurrent_enrollment_conflicts_only_its_row(self):
+        students = self._students(3)
+        check = views._enrollment_errors
+
+        def check_then_race(pairs):
+            # another request enrolls students[1] between the checks and the insert
+            errors = check(pairs)
+            Enrollment.objects.get_or_create(student=students[1], subject=self.math)
+            return errors
+
+        self.client.force_authenticate(self.staff)
+        with mock.patch('grades.views._enrollment_errors', side_effect=check_then_race):
+            response = self.client.post(self.url, [{'student': s.id, 'subject': self.math.id} for s in students],
+                                        format='json')
+        self.assertEqual(response.status_code, 201)
+        results = response.data['results']
+        self.assertEqual([r['status'] for r in results], ['created', 'error', 'created'])
+        self.assertEqual(results[1]['errors'], {'non_field_errors': ['Student is already enrolled in this subject.']})
+        self.assertEqual(Enrollment.objects.filter(subject=self.math).count(), 3)
+        self.assertEqual(SubjectStats.objects.get(subject=self.math).enrollment_count, 3)
+
+    def test_student_can_only_enroll_self(self):
+        other = self._students(1)[0]
+        self.client.force_authenticate(self.student)
+        response = self.client.post(self.url, [{'student': other.id, 'subject': self.math.id}], format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['results'][0]['enrollment']['student'], self.student.id)
+        self.assertFalse(Enrollment.objects.filter(student=other).exists())
+
+    def test_bulk_grade_updates_rows(self):
+        students = self._students(5)
+        enrollments = [Enrollment.objects.create(student=s, subject=self.math) for s in students]
+        before = enrollments[0].updated_at
+        self.client.force_authenticate(self.staff)
+        response = self.client.patch(self.url, [{'id': e.id, 'grade': 'A'} for e in enrollments] + [{'id': 9999, 'grade': 'B'}], format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['results'][-1]['status'], 'error')
+        self.assertEqual(set(Enrollment.objects.values_list('grade', flat=True)), {'A'})
+        enrollments[0].refresh_from_db()
+        self.assertGreater(enrollments[0].updated_at, before)
+
+    def test_student_cannot_grade_others(self):
+        other = self._students(1)[0]
+        theirs = Enrollment.objects.create(student=other, subject=self.math)
+        self.client.force_authenticate(self.student)
+        response = self.client.patch(self.url, [{'id': theirs.id, 'grade': 'A'}], format='json')
+        self.assertEqual(response.status_code, 400)
+        theirs.refresh_from_db()
+        self.assertIsNone(theirs.grade)
+
+    def test_rejects_non_list_payload(self):
+        self.client.force_authenticate(self.staff)
+        response = self.client.post(self.url, {'subject': self.math.id}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+class GradebookExportTest(APITestCase):
+    """GET /api/enrollments/export/ streams the gradebook as CSV or NDJSON."""
+
+    url = '/api/enrollments/export/'
+
+    def setUp(self):
+        self.staff = User.objects.create_user(email='staff@example.com', password='pass', is_staff=True)
+        self.student = User.objects.create_user(email='student@example.com', password='pass')
+        self.other = User.objects.create_user(email='other@example.com', password='pass')
+        self.math = Subject.objects.create(name='Math')
+        self.art = Subject.objects.create(name='Art, Design')
+        Enrollment.objects.create(student=self.student, subject=self.math, grade='A')
+        Enrollment.objects.create(student=self.student, subject=self.art)
+        Enrollment.objects.create(student=self.other, subject=self.math, grade='B')
+
+    def _body(self, response):
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+
+    def test_csv_export(self):
+        self.client.force_authenticate(self.staff)
+        rows = list(csv.reader(self._body(self.client.get(self.url)).splitlines()))
+        self.assertEqual(rows[0][:6], ['id', 'student', 'student_email', 'subject', 'subject_name', 'grade'])
+        self.assertEqual(len(rows), 4)
+        self.assertEqual(rows[2][4], 'Art, Design')
+
+    def test_ndjson_export_filtered_by_subject(self):
+        self.client.force_authenticate(self.staff)
+        body = self._body(self.client.get(self.url, {'output': 'ndjson', 'subject': self.math.id}))
+        rows = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual([r['student_email'] for r in rows], ['student@example.com', 'other@example.com'])
+        self.assertEqual({r['subject_name'] for r in rows}, {'Math'})
+
+    def test_ndjson_matches_serializer_fields(self):
+        self.client.force_authenticate(self.staff)
+        exported = json.loads(self._body(self.client.get(self.url, {'output': 'ndjson'})).splitlines()[0])
+        listed = self.client.get('/api/enrollments/').data['results']
+        serialized = next(r for r in listed if r['id'] == exported['id'])
+        for field in ('student', 'subject', 'grade', 'created_at', 'updated_at'):
+            self.assertEqual(exported[field], serialized[field])
+
+    def test_student_exports_only_own_rows(self):
+        self.client.force_authenticate(self.student)
+        body = self._body(self.client.get(self.url, {'output': 'ndjson'}))
+        self.assertEqual(len(body.splitlines()), 2)
+        self.assertNotIn('other@example.com', body)
+
+    def test_rejects_unknown_output(self):
+        self.client.force_authenticate(self.staff)
+        self.assertEqual(self.client.get(self.url, {'output': 'xml'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'subject': 'abc'}).status_code, 400)
+
+    @override_settings(GRADES_EXPORT_CHUNK_SIZE=1)
+    async def test_asgi_export_is_sent_while_rows_are_read(self):
+        # Django's ASGI handler collects a sync iterator in full before sending it
+        token = await Token.objects.acreate(user=self.staff)
+        scope = {'type': 'http', 'method': 'GET', 'path': self.url, 'query_string': b'output=ndjson',
+                 'headers': [(b'host', b'testserver'), (b'authorization', f'Token {token.key}'.encode())]}
+        for signal in (request_started, request_finished):  # keep the test's transaction open
+            signal.disconnect(close_old_connections)
+            self.addCleanup(signal.connect, close_old_connections)
+
+        async def receive():
+            return {'type': 'http.request', 'body': b''}
+
+        sent = []
+
+        async def send(message):
+            if message['type'] == 'http.response.body':
+                sent.append((message.get('body', b''), isoformat.call_count))
+
+        with mock.patch('grades.exports._isoformat', wraps=exports._isoformat) as isoformat:
+            await get_asgi_application()(scope, receive, send)
+        lines = b''.join(body for body, _ in sent).decode().splitlines()
+        self.assertEqual(len(lines), 3)
+        # two timestamps per row: the first row went out before the second was read
+        self.assertEqual(sent[0], (lines[0].encode() + b'\n', 2))
+
+
+
+class UserImportTest(APITestCase):
+    """CSV user import: pooled password hashing, batched bulk_create and an end-of-run report."""
+
+    csv_text = (
+        'email,password,first_name,last_name\n'
+        'a@example.com,secret1,Ann,A\n'
+        'b@example.com,secret2,Ben,B\n'
+        'existing@example.com,secret3,,\n'
+        'a@example.com,secret4,,\n'
+        'not-an-email,secret5,,\n'
+        'c@example.com,short,,\n'
+        'd@example.com,,Dee,\n'
+    )
+
+    def setUp(self):
+        self.admin = User.objects.create_user(email='existing@example.com', password='pass', is_staff=True)
+
+    def _check_report(self, report):
+        self.assertEqual(report['total'], 7)
+        self.assertEqual(report['created'], 3)
+        self.assertEqual(sorted(report['duplicates']), ['a@example.com', 'existing@example.com'])
+        self.assertEqual([f['line'] for f in report['failures']], [6, 7])
+        ann = User.objects.get(email='a@example.com')
+        self.assertTrue(ann.check_password('secret1'))
+        self.assertEqual(ann.first_name, 'Ann')
+        self.assertFalse(User.objects.get(email='d@example.com').has_usable_password())
+
+    def test_import_with_process_pool(self):
+        progress = []
+        report = import_users(read_user_csv(io.StringIO(self.csv_text)), workers=2, batch_size=2,
+                              progress=lambda processed, created: progress.append((processed, created)))
+        self._check_report(report)
+        self.assertEqual(progress[-1], (7, 3))
+
+    def test_import_endpoint_is_admin_only(self):
+        upload = SimpleUploadedFile('users.csv', self.csv_text.encode(), content_type='text/csv')
+        student = User.objects.create_user(email='student@example.com', password='pass')
+        self.client.force_authenticate(student)
+        self.assertEqual(self.client.post('/api/users/import/', {'file': upload}).status_code, 403)
+
+    @override_settings(GRADES_IMPORT_WORKERS=1)
+    def test_import_endpoint(self):
+        upload = SimpleUploadedFile('users.csv', self.csv_text.encode(), content_type='text/csv')
+        self.client.force_authenticate(self.admin)
+        response = self.client.post('/api/users/import/', {'file': upload})
+        self.assertEqual(response.status_code, 201)
+        self._check_report(response.data)
+
+    def test_row_created_concurrently_is_reported_as_failure(self):
+        # another writer creates b@example.com between the duplicate check and the insert
+        def hash_and_race(password, *args, **kwargs):
+            if not User.objects.filter(email='b@example.com').exists():
+                User.objects.create_user(email='b@example.com', password='pass')
+            return make_password(password, *args, **kwargs)
+
+        with mock.patch('grades.imports.make_password', side_effect=hash_and_race):
+            report = import_users(read_user_csv(io.StringIO(self.csv_text)), workers=1, batch_size=10)
+        self.assertEqual(report['created'], 2)
+        self.assertEqual([f['line'] for f in report['failures']], [6, 7, 3])
+        self.assertIn('email', report['failures'][-1]['errors'])
+        self.assertTrue(User.objects.get(email='a@example.com').check_password('secret1'))
+        self.assertTrue(User.objects.filter(email='d@example.com').exists())
+
+    def test_malformed_csv_is_rejected(self):
+        text = 'email,password\n"a@example.com,' + 'x' * 200000 + '\n'
+        upload = SimpleUploadedFile('users.csv', text.encode(), content_type='text/csv')
+        self.client.force_authenticate(self.admin)
+        response = self.client.post('/api/users/import/', {'file': upload})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Malformed CSV', response.data['detail'])
+
+    def test_management_command(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as fh:
+            fh.write(self.csv_text)
+        self.addCleanup(os.remove, fh.name)
+        out = io.StringIO()
+        call_command('import_users', fh.name, '--workers', '1', stdout=out)
+        self.assertIn('Created 3 of 7 users', out.getvalue())
+        self.assertTrue(User.objects.filter(email='b@example.com').exists())
+
+
+@override_settings(CACHES=SHARED_CACHES)
+class CachedTokenAuthenticationTest(APITestCase):
+    """Token -> user resolution is cached and evicted on token deletion or user changes."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(email='student@example.com', password='pass')
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        access_for(self.user)
+
+    def _get(self, url='/api/enrollments/'):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        return response, ctx.captured_queries
+
+    def test_second_request_skips_token_query(self):
+        before = token_cache_stats()
+        first, first_queries = self._get()
+        second, second_queries = self._get()
+        self.assertEqual((first.status_code, second.status_code), (200, 200))
+        self.assertEqual(len(second_queries), len(first_queries) - 1)
+        self.assertFalse(any('authtoken_token' in q['sql'] for q in second_queries))
+        after = token_cache_stats()
+        self.assertEqual(after['misses'] - before['misses'], 1)
+        self.assertEqual(after['hits'] - before['hits'], 1)
+
+    def test_deactivation_invalidates(self):
+        self._get()
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self._get()[0].status_code, 401)
+
+    def test_token_deletion_invalidates(self):
+        self._get()
+        self.token.delete()
+        self.assertEqual(self._get()[0].status_code, 401)
+
+    def test_flag_change_is_seen(self):
+        self.assertEqual(self._get('/api/users/')[0].status_code, 403)
+        self.user.is_staff = True
+        self.user.save()
+        self.assertEqual(self._get('/api/users/')[0].status_code, 200)
+
+    def test_invalid_token_rejected(self):
+        self.client.credentials(HTTP_AUTHORIZATION='Token not-a-real-token')
+        self.assertEqual(self._get()[0].status_code, 401)
+
+
+class ProcessLocalCacheTest(APITestCase):
+    """The default per-process cache (LocMemCache): what tokens and roles cost per request."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(email='staff@example.com', password='pass', is_staff=True)
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def test_tokens_are_cached_under_default_settings(self):
+        before = token_cache_stats()
+        queries = []
+        for _ in range(2):
+            with CaptureQueriesContext(connection) as ctx:
+                self.assertEqual(self.client.get('/api/users/').status_code, 200)
+            queries.append([q['sql'] for q in ctx.captured_queries if 'authtoken_token' in q['sql']])
+        self.assertEqual([len(q) for q in queries], [1, 0])
+        after = token_cache_stats()
+        self.assertEqual((after['misses'] - before['misses'], after['hits'] - before['hits']), (1, 1))
+
+    @override_settings(GRADES_LOCAL_CACHE_TTL=1)
+    def test_revocation_by_another_process_is_seen_after_the_local_ttl(self):
+        self.assertEqual(self.client.get('/api/users/').status_code, 200)
+        # deleted without signals, as another worker's invalidation never reaches this process
+        with connection.cursor() as cursor:
+            cursor.execute('DELETE FROM authtoken_token WHERE key = %s', [self.token.key])
+        self.assertEqual(self.client.get('/api/users/').status_code, 200)
+        time.sleep(1.1)
+        self.assertEqual(self.client.get('/api/users/').status_code, 401)
+
+    def test_roles_cost_no_queries_under_default_settings(self):
+        def role_queries():
+            with CaptureQueriesContext(connection) as ctx:
+                self.assertEqual(self.client.get('/api/enrollments/').status_code, 200)
+            return [q['sql'] for q in ctx.captured_queries if 'auth_group' in q['sql'] or 'auth_permission' in q['sql']]
+
+        # staff: the role comes from the user's flags
+        self.assertEqual(role_queries(), [])
+        # students: resolved once, then served from the (short-lived, per-process) cache
+        student = User.objects.create_user(email='student@example.com', password='pass')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=student).key}')
+        self.assertEqual(len(role_queries()), 2)
+        self.assertEqual(role_queries(), [])
+        # a demotion is read from the flags, so it is seen at once
+        User.objects.filter(pk=self.user.pk).update(is_staff=False)
+        self.assertFalse(access_for(User.objects.get(pk=self.user.pk)).is_staff)
+
+
+class SubjectStatsTest(APITestCase):
+    """SubjectStats is kept current by signals/bulk writes and served without scanning Enrollment."""
+
+    def setUp(self):
+        self.staff = User.objects.create_user(email='staff@example.com', password='pass', is_staff=True)
+        self.students = [User.objects.create_user(email=f's{i}@example.com', password='pass') for i in range(4)]
+        self.math = Subject.objects.create(name='Math')
+        self.art = Subject.objects.create(name='Art')
+
+    def _stats(self, subject):
+        stats = SubjectStats.objects.get(subject=subject)
+        return stats.enrollment_count, stats.graded_count, stats.grade_distribution
+
+    def test_signals_track_create_grade_move_delete(self):
+        e1 = Enrollment.objects.create(student=self.students[0], subject=self.math, grade='A')
+        e2 = Enrollment.objects.create(student=self.students[1], subject=self.math)
+        self.assertEqual(self._stats(self.math), (2, 1, {'A': 1}))
+        e2.grade = ' B '
+        e2.save()
+        self.assertEqual(self._stats(self.math), (2, 2, {'A': 1, 'B': 1}))
+        e1.subject = self.art
+        e1.save()
+        self.assertEqual(self._stats(self.math), (1, 1, {'B': 1}))
+        self.assertEqual(self._stats(self.art), (1, 1, {'A': 1}))
+        e2.delete()
+        self.assertEqual(self._stats(self.math), (0, 0, {}))
+
+    def test_bulk_endpoint_updates_stats(self):
+        self.client.force_authenticate(self.staff)
+        response = self.client.post('/api/enrollments/bulk/',
+                                    [{'student': s.id, 'subject': self.math.id} for s in self.students], format='json')
+        ids = [r['enrollment']['id'] for r in response.data['results']]
+        self.client.patch('/api/enrollments/bulk/', [{'id': i, 'grade': 'A'} for i in ids[:3]], format='json')
+        self.assertEqual(self._stats(self.math), (4, 3, {'A': 3}))
+
+    def test_rebuild_matches_incremental(self):
+        Enrollment.objects.create(student=self.students[0], subject=self.math, grade='A')
+        Enrollment.objects.create(student=self.students[1], subject=self.math, grade='  ')
+        Enrollment.objects.create(student=self.students[2], subject=self.art, grade='C')
+        incremental = {s.subject_id: (s.enrollment_count, s.graded_count, s.grade_distribution)
+                       for s in SubjectStats.objects.all()}
+        # a write that bypasses signals drifts the table until it is rebuilt
+        Enrollment.objects.filter(subject=self.art).update(grade='B')
+        call_command('rebuild_subject_stats', stdout=io.StringIO())
+        self.assertEqual(self._stats(self.math), incremental[self.math.id])
+        self.assertEqual(self._stats(self.art), (1, 1, {'B': 1}))
+
+    def test_stats_endpoints_do_not_touch_enrollment(self):
+        Enrollment.objects.create(student=self.students[0], subject=self.math, grade='A')
+        Enrollment.objects.create(student=self.students[1], subject=self.math)
+        self.client.force_authenticate(self.staff)
+        with CaptureQueriesContext(connection) as ctx:
+            detail = self.client.get(f'/api/subjects/{self.math.id}/stats/')
+            listing = self.client.get('/api/subjects/stats/')
+        self.assertFalse(any('grades_enrollment' in q['sql'] for q in ctx.captured_queries))
+        self.assertEqual(detail.data['ungraded_count'], 1)
+        self.assertEqual(detail.data['grade_distribution'], {'A': 1})
+        self.assertEqual([row['subject_name'] for row in listing.data['results']], ['Math', 'Art'])
+
+    def test_stats_are_staff_only(self):
+        self.client.force_authenticate(self.students[0])
+        self.assertEqual(self.client.get('/api/subjects/stats/').status_code, 403)
+
+    def test_destroy_guard_uses_counter(self):
+        Enrollment.objects.create(student=self.students[0], subject=self.math)
+        self.client.force_authenticate(self.staff)
+        self.assertEqual(self.client.delete(f'/api/subjects/{self.math.id}/').status_code, 400)
+        self.assertEqual(self.client.delete(f'/api/subjects/{self.art.id}/').status_code, 204)
+
+
+@override_settings(GRADES_IMPORT_WORKERS=1, PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class BenchmarkSuiteTest(APITestCase):
+    """The route benchmark covers every served route and no route's query count grows with the data."""
+
+    def setUp(self):
+        # user ids are reused after other tests' rollbacks: drop roles they cached
+        cache.clear()
+
+    def test_every_route_is_benchmarked(self):
+        seed_data(users=3, subjects=2, enrollments=4, prefix='cov')
+        covered = {(name, method) for name, method, _, _ in benchmark_routes(prepare_personas())}
+        self.assertEqual(served_routes() - covered, set())
+
+    def test_query_counts_do_not_scale_with_rows(self):
+        seed_data(users=4, subjects=3, enrollments=8, prefix='small')
+        small = run_benchmarks(repeat=1)
+        seed_data(users=40, subjects=12, enrollments=300, prefix='large')
+        large = run_benchmarks(repeat=1)
+        self.assertEqual(check_query_scaling(small, large), [])
+        self.assertFalse([key for key, row in large.items() if row['status'] >= 500])
+
+    def test_baseline_comparison(self):
+        baseline = {'r GET staff': {'queries': 2, 'p95_ms': 10.0}}
+        self.assertEqual(check_baseline({'r GET staff': {'queries': 2, 'p95_ms': 12.0}}, baseline), [])
+        self.assertEqual(len(check_baseline({'r GET staff': {'queries': 3, 'p95_ms': 40.0}}, baseline)), 2)
+
+
+class ViewMetricsTest(APITestCase):
+    """The metrics middleware records per-view/action counts, latency and DB usage for /api/_metrics."""
+
+    def setUp(self):
+        metrics_registry.reset()
+        self.staff = User.objects.create_user(email='staff@example.com', password='pass', is_staff=True)
+        self.student = User.objects.create_user(email='student@example.com', password='pass')
+        self.subject = Subject.objects.create(name='Math')
+
+    def test_records_view_action_and_queries(self):
+        self.client.force_authenticate(self.staff)
+        self.client.get('/api/subjects/')
+        self.client.get('/api/subjects/')
+        self.client.delete(f'/api/subjects/{self.subject.id}/students/{self.student.id}/')
+        body = self.client.get('/api/_metrics').content.decode()
+        self.assertIn('grades_http_requests_total{view="api:subject-list",action="list",method="GET",status="200"} 2', body)
+        self.assertIn('view="api:subject-remove-student",action="remove_student"', body)
+        self.assertIn('grades_http_request_duration_seconds_count{view="api:subject-list",action="list"} 2', body)
+        queries = [line for line in body.splitlines()
+                   if line.startswith('grades_db_queries_per_request_sum{view="api:subject-list"')]
+        self.assertEqual(len(queries), 1)
+        self.assertGreater(float(queries[0].split()[-1]), 0)
+        self.assertIn('grades_token_cache_hits_total', body)
+
+    def test_metrics_are_admin_only(self):
+        self.client.force_authenticate(self.student)
+        self.assertEqual(self.client.get('/api/_metrics').status_code, 403)
+
+    async def test_counts_queries_of_async_requests(self):
+        async def view(request):
+            pass
+        self.assertTrue(iscoroutinefunction(ViewMetricsMiddleware(view)))
+
+        token = await Token.objects.acreate(user=self.staff)
+        with override_settings(ROOT_URLCONF=read_urlconf(True)):
+            response = await self.async_client.get('/api/subjects/', headers={'Authorization': f'Token {token.key}'})
+        self.assertEqual(response.status_code, 200)
+        # the queries ran in sync_to_async's thread, not the one serving the request
+        self.assertEqual(metrics_registry.queries['api:subject-list', 'list'].count, 1)
+        self.assertGreater(metrics_registry.queries['api:subject-list', 'list'].total, 0)
+
+
+class ConditionalGetTest(APITestCase):
+    """Subject/enrollment GETs carry ETag + Last-Modified and answer matching validators with 304."""
+
+    def setUp(self):
+        self.staff = User.objects.create_user(email='staff@example.com', password='pass', is_staff=True)
+        self.student = User.objects.create_user(email='student@example.com', password='pass')
+        self.other = User.objects.create_user(email='other@example.com', password='pass')
+        self.math = Subject.objects.create(name='Math')
+        self.enrollment = Enrollment.objects.create(student=self.student, subject=self.math)
+
+    def _etag(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Last-Modified', response)
+        return response['ETag']
+
+    def test_subject_list_not_modified_skips_serializer(self):
+        self.client.force_authenticate(self.staff)
+        etag = self._etag('/api/subjects/')
+        with mock.patch.object(SubjectSerializer, 'get_enrollments') as get_enrollments:
+            response = self.client.get('/api/subjects/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        get_enrollments.assert_not_called()
+
+    def test_student_grade_change_changes_etag(self):
+        self.client.force_authenticate(self.student)
+        etag = self._etag('/api/subjects/')
+        self.enrollment.grade = 'A'
+        self.enrollment.save()
+        self.assertEqual(self.client.get('/api/subjects/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_embedded_student_email_change_changes_staff_etag(self):
+        self.client.force_authenticate(self.staff)
+        etag = self._etag(f'/api/subjects/{self.math.id}/')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.student.email = 'renamed@example.com'
+            self.student.save()
+        self.assertEqual(self.client.get(f'/api/subjects/{self.math.id}/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_etag_is_per_user(self):
+        self.client.force_authenticate(self.student)
+        etag = self._etag('/api/subjects/')
+        self.client.force_authenticate(self.other)
+        self.assertEqual(self.client.get('/api/subjects/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_enrollment_list_delete_changes_etag(self):
+        Enrollment.objects.create(student=self.other, subject=self.math)
+        self.client.force_authenticate(self.staff)
+        etag = self._etag('/api/enrollments/')
+        self.assertEqual(self.client.get('/api/enrollments/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        Enrollment.objects.filter(student=self.other).delete()
+        self.assertEqual(self.client.get('/api/enrollments/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_enrollment_detail_if_modified_since(self):
+        self.client.force_authenticate(self.student)
+        response = self.client.get(f'/api/enrollments/{self.enrollment.id}/')
+        again = self.client.get(f'/api/enrollments/{self.enrollment.id}/',
+                                HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(again.status_code, 304)
+
+    def test_unknown_or_foreign_rows_still_404(self):
+        self.client.force_authenticate(self.other)
+        self.assertEqual(self.client.get(f'/api/enrollments/{self.enrollment.id}/').status_code, 404)
+        self.assertEqual(self.client.get('/api/subjects/9999/').status_code, 404)
+
+
+@override_settings(CACHES=SHARED_CACHES)
+class SubjectResponseCacheTest(APITestCase):
+    """Anonymous and staff subject payloads are shared across users and invalidated by version bumps.
+
+    A hit runs one query: the scope versions, read from the database so every process sees a bump.
+    """
+
+    def setUp(self):
+        # the version rows roll back with each test, so payloads cached by an earlier one would match again
+        cache.clear()
+        # committed, so no version bump of setUp's writes is left for a test's commit to flush
+        with self.captureOnCommitCallbacks(execute=True):
+            self.staff = User.objects.create_user(email='staff@example.com', password='pass', is_staff=True)
+            self.admin = User.objects.create_user(email='admin@example.com', password='pass', is_staff=True)
+            self.student = User.objects.create_user(email='student@example.com', password='pass')
+            self.math = Subject.objects.create(name='Math')
+            self.enrollment = Enrollment.objects.create(student=self.student, subject=self.math)
+        access_for(self.staff)
+        access_for(self.admin)
+
+    def _get(self, url='/api/subjects/', user=None):
+        # a fresh client per request: logging a force-authenticated client out touches the session table
+        client = self.client_class()
+        if user is not None:
+            client.force_authenticate(user)
+        response = client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_anonymous_hit_runs_only_the_version_query(self):
+        first = self._get()
+        before = response_cache_stats()
+        with self.assertNumQueries(1):  # the scope versions
+            again = self._get()
+        self.assertEqual(again.data, first.data)
+        self.assertEqual(again['ETag'], first['ETag'])
+        self.assertEqual(response_cache_stats()['hits'], before['hits'] + 1)
+
+    def test_staff_payload_shared_between_staff_users(self):
+        first = self._get(f'/api/subjects/{self.math.id}/', self.staff)
+        with self.assertNumQueries(1):  # the scope versions
+            again = self._get(f'/api/subjects/{self.math.id}/', self.admin)
+        self.assertEqual(again.data, first.data)
+
+    def test_subject_change_invalidates_every_variant(self):
+        self._get()
+        self._get(user=self.staff)
+        with self.captureOnCommitCallbacks(execute=True):
+            Subject.objects.create(name='Physics')
+        names = {s['name'] for s in self._get().data['results']}
+        self.assertIn('Physics', names)
+        names = {s['name'] for s in self._get(user=self.staff).data['results']}
+        self.assertIn('Physics', names)
+
+    def test_enrollment_change_invalidates_staff_only(self):
+        self._get()
+        self._get(user=self.staff)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.enrollment.grade = 'A'
+            self.enrollment.save()
+        with self.assertNumQueries(1):  # the scope versions
+            self._get()
+        enrollments = self._get(user=self.staff).data['results'][0]['enrollments']
+        self.assertEqual(enrollments[0]['grade'], 'A')
+
+    def test_bulk_grade_invalidates_staff_payload(self):
+        self._get(user=self.staff)
+        self.client.force_authenticate(self.staff)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch('/api/enrollments/bulk/', [{'id': self.enrollment.id, 'grade': 'B'}],
+                                         format='json')
+        self.assertEqual(response.status_code, 200)
+        enrollments = self._get(user=self.staff).data['results'][0]['enrollments']
+        self.assertEqual(enrollments[0]['grade'], 'B')
+
+    def test_versions_bumped_once_after_commit(self):
+        before = current_versions(ENROLLMENTS)[0]
+        with self.captureOnCommitCallbacks() as callbacks:
+            with CaptureQueriesContext(connection) as ctx:
+                for grade in 'ABC':
+                    self.enrollment.grade = grade
+                    self.enrollment.save()
+        # no writer holds the shared version row locked until it commits
+        self.assertFalse([q for q in ctx.captured_queries if 'grades_cacheversion' in q['sql']])
+        self.assertEqual(current_versions(ENROLLMENTS)[0], before)
+        with CaptureQueriesContext(connection) as ctx:
+            for callback in callbacks:
+                callback()
+        self.assertEqual(len(ctx.captured_queries), 1)
+        self.assertEqual(current_versions(ENROLLMENTS)[0], before + 1)
+
+    def test_student_payload_not_cached(self):
+        self._get(user=self.student)
+        before = response_cache_stats()
+        with CaptureQueriesContext(connection) as ctx:
+            self._get(user=self.student)
+        self.assertGreater(len(ctx.captured_queries), 0)
+        self.assertEqual(response_cache_stats(), before)
+
+    def test_cached_etag_answers_not_modified(self):
+        etag = self._get()['ETag']
+        with self.assertNumQueries(1):  # the scope versions
+            response = self.client.get('/api/subjects/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+
+class AsyncReadPathTest(TestCase):
+    """The async list/detail views (ASGI) answer byte-for-byte like the sync viewset actions."""
+
+    def setUp(self):
+        self.staff = User.objects.create_user(email='staff@example.com', password='pass', is_staff=True)
+        self.student = User.objects.create_user(email='student@example.com', password='pass')
+        for i in range(5):
+            subject = Subject.objects.create(name=f'Subject {i}')
+            Enrollment.objects.create(student=self.student, subject=subject, grade='A' if i % 2 else None)
+        self.subject = subject
+        self.tokens = {
+            'staff': Token.objects.create(user=self.staff).key,
+            'student': Token.objects.create(user=self.student).key,
+        }
+
+    def _headers(self, role, extra=None):
+        headers = {'Authorization': f'Token {self.tokens[role]}'} if role else {}
+        return {**headers, **(extra or {})}
+
+    async def _both(self, path, role, extra=None):
+        # the shared response cache would answer the second request; compare rendered views
+        cache.clear()
+        with override_settings(ROOT_URLCONF=read_urlconf(True)):
+            async_response = await self.async_client.get(path, headers=self._headers(role, extra))
+        cache.clear()
+        with override_settings(ROOT_URLCONF=read_urlconf(False)):
+            sync_response = await sync_to_async(self.client.get)(path, headers=self._headers(role, extra))
+        return async_response, sync_response
+
+    async def test_responses_identical(self):
+        enrollment = await Enrollment.objects.afirst()
+        paths = [
+            '/api/subjects/?page_size=2', '/api/subjects/?page_size=2&cursor=cD0y', f'/api/subjects/{self.subject.id}/',
+            '/api/enrollments/?page_size=2', f'/api/enrollments/{enrollment.id}/', '/api/enrollments/999/',
+            '/api/users/', f'/api/users/{self.student.id}/', '/api/subjects/abc/',
+            '/api/subjects/?fields=id,name', '/api/subjects/?omit=enrollments.student',
+            '/api/enrollments/?expand=student,subject', '/api/enrollments/?fields=nope',
+        ]
+        for path in paths:
+            for role in (None, 'student', 'staff'):
+                with self.subTest(path=path, role=role):
+                    async_response, sync_response = await self._both(path, role)
+                    self.assertEqual(async_response.status_code, sync_response.status_code)
+                    self.assertEqual(async_response.content, sync_response.content)
+                    self.assertEqual(async_response.get('ETag'), sync_response.get('ETag'))
+
+    async def test_not_modified_and_invalid_token(self):
+        _, sync_response = await self._both('/api/enrollments/', 'student')
+        async_response, _ = await self._both('/api/enrollments/', 'student', {'If-None-Match': sync_response['ETag']})
+        self.assertEqual(async_response.status_code, 304)
+        with override_settings(ROOT_URLCONF=read_urlconf(True)):
+            response = await self.async_client.get('/api/enrollments/', headers={'Authorization': 'Token nope'})
+        self.assertEqual(response.status_code, 401)
+
+    async def test_writes_use_sync_view(self):
+        with override_settings(ROOT_URLCONF=read_urlconf(True)):
+            response = await self.async_client.post(
+                '/api/subjects/', {'name': 'Physics'}, content_type='application/json', headers=self._headers('staff'))
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(await Subject.objects.filter(name='Physics').aexists())
+
+
+class ConcurrencyBenchmarkTest(TransactionTestCase):
+    """The WSGI/ASGI read comparison serves every route in both modes (committed data, real threads)."""
+
+    def test_both_modes_serve_every_read(self):
+        seed_data(users=6, subjects=3, enrollments=10, prefix='conc')
+        results = run_concurrency_benchmark(concurrency=3, requests=6)
+        self.assertEqual({key.rsplit(' ', 1)[1] for key in results}, {'wsgi', 'asgi'})
+        self.assertEqual(len(results), 12)
+        self.assertFalse([key for key, row in results.items() if row['non_200'] or row['requests'] != 6])
+
+
+class LoadTestHarnessTest(TransactionTestCase):
+    """The load test boots a real server on the test database and reports every endpoint of the mix."""
+
+    def test_registration_mix_against_local_server(self):
+        seed_data(users=6, subjects=2, enrollments=4, prefix='load')
+        personas = load_personas(students=4, graders=1, hot_subjects=1)
+        connections.close_all()
+        with LocalServer(connection.settings_dict['NAME']) as server:
+            results = run_load_test(server.url, personas, duplicate_rate=1.0, think=0, ramp=0, seed=1)
+        self.assertEqual(set(results) - {'enrollments:ungraded', 'enrollments:grade'}, {
+            'login', 'subjects:list', 'subjects:search', 'subjects:detail', 'enrollments:create',
+            'enrollments:list', 'total'})
+        self.assertEqual((results['total']['errors'], results['total']['lock_failures']), (0, 0))
+        # every student double-submitted: two were already enrolled by the seed (both requests
+        # lose), the other two win exactly one of their racing requests
+        create = results['enrollments:create']
+        self.assertEqual((create['requests'], create['ok'], create['conflicts']), (8, 2, 6))
+        hot = personas['subjects'][0]['id']
+        self.assertEqual(Enrollment.objects.filter(subject_id=hot, student__email__in=personas['students']).count(), 4)
+
+
+class DatabaseConfigTest(TestCase):
+    """API_DB_* variables select and tune the database backend."""
+
+    def test_sqlite_connection_is_tuned(self):
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            self.assertEqual(cursor.fetchone()[0], 'wal')
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)  # NORMAL
+
+    def test_postgresql_behind_pgbouncer(self):
+        config = database_config('/srv', {'API_DB_ENGINE': 'postgresql', 'API_DB_HOST': 'db',
+                                          'API_DB_CONN_MAX_AGE': '300', 'API_DB_PGBOUNCER': '1'})
+        self.assertEqual(config['ENGINE'], 'django.db.backends.postgresql')
+        self.assertEqual((config['HOST'], config['CONN_MAX_AGE']), ('db', 300))
+        self.assertTrue(config['CONN_HEALTH_CHECKS'])
+        self.assertTrue(config['DISABLE_SERVER_SIDE_CURSORS'])
+        with self.assertRaises(ValueError):
+            database_config('/srv', {'API_DB_ENGINE': 'oracle'})
+
+
+@override_settings(GRADES_DB_REPLICAS=['replica1'])
+class ReadReplicaRoutingTest(TransactionTestCase):
+    """GET requests read from a replica (a second SQLite file here) except after the user's own write."""
+
+    def setUp(self):
+        cache.clear()
+        self.replica_path = os.path.join(tempfile.mkdtemp(), 'replica.sqlite3')
+        config = replica_configs(connection.settings_dict, {'API_DB_REPLICAS': self.replica_path})
+        connections.settings['replica1'] = connections.configure_settings(
+            {'default': connection.settings_dict, **config})['replica1']
+        self.addCleanup(self._drop_replica)
+        self.student = User.objects.create_user(email='reader@example.com', password='pass')
+        self.other = User.objects.create_user(email='other@example.com', password='pass')
+        self.old = Subject.objects.create(name='Old')
+
+    def _drop_replica(self):
+        connections['replica1'].close()
+        del connections['replica1']
+        del connections.settings['replica1']
+        routers._down.clear()
+        if os.path.exists(self.replica_path):
+            os.remove(self.replica_path)
+
+    def _sync_replica(self):
+        # the stand-in replica: a snapshot of the primary, which then moves on without it
+        connection.ensure_connection()
+        replica = sqlite3.connect(self.replica_path)
+        connection.connection.backup(replica)
+        replica.execute('PRAGMA journal_mode=DELETE')
+        replica.close()
+
+    def _subject_names(self, user=None):
+        client = APIClient()
+        if user is not None:
+            client.force_authenticate(user)
+        response = client.get('/api/subjects/')
+        self.assertEqual(response.status_code, 200)
+        return sorted(row['name'] for row in response.data['results'])
+
+    def test_reads_use_replica_until_own_write(self):
+        self._sync_replica()
+        new = Subject.objects.create(name='New')
+        self.assertEqual(self._subject_names(self.student), ['Old'])
+
+        client = APIClient()
+        client.force_authenticate(self.student)
+        self.assertEqual(client.post('/api/enrollments/', {'subject': new.id}, format='json').status_code, 201)
+        # the student's own write is visible right away; other students still read the replica
+        self.assertEqual(self._subject_names(self.student), ['New', 'Old'])
+        self.assertEqual(len(client.get('/api/enrollments/').data['results']), 1)
+        self.assertEqual(self._subject_names(self.other), ['Old'])
+        # shared (cached) payloads are rendered from the primary, so they are never stale
+        self.assertEqual(self._subject_names(), ['New', 'Old'])
+
+    def test_unavailable_replica_falls_back_to_primary(self):
+        # no replica file: opening it read-only fails
+        self.assertEqual(self._subject_names(self.student), ['Old'])
+        self.assertIn('replica1', routers._down)
+
+        # while it is marked down the replica is not even tried
+        self.assertEqual(self._subject_names(self.other), ['Old'])
+        self.assertIsNone(connections['replica1'].connection)
+
+        router = routers.ReadReplicaRouter()
+        self.assertEqual(router.db_for_write(Subject, instance=self.old), 'default')
+        self.assertFalse(router.allow_migrate('replica1', 'grades'))
+
+    def test_replica_failing_mid_request_is_retried_on_primary(self):
+        # the replica opens, but its first query fails (no tables)
+        sqlite3.connect(self.replica_path).close()
+        self.assertEqual(self._subject_names(self.student), ['Old'])
+        self.assertIn('replica1', routers._down)
+
+    async def test_async_requests_read_replica_until_own_write(self):
+        await sync_to_async(self._sync_replica)()
+        new = await Subject.objects.acreate(name='New')
+        token = await Token.objects.acreate(user=self.student)
+        headers = {'Authorization': f'Token {token.key}'}
+
+        async def names():
+            with override_settings(ROOT_URLCONF=read_urlconf(True)):
+                response = await self.async_client.get('/api/subjects/', headers=headers)
+            self.assertEqual(response.status_code, 200)
+            return sorted(row['name'] for row in response.json()['results'])
+
+        self.assertEqual(await names(), ['Old'])
+        response = await self.async_client.post('/api/enrollments/', {'subject': new.id},
+                                                content_type='application/json', headers=headers)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(await names(), ['New', 'Old'])
+
+
+class ConcurrentEnrollmentWritesTest(TransactionTestCase):
+    """Enrollment writes from many threads at once: no "database is locked", SubjectStats stays exact."""
+
+    threads = 8
+
+    def test_parallel_enroll_and_grade(self):
+        staff = User.objects.create_user(email='staff@example.com', password='pass', is_staff=True)
+        students = [User.objects.create_user(email=f'hammer{i}@example.com', password='pass')
+                    for i in range(self.threads)]
+        subjects = [Subject.objects.create(name=f'Hammer {i}') for i in range(4)]
+        start = threading.Barrier(self.threads)
+
+        def hammer(student):
+            as_student, as_staff = APIClient(), APIClient()
+            as_student.force_authenticate(student)
+            as_staff.force_authenticate(staff)
+            statuses = []
+            try:
+                start.wait()
+                for subject in subjects:
+                    response = as_student.post('/api/enrollments/', {'subject': subject.id}, format='json')
+                    statuses.append(response.status_code)
+                    enrollment_id = response.data['id']
+                    statuses.append(as_staff.patch(f'/api/enrollments/{enrollment_id}/', {'grade': 'A'},
+                                                   format='json').status_code)
+                    statuses.append(as_staff.patch('/api/enrollments/bulk/', [{'id': enrollment_id, 'grade': 'B'}],
+                                                   format='json').status_code)
+            finally:
+                connections.close_all()
+            return statuses
+
+        with ThreadPoolExecutor(self.threads) as pool:
+            statuses = [code for codes in pool.map(hammer, students) for code in codes]
+
+        self.assertEqual(set(statuses), {200, 201})
+        self.assertEqual(Enrollment.objects.filter(grade='B').count(), self.threads * len(subjects))
+        expected = {row.subject_id: (row.enrollment_count, row.graded_count, row.grade_distribution)
+                    for row in compute_subject_stats()}
+        stored = {row.subject_id: (row.enrollment_count, row.graded_count, row.grade_distribution)
+                  for row in SubjectStats.objects.all()}
+        self.assertEqual(stored, expected)
+
+
+@override_settings(CACHES=SHARED_CACHES)
+class FastListTest(APITestCase):
+    """List actions built from values() rows and rendered by orjson match the serializer byte for byte."""
+
+    def setUp(self):
+        cache.clear()
+        self.staff = User.objects.create_user(email='staff@example.com', password='pass', is_staff=True,
+                                              first_name='Zoë', last_name='line\u2028sep "quoted"')
+        self.student = User.objects.create_user(email='student@example.com', password='pass', is_admin=True)
+        for i in range(5):
+            subject = Subject.objects.create(name=f'Subject {i}')
+            Enrollment.objects.create(student=self.student, subject=subject, grade=['A', None, ' ', 'Ü', 'B'][i])
+        access_for(self.staff)
+
+    def _expected(self, serializer_class, queryset):
+        return JSONRenderer().render(serializer_class(queryset, many=True).data)
+
+    def test_fast_serializer_matches_model_serializer(self):
+        cases = [
+            (EnrollmentSerializer, Enrollment.objects.order_by('id')),
+            (UserSerializer, User.objects.order_by('id')),
+        ]
+        for serializer_class, queryset in cases:
+            columns = [column for _, column, _ in values_plan(serializer_class)]
+            fast = ORJSONRenderer().render(FastListSerializer(serializer_class, queryset.values(*columns)).data)
+            self.assertEqual(fast, self._expected(serializer_class, queryset))
+
+    def test_method_fields_are_not_fast_pathed(self):
+        self.assertIsNone(values_plan(SubjectSerializer))
+
+    def test_list_endpoint_bytes_and_no_joins(self):
+        self.client.force_authenticate(self.staff)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get('/api/enrollments/?page_size=3')
+        self.assertFalse([q['sql'] for q in ctx.captured_queries if 'JOIN' in q['sql']])
+        page = Enrollment.objects.order_by('updated_at', 'id')[:3]
+        expected = JSONRenderer().render({
+            'next': response.data['next'], 'previous': None,
+            'results': EnrollmentSerializer(page, many=True).data,
+        })
+        self.assertEqual(response.content, expected)
+        following = self.client.get(response.data['next'])
+        self.assertEqual([row['id'] for row in following.data['results']],
+                         list(Enrollment.objects.order_by('updated_at', 'id').values_list('id', flat=True)[3:]))
+
+    def test_orjson_parser(self):
+        response = self.client.post('/api/users/', '{"email": "new@example.com", "password": "secret123", "first_name": "Zoë"}',
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(User.objects.get(email='new@example.com').first_name, 'Zoë')
+        with self.assertRaises(ParseError) as orjson_error:
+            ORJSONParser().parse(io.BytesIO(b'{"a": '))
+        with self.assertRaises(ParseError) as stdlib_error:
+            JSONParser().parse(io.BytesIO(b'{"a": '))
+        self.assertEqual(str(orjson_error.exception), str(stdlib_error.exception))
+
+    def test_serialization_benchmark_outputs_identical(self):
+        results = run_serialization_benchmark(repeat=1)
+        self.assertTrue(all(row['identical'] for row in results.values()))
+        self.assertEqual(results['enrollments']['rows'], 5)
+
+
+@override_settings(CACHES=SHARED_CACHES)
+class SparseFieldsetTest(APITestCase):
+    """?fields= / ?omit= / ?expand= shape the payload and drop the queries of skipped fields."""
+
+    def setUp(self):
+        cache.clear()
+        self.staff = User.objects.create_user(email='staff@example.com', password='pass', is_staff=True)
+        self.student = User.objects.create_user(email='student@example.com', password='pass')
+        for i in range(3):
+            subject = Subject.objects.create(name=f'Subject {i}')
+            Enrollment.objects.create(student=self.student, subject=subject, grade='B')
+        self.subject = subject
+
+    def _get(self, path):
+        cache.clear()
+        # clearing dropped the cached roles too; resolve them outside the measured queries
+        access_for(self.student)
+        access_for(self.staff)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(path)
+        return response, [q['sql'] for q in ctx.captured_queries]
+
+    def test_student_dashboard_skips_enrollment_queries(self):
+        self.client.force_authenticate(self.student)
+        response, queries = self._get('/api/subjects/?fields=id,name')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([set(row) for row in response.data['results']], [{'id', 'name'}] * 3)
+        self.assertFalse([sql for sql in queries if 'grades_enrollment' in sql])
+        full, _ = self._get('/api/subjects/')
+        self.assertEqual(full.data['results'][0]['student_grade'], 'B')
+
+    def test_staff_omit_nested(self):
+        self.client.force_authenticate(self.staff)
+        response, queries = self._get('/api/subjects/?omit=enrollments')
+        self.assertNotIn('enrollments', response.data['results'][0])
+        self.assertFalse([sql for sql in queries if 'grades_enrollment' in sql])
+
+        response, queries = self._get(f'/api/subjects/{self.subject.id}/?omit=enrollments.student')
+        self.assertEqual(response.data['enrollments'], [{'id': self.subject.enrollments.get().id, 'grade': 'B'}])
+        self.assertFalse([sql for sql in queries if 'JOIN' in sql])
+
+    def test_enrollment_fields_and_expand(self):
+        self.client.force_authenticate(self.student)
+        response, queries = self._get('/api/enrollments/?fields=id,grade')
+        self.assertEqual(set(response.data['results'][0]), {'id', 'grade'})
+        self.assertFalse([sql for sql in queries if 'JOIN' in sql or 'created_at' in sql])
+
+        response, _ = self._get('/api/enrollments/?fields=grade&expand=student,subject')
+        first = Enrollment.objects.select_related('subject').order_by('updated_at', 'id').first()
+        self.assertEqual(response.data['results'][0], {
+            'student': {'id': self.student.id, 'email': 'student@example.com'},
+            'subject': {'id': first.subject_id, 'name': first.subject.name},
+            'grade': 'B',
+        })
+
+    def test_expanded_email_change_changes_etag(self):
+        self.client.force_authenticate(self.student)
+        first = self.client.get('/api/enrollments/?expand=student')
+        User.objects.filter(pk=self.student.pk).update(email='renamed@example.com', updated_at=timezone.now())
+        second = self.client.get('/api/enrollments/?expand=student', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second.data['results'][0]['student']['email'], 'renamed@example.com')
+
+    def test_unknown_names_rejected(self):
+        self.client.force_authenticate(self.staff)
+        response = self.client.get('/api/subjects/?fields=id,nope&expand=enrollments&omit=enrollments.nope')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data, {'fields': ["Unknown field 'nope'."], 'expand': ["Unknown field 'enrollments'."]})
+        response = self.client.get('/api/subjects/?omit=enrollments.nope')
+        self.assertEqual(response.data, {'omit': ["Unknown field 'nope'."]})
+
+    def test_writes_ignore_fieldsets(self):
+        self.client.force_authenticate(self.staff)
+        response = self.client.post('/api/subjects/?fields=id', {'name': 'Physics'}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertIn('name', response.data)
+
+
+class TranscriptTest(APITestCase):
+    """Student transcripts: one query, credit-weighted GPA over the normalised grade points."""
+
+    def setUp(self):
+        self.staff = User.objects.create_user(email='staff@example.com', password='pass', is_staff=True)
+        self.student = User.objects.create_user(email='student@example.com', password='pass')
+        self.other = User.objects.create_user(email='other@example.com', password='pass')
+        self.math = Subject.objects.create(name='Math', credits=3)
+        self.art = Subject.objects.create(name='Art', credits=4)
+        self.gym = Subject.objects.create(name='Gym')
+        self.history = Subject.objects.create(name='History', credits=2)
+        Enrollment.objects.create(student=self.student, subject=self.math, grade='B+')
+        Enrollment.objects.create(student=self.student, subject=self.art, grade=' a ')
+        Enrollment.objects.create(student=self.student, subject=self.gym, grade='Pass')
+        Enrollment.objects.create(student=self.student, subject=self.history)
+
+    def test_grade_points_scale(self):
+        cases = {'A': '4.00', 'b+': '3.30', ' C- ': '1.70', 'F': '0.00', '3.456': '3.46', '0': '0.00',
+                 '4.5': None, '95': None, 'Pass': None, '': None, '   ': None, None: None, 'NaN': None}
+        for grade, expected in cases.items():
+            with self.subTest(grade=grade):
+                points = grade_points(grade)
+                self.assertEqual(None if points is None else str(points), expected)
+
+    def test_grade_points_follow_saves_and_bulk_grading(self):
+        enrollment = Enrollment.objects.get(student=self.student, subject=self.history)
+        self.assertIsNone(enrollment.grade_points)
+        enrollment.grade = 'C'
+        enrollment.save(update_fields=['grade'])
+        enrollment.refresh_from_db()
+        self.assertEqual(str(enrollment.grade_points), '2.00')
+
+        self.client.force_authenticate(self.staff)
+        self.client.patch('/api/enrollments/bulk/', [{'id': enrollment.id, 'grade': 'D-'}], format='json')
+        self.client.post('/api/enrollments/bulk/', [{'student': self.other.id, 'subject': self.math.id, 'grade': 'A-'}],
+                         format='json')
+        self.assertEqual(str(Enrollment.objects.get(pk=enrollment.pk).grade_points), '0.70')
+        self.assertEqual(str(Enrollment.objects.get(student=self.other).grade_points), '3.70')
+
+    def test_transcript_single_query(self):
+        self.client.force_authenticate(self.student)
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/users/me/transcript/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['student']['email'], 'student@example.com')
+        self.assertEqual([e['subject']['name'] for e in response.data['enrollments']], ['Math', 'Art', 'Gym', 'History'])
+        self.assertEqual(response.data['enrollments'][0]['grade_points'], '3.30')
+        self.assertIsNone(response.data['enrollments'][3]['grade_points'])
+        # (3 * 3.30 + 4 * 4.00) / 7 credits with grade points
+        self.assertEqual(response.data['summary'], {
+            'enrollments': 4, 'graded': 3, 'credits': 10, 'gpa_credits': 7, 'quality_points': '25.90', 'gpa': '3.70',
+        })
+
+    def test_empty_transcript(self):
+        self.client.force_authenticate(self.staff)
+        response = self.client.get(f'/api/users/{self.other.id}/transcript/')
+        self.assertEqual(response.data['enrollments'], [])
+        self.assertEqual(response.data['summary'], {
+            'enrollments': 0, 'graded': 0, 'credits': 0, 'gpa_credits': 0, 'quality_points': '0.00', 'gpa': None,
+        })
+
+    def test_access_rules(self):
+        self.client.force_authenticate(self.student)
+        self.assertEqual(self.client.get(f'/api/users/{self.student.id}/transcript/').status_code, 200)
+        self.assertEqual(self.client.get(f'/api/users/{self.other.id}/transcript/').status_code, 403)
+        self.client.force_authenticate(self.staff)
+        self.assertEqual(self.client.get('/api/users/999999/transcript/').status_code, 404)
+        self.client.force_authenticate(None)
+        self.assertEqual(self.client.get('/api/users/me/transcript/').status_code, 401)
+
+
+class ListFilterTest(APITestCase):
+    """Server-side list filters and subject search, each answered from an index."""
+
+    def setUp(self):
+        self.staff = User.objects.create_user(email='Staff@example.com', password='pass', is_staff=True)
+        self.ann = User.objects.create_user(email='Ann.Lee@example.com', password='pass', first_name='Ann', last_name='Lee')
+        self.bob = User.objects.create_user(email='bob@example.com', password='pass', first_name='Bob', last_name='Annan')
+        self.cy = User.objects.create_user(email='cy@example.com', password='pass', first_name='Cy', last_name='Zed')
+        self.algebra = Subject.objects.create(name='Linear Algebra')
+        self.algorithms = Subject.objects.create(name='Algorithms')
+        self.history = Subject.objects.create(name='Art History')
+        self.cafe = Subject.objects.create(name='Café Culture')
+        for student, subject, grade in [
+            (self.ann, self.algebra, 'A'), (self.ann, self.history, ' B+ '), (self.ann, self.cafe, None),
+            (self.bob, self.algebra, 'B+'), (self.bob, self.algorithms, '  '), (self.cy, self.history, 'Pass'),
+        ]:
+            Enrollment.objects.create(student=student, subject=subject, grade=grade)
+        self.client.force_authenticate(self.staff)
+
+    def _get(self, path):
+        cache.clear()
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(path)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response, [q['sql'] for q in ctx.captured_queries]
+
+    def _ids(self, path):
+        return {row['id'] for row in self._get(path)[0].data['results']}
+
+    def _enrollments(self, path):
+        response, _ = self._get(path)
+        return {(row['student'], row['subject']) for row in response.data['results']}
+
+    def test_enrollment_filters(self):
+        self.assertEqual(self._enrollments(f'/api/enrollments/?subject={self.algebra.id}'),
+                         {(self.ann.id, self.algebra.id), (self.bob.id, self.algebra.id)})
+        self.assertEqual(len(self._enrollments(f'/api/enrollments/?student={self.ann.id}')), 3)
+        self.assertEqual(self._enrollments('/api/enrollments/?graded=false'),
+                         {(self.ann.id, self.cafe.id), (self.bob.id, self.algorithms.id)})
+        self.assertEqual(len(self._enrollments('/api/enrollments/?graded=true')), 4)
+        self.assertEqual(self._enrollments('/api/enrollments/?grade=B%2B'),
+                         {(self.ann.id, self.history.id), (self.bob.id, self.algebra.id)})
+        self.assertEqual(self._enrollments(f'/api/enrollments/?student={self.ann.id}&graded=true&grade=A'),
+                         {(self.ann.id, self.algebra.id)})
+
+    def test_students_only_filter_their_own_rows(self):
+        self.client.force_authenticate(self.bob)
+        self.assertEqual(self._enrollments(f'/api/enrollments/?student={self.ann.id}'), set())
+        self.assertEqual(self._enrollments('/api/enrollments/?graded=true'), {(self.bob.id, self.algebra.id)})
+
+    def test_user_filters(self):
+        self.assertEqual(self._ids('/api/users/?email=ann.'), {self.ann.id})
+        self.assertEqual(self._ids('/api/users/?email=STAFF@'), {self.staff.id})
+        self.assertEqual(self._ids('/api/users/?name=an'), {self.ann.id, self.bob.id})
+        self.assertEqual(self._ids('/api/users/?role=student'), {self.ann.id, self.bob.id, self.cy.id})
+        self.assertEqual(self._ids('/api/users/?role=staff&email=s'), {self.staff.id})
+
+    def test_user_filters_with_non_ascii_prefix(self):
+        emile = User.objects.create_user(email='emile@example.com', password='pass', first_name='Émile', last_name='Zola')
+        self.assertEqual(self._ids('/api/users/?name=É'), {emile.id})
+        self.assertEqual(self._ids('/api/users/?name=émi'), {emile.id})
+        self.assertEqual(self._ids('/api/users/?name=ÉMILE'), {emile.id})
+        self.assertEqual(self._ids('/api/users/?name=éx'), set())
+
+    def test_subject_search(self):
+        self.assertEqual(self._ids('/api/subjects/?search=alg'), {self.algebra.id, self.algorithms.id})
+        self.assertEqual(self._ids('/api/subjects/?search=linear%20alg'), {self.algebra.id})
+        self.assertEqual(self._ids('/api/subjects/?search=cafe'), {self.cafe.id})
+        self.assertEqual(self._ids('/api/subjects/?search=%22) OR *'), set())
+        self.assertEqual(self._ids('/api/subjects/?search=history%22'), {self.history.id})
+        # the FTS index follows renames and deletes
+        Subject.objects.filter(pk=self.history.pk).update(name='Geography')
+        self.assertEqual(self._ids('/api/subjects/?search=geo'), {self.history.id})
+        self.assertEqual(self._ids('/api/subjects/?search=history'), set())
+        Subject.objects.filter(pk=self.cafe.pk).delete()
+        self.assertEqual(self._ids('/api/subjects/?search=caf'), set())
+
+    @skipUnless(connection.vendor == 'sqlite', 'SQLite FTS5 search index')
+    def test_search_triggers_exist_after_migrate_and_are_recreated(self):
+        def triggers():
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'grades_subject'")
+                return {name for name, in cursor.fetchall()}
+
+        # the test database was built by migrate
+        self.assertEqual(triggers(), set(SUBJECT_FTS_TRIGGERS))
+        with connection.cursor() as cursor:
+            cursor.execute('DROP TRIGGER grades_subject_fts_insert')
+        geometry = Subject.objects.create(name='Geometry')
+        self.assertEqual(self._ids('/api/subjects/?search=geo'), set())
+
+        emit_post_migrate_signal(verbosity=0, interactive=False, db=connection.alias)
+        self.assertEqual(triggers(), set(SUBJECT_FTS_TRIGGERS))
+        # the index is rebuilt with the rows written while a trigger was missing
+        self.assertEqual(self._ids('/api/subjects/?search=geo'), {geometry.id})
+        self.assertEqual(ensure_subject_search(connection.alias), [])
+
+    def test_invalid_values_rejected(self):
+        response = self.client.get('/api/enrollments/?subject=abc&graded=maybe')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(response.data), {'subject', 'graded'})
+        self.assertEqual(self.client.get('/api/users/?role=teacher').status_code, 400)
+        # blank parameters are ignored
+        self.assertEqual(len(self._enrollments('/api/enrollments/?subject=&grade=')), 6)
+
+    @skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN output is SQLite specific')
+    def test_filters_use_indexes(self):
+        paths = {
+            'grades_enrollment': [
+                f'/api/enrollments/?subject={self.algebra.id}', f'/api/enrollments/?student={self.ann.id}',
+                '/api/enrollments/?graded=true', '/api/enrollments/?graded=false', '/api/enrollments/?grade=A',
+            ],
+            'grades_user': ['/api/users/?email=ann', '/api/users/?name=an', '/api/users/?role=student',
+                            '/api/users/?role=staff'],
+            'grades_subject': ['/api/subjects/?search=alg'],
+        }
+        # a SCAN is only acceptable over a partial index, which holds just the matching rows
+        partial = {index.name for model in (User, Enrollment) for index in model._meta.indexes if index.condition}
+        for table, table_paths in paths.items():
+            for path in table_paths:
+                _, queries = self._get(path)
+                queries = [sql for sql in queries if re.search(rf'\bFROM "{table}".*\bWHERE\b', sql)]
+                self.assertTrue(queries, path)
+                for sql in queries:
+                    with self.subTest(path=path, sql=sql), connection.cursor() as cursor:
+                        cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+                        plan = [row[-1] for row in cursor.fetchall()]
+                        scans = [step for step in plan if re.match(rf'SCAN {table}\b', step)
+                                 and not any(step.endswith(f'INDEX {name}') for name in partial)]
+                        self.assertFalse(scans, plan)
+
+
+@override_settings(CACHES=SHARED_CACHES, GRADES_SYNC_GRACE_SECONDS=0)
+class SyncTest(APITestCase):
+    """/api/sync/: changed rows and deletions since a token, scoped like the list endpoints."""
+
+    def setUp(self):
+        cache.clear()
+        self.staff = User.objects.create_user(email='staff@example.com', password='pass', is_staff=True)
+        self.ann = User.objects.create_user(email='ann@example.com', password='pass')
+        self.bob = User.objects.create_user(email='bob@example.com', password='pass')
+        self.math = Subject.objects.create(name='Math')
+        self.art = Subject.objects.create(name='Art')
+        self.ann_math = Enrollment.objects.create(student=self.ann, subject=self.math, grade='A')
+        self.bob_art = Enrollment.objects.create(student=self.bob, subject=self.art)
+
+    def _sync(self, user, token=None):
+        self.client.force_authenticate(user)
+        response = self.client.get('/api/sync/', {'since': token} if token else {})
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.data
+
+    @staticmethod
+    def _ids(rows):
+        return {row['id'] for row in rows}
+
+    def test_full_then_delta(self):
+        first = self._sync(self.staff)
+        self.assertFalse(first['has_more'])
+        self.assertEqual(self._ids(first['subjects']), {self.math.id, self.art.id})
+        self.assertEqual(self._ids(first['enrollments']), {self.ann_math.id, self.bob_art.id})
+        self.assertEqual(self._ids(first['users']), {self.staff.id, self.ann.id, self.bob.id})
+        self.assertEqual(first['deleted'], {'subjects': [], 'enrollments': [], 'users': []})
+        # rows use the list representations (subjects without the per-user columns)
+        self.assertEqual(list(first['subjects'][0]), ['id', 'name', 'credits', 'created_at', 'updated_at'])
+        self.assertEqual(first['enrollments'][0], EnrollmentSerializer(
+            Enrollment.objects.get(pk=first['enrollments'][0]['id'])).data)
+        self.assertNotIn('password', first['users'][0])
+
+        self.math.name = 'Mathematics'
+        self.math.save()
+        self.bob_art.grade = 'B'
+        self.bob_art.save()
+        delta = self._sync(self.staff, first['token'])
+        self.assertEqual([row['name'] for row in delta['subjects']], ['Mathematics'])
+        self.assertEqual([row['grade'] for row in delta['enrollments']], ['B'])
+        self.assertEqual(delta['users'], [])
+
+        # nothing changed since: empty feeds
+        empty = self._sync(self.staff, delta['token'])
+        self.assertEqual((empty['subjects'], empty['enrollments'], empty['users']), ([], [], []))
+
+    def test_deletions_are_reported(self):
+        token = self._sync(self.staff)['token']
+        self.client.delete(f'/api/enrollments/{self.bob_art.id}/')
+        art_id, bob_id = self.art.id, self.bob.id
+        self.bob.delete()
+        self.art.delete()
+        # the cascaded enrollment of the deleted subject is reported too
+        Enrollment.objects.create(student=self.ann, subject=Subject.objects.create(name='Temp')).subject.delete()
+        temp = Tombstone.objects.filter(model=Tombstone.SUBJECT).latest('id').object_id
+
+        deleted = self._sync(self.staff, token)['deleted']
+        self.assertEqual(sorted(deleted['subjects']), sorted([art_id, temp]))
+        self.assertEqual(len(deleted['enrollments']), 2)
+        self.assertIn(self.bob_art.id, deleted['enrollments'])
+        self.assertEqual(deleted['users'], [bob_id])
+
+    def test_student_scope(self):
+        first = self._sync(self.ann)
+        self.assertEqual(self._ids(first['subjects']), {self.math.id, self.art.id})
+        self.assertEqual(self._ids(first['enrollments']), {self.ann_math.id})
+        self.assertEqual(self._ids(first['users']), {self.ann.id})
+
+        bob_art_id, ann_math_id = self.bob_art.id, self.ann_math.id
+        self.bob_art.delete()
+        self.ann_math.delete()
+        self.bob.first_name = 'Bobby'
+        self.bob.save()
+        delta = self._sync(self.ann, first['token'])
+        self.assertEqual(delta['deleted']['enrollments'], [ann_math_id])
+        self.assertNotIn(bob_art_id, delta['deleted']['enrollments'])
+        self.assertEqual(delta['users'], [])
+
+        # a token only works for the scope it was issued for
+        self.client.force_authenticate(self.staff)
+        self.assertEqual(self.client.get('/api/sync/', {'since': first['token']}).status_code, 410)
+        self.client.force_authenticate(None)
+        self.assertEqual(self.client.get('/api/sync/').status_code, 401)
+
+    @override_settings(GRADES_SYNC_PAGE_SIZE=2)
+    def test_pages_until_drained(self):
+        for i in range(3):
+            Subject.objects.create(name=f'Extra {i}')
+        seen, token, calls = [], None, 0
+        while True:
+            data = self._sync(self.staff, token)
+            seen += [row['id'] for row in data['subjects']]
+            token, calls = data['token'], calls + 1
+            if not data['has_more']:
+                break
+        self.assertEqual(calls, 3)
+        self.assertEqual(sorted(seen), sorted(Subject.objects.values_list('id', flat=True)))
+
+    def test_invalid_and_expired_tokens(self):
+        self.client.force_authenticate(self.staff)
+        response = self.client.get('/api/sync/', {'since': 'garbage'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('since', response.data)
+        token = self._sync(self.staff)['token']
+        with override_settings(GRADES_SYNC_TOMBSTONE_DAYS=0):
+            self.assertEqual(self.client.get('/api/sync/', {'since': token}).status_code, 410)
+
+    def test_query_count(self):
+        token = self._sync(self.staff)['token']
+        self.client.force_authenticate(self.staff)
+        # one query per feed (subjects, enrollments, users, tombstones)
+        with self.assertNumQueries(4):
+            self.client.get('/api/sync/', {'since': token})
+
+    def test_prune_tombstones(self):
+        art_id = self.art.id
+        self.art.delete()
+        old = Tombstone.objects.create(model=Tombstone.USER, object_id=999)
+        Tombstone.objects.filter(pk=old.pk).update(deleted_at=timezone.now() - timezone.timedelta(days=31))
+        call_command('prune_tombstones', stdout=io.StringIO())
+        self.assertFalse(Tombstone.objects.filter(pk=old.pk).exists())
+        self.assertTrue(Tombstone.objects.filter(model=Tombstone.SUBJECT, object_id=art_id).exists())
+
+
+class _EventClient:
+    """Drives the event stream ASGI app like a server: collects what it sends, disconnects on demand."""
+
+    def __init__(self, app, token=None, query=''):
+        headers = [(b'authorization', f'Token {token}'.encode())] if token else []
+        self.scope = {'type': 'http', 'method': 'GET', 'path': EVENTS_PATH, 'query_string': query.encode(),
+                      'headers': headers}
+        self.messages = asyncio.Queue()
+        self.gone = asyncio.Event()
+        self.task = asyncio.ensure_future(app(self.scope, self._receive, self.messages.put))
+
+    async def _receive(self):
+        await self.gone.wait()
+        return {'type': 'http.disconnect'}
+
+    async def status(self):
+        return (await asyncio.wait_for(self.messages.get(), 5))['status']
+
+    async def read(self, predicate):
+        """Body chunks until one satisfies predicate (or the response ends)."""
+        text = ''
+        while True:
+            message = await asyncio.wait_for(self.messages.get(), 5)
+            text += message.get('body', b'').decode()
+            if predicate(text) or not message.get('more_body'):
+                return text
+
+    async def close(self):
+        self.gone.set()
+        await asyncio.wait_for(self.task, 5)
+
+
+def _sse_events(text):
+    return [json.loads(line[len('data: '):]) for line in text.splitlines() if line.startswith('data: ')]
+
+
+class EnrollmentEventStreamTest(TestCase):
+    """Live enrollment events over SSE, scoped per student, served by the ASGI app in front of Django."""
+
+    def setUp(self):
+        self.staff = User.objects.create_user(email='staff@example.com', password='pass', is_staff=True)
+        self.ann = User.objects.create_user(email='ann@example.com', password='pass')
+        self.bob = User.objects.create_user(email='bob@example.com', password='pass')
+        self.math = Subject.objects.create(name='Math')
+        self.art = Subject.objects.create(name='Art')
+        self.tokens = {user.email: Token.objects.create(user=user).key for user in (self.staff, self.ann, self.bob)}
+        self.app = with_event_stream(lambda scope, receive, send: None)
+
+    def _write(self, fn):
+        # run `fn` in a thread, as a sync view would, and publish once its transaction commits
+        def run():
+            with self.captureOnCommitCallbacks(execute=True):
+                return fn()
+        return sync_to_async(run)()
+
+    async def _open(self, user, query=''):
+        client = _EventClient(self.app, self.tokens[user.email], query)
+        self.assertEqual(await client.status(), 200)
+        await client.read(lambda text: 'retry:' in text)
+        return client
+
+    async def test_students_see_their_own_enrollments(self):
+        ann, bob = await self._open(self.ann), await self._open(self.bob)
+        enrollment = await self._write(lambda: Enrollment.objects.create(student=self.ann, subject=self.math))
+
+        def grade():
+            enrollment.grade = 'B+'
+            enrollment.save()
+            enrollment.save()  # unchanged grade: no event
+            Enrollment.objects.get(pk=enrollment.pk).delete()
+        await self._write(grade)
+
+        text = await ann.read(lambda text: events.DELETED in text)
+        received = _sse_events(text)
+        self.assertEqual([event['type'] for event in received], [events.CREATED, events.GRADED, events.DELETED])
+        self.assertEqual(received[1]['grade'], 'B+')
+        self.assertEqual(received[1]['grade_points'], '3.30')
+        self.assertEqual(received[1]['student'], self.ann.id)
+        self.assertIn(f'event: {events.GRADED}\n', text)
+        self.assertTrue(bob.messages.empty())
+        await ann.close()
+        await bob.close()
+        self.assertEqual(events.hub.count, 0)
+
+    async def test_staff_see_everything_or_one_subject(self):
+        everything = await self._open(self.staff)
+        art_only = await self._open(self.staff, f'subject={self.art.id}')
+        await self._write(lambda: [Enrollment.objects.create(student=self.ann, subject=self.math),
+                                   Enrollment.objects.create(student=self.bob, subject=self.art)])
+        received = _sse_events(await everything.read(lambda text: text.count('data:') == 2))
+        self.assertEqual({event['student'] for event in received}, {self.ann.id, self.bob.id})
+        received = _sse_events(await art_only.read(lambda text: 'data:' in text))
+        self.assertEqual([event['subject'] for event in received], [self.art.id])
+        await everything.close()
+        await art_only.close()
+
+    async def test_bulk_endpoint_publishes(self):
+        client = await self._open(self.staff)
+        staff_client = APIClient()
+        staff_client.force_authenticate(self.staff)
+        await self._write(lambda: staff_client.post(
+            '/api/enrollments/bulk/', [{'student': self.ann.id, 'subject': self.math.id, 'grade': 'A'}], format='json'))
+        received = _sse_events(await client.read(lambda text: 'data:' in text))
+        self.assertEqual([(event['type'], event['grade']) for event in received], [(events.CREATED, 'A')])
+        await client.close()
+
+    async def test_rollback_publishes_nothing(self):
+        client = await self._open(self.staff)
+
+        def rolled_back():
+            with transaction.atomic():
+                Enrollment.objects.create(student=self.ann, subject=self.math)
+                transaction.set_rollback(True)
+        await self._write(rolled_back)
+        await asyncio.sleep(0.05)
+        self.assertTrue(client.messages.empty())
+        await client.close()
+
+    @override_settings(GRADES_EVENTS_HEARTBEAT_SECONDS=0.05)
+    async def test_heartbeat(self):
+        client = await self._open(self.ann)
+        self.assertIn(': ping', await client.read(lambda text: ': ping' in text))
+        await client.close()
+
+    @override_settings(GRADES_EVENTS_QUEUE_SIZE=2)
+    async def test_slow_listener_is_cut_off(self):
+        client = await self._open(self.staff)
+        # delivered on this loop before the stream gets to read any of them
+        events.hub.dispatch([{'type': events.CREATED, 'student': self.ann.id, 'subject': self.math.id}] * 5)
+        text = await client.read(lambda text: False)
+        self.assertEqual([event['type'] for event in _sse_events(text)], [events.OVERFLOW])
+        await asyncio.wait_for(client.task, 5)
+        self.assertEqual(events.hub.count, 0)
+
+    async def test_errors(self):
+        client = _EventClient(self.app)
+        self.assertEqual(await client.status(), 401)
+        client = _EventClient(self.app, 'nope')
+        self.assertEqual(await client.status(), 401)
+        client = _EventClient(self.app, self.tokens[self.staff.email], 'subject=abc')
+        self.assertEqual(await client.status(), 400)
+        with override_settings(GRADES_EVENTS_MAX_CONNECTIONS=1):
+            first = await self._open(self.ann)
+            client = _EventClient(self.app, self.tokens[self.bob.email])
+            self.assertEqual(await client.status(), 503)
+            await first.close()
+
+
+@override_settings(GRADES_IMPORT_WORKERS=1)
+class JobTest(APITestCase):
+    """Background jobs: queued through /api/jobs/, claimed under a lease by run_jobs workers."""
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        media_root = override_settings(MEDIA_ROOT=media.name)
+        media_root.enable()
+        self.addCleanup(media_root.disable)
+        self.staff = User.objects.create_user(email='staff@example.com', password='pass', is_staff=True)
+        self.ann = User.objects.create_user(email='ann@example.com', password='pass')
+        self.bob = User.objects.create_user(email='bob@example.com', password='pass')
+        math, art = Subject.objects.create(name='Math'), Subject.objects.create(name='Art')
+        for student, subject in ((self.ann, math), (self.ann, art), (self.bob, math)):
+            Enrollment.objects.create(student=student, subject=subject, grade='A')
+
+    def _queue(self, user, data, format='json'):
+        self.client.force_authenticate(user)
+        response = self.client.post('/api/jobs/', data, format=format)
+        self.assertEqual(response.status_code, 202, response.content)
+        self.assertTrue(response['Location'].endswith(f"/api/jobs/{response.data['id']}/"))
+        self.assertEqual(response.data['status'], Job.QUEUED)
+        return response.data['id']
+
+    def _status(self, job_id):
+        return self.client.get(f'/api/jobs/{job_id}/').data
+
+    def test_export_job_matches_streaming_export(self):
+        job_id = self._queue(self.ann, {'kind': 'export_gradebook', 'params': {'output': 'csv'}})
+        call_command('run_jobs', '--burst', stdout=io.StringIO())
+        job = self._status(job_id)
+        self.assertEqual(job['status'], Job.SUCCEEDED, job)
+        self.assertEqual((job['progress'], job['total'], job['result']), (2, 2, {'rows': 2}))
+        download = self.client.get(f'/api/jobs/{job_id}/result/')
+        self.assertEqual(download.status_code, 200)
+        self.assertIn('attachment', download['Content-Disposition'])
+        # scoped like the export endpoint: the student's own enrollments only
+        expected = b''.join(self.client.get('/api/enrollments/export/').streaming_content)
+        self.assertEqual(b''.join(download.streaming_content), expected)
+
+    def test_import_job(self):
+        upload = SimpleUploadedFile('users.csv', b'email,password\nnew1@example.com,secret1\nann@example.com,secret2\n')
+        job_id = self._queue(self.staff, {'kind': 'import_users', 'file': upload}, format='multipart')
+        self.assertEqual(work(burst=True), 1)
+        job = self._status(job_id)
+        self.assertEqual(job['status'], Job.SUCCEEDED)
+        self.assertEqual((job['result']['created'], job['result']['duplicates']), (1, ['ann@example.com']))
+        self.assertEqual(job['progress'], 2)
+        self.assertIsNone(job['result_url'])
+        self.assertTrue(User.objects.filter(email='new1@example.com').exists())
+
+    def test_failed_job_records_error(self):
+        upload = SimpleUploadedFile('users.csv', b'name\nx\n')
+        job_id = self._queue(self.staff, {'kind': 'import_users', 'file': upload}, format='multipart')
+        work(burst=True)
+        job = self._status(job_id)
+        self.assertEqual(job['status'], Job.FAILED)
+        self.assertIn("'email' column", job['error'])
+
+    def test_permissions_and_validation(self):
+        self.client.force_authenticate(self.ann)
+        self.assertEqual(self.client.post('/api/jobs/', {'kind': 'rebuild_stats'}, format='json').status_code, 403)
+        response = self.client.post('/api/jobs/', {'kind': 'export_gradebook', 'params': {'output': 'xml'}},
+                                    format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('output', response.data['params'])
+        self.client.force_authenticate(self.staff)
+        response = self.client.post('/api/jobs/', {'kind': 'import_users'}, format='json')
+        self.assertEqual(set(response.data), {'file'})
+
+        staff_job = self._queue(self.staff, {'kind': 'rebuild_stats'})
+        ann_job = self._queue(self.ann, {'kind': 'export_gradebook'})
+        self.client.force_authenticate(self.ann)
+        self.assertEqual([job['id'] for job in self.client.get('/api/jobs/').data['results']], [ann_job])
+        self.assertEqual(self.client.get(f'/api/jobs/{staff_job}/').status_code, 404)
+        # nothing to download before the job has run
+        self.assertEqual(self.client.get(f'/api/jobs/{ann_job}/result/').status_code, 404)
+
+    def test_claims_and_leases(self):
+        first = Job.objects.create(kind=Job.REBUILD_STATS, created_by=self.staff)
+        second = Job.objects.create(kind=Job.REBUILD_STATS, created_by=self.staff)
+        self.assertEqual(claim_job('w1').pk, first.pk)
+        self.assertEqual(claim_job('w2').pk, second.pk)
+        self.assertIsNone(claim_job('w3'))
+
+        # w1 crashed: once its lease expires the job is claimed again...
+        Job.objects.filter(pk=first.pk).update(locked_until=timezone.now() - timezone.timedelta(seconds=1))
+        reclaimed = claim_job('w3')
+        self.assertEqual((reclaimed.pk, reclaimed.locked_by, reclaimed.attempts), (first.pk, 'w3', 2))
+        # ...and w1 can no longer record an outcome for it
+        self.assertIsNone(run_job(Job.objects.get(pk=first.pk), 'w1'))
+        self.assertEqual(run_job(reclaimed, 'w3'), Job.SUCCEEDED)
+
+        # after GRADES_JOBS_MAX_ATTEMPTS lost leases the job fails instead of running again
+        Job.objects.filter(pk=second.pk).update(attempts=3, locked_until=timezone.now() - timezone.timedelta(seconds=1))
+        self.assertIsNone(claim_job('w4'))
+        second.refresh_from_db()
+        self.assertEqual(second.status, Job.FAILED)
+        self.assertIn('3 attempts', second.error)
+
+
+class JobWorkerConcurrencyTest(TransactionTestCase):
+    """Several worker threads share one queue: every job runs exactly once."""
+
+    def test_threads_share_the_queue(self):
+        staff = User.objects.create_user(email='staff@example.com', password='pass', is_staff=True)
+        Job.objects.bulk_create([Job(kind=Job.REBUILD_STATS, created_by=staff) for _ in range(12)])
+        out = io.StringIO()
+        call_command('run_jobs', '--burst', '--threads', '4', stdout=out)
+        self.assertIn('Ran 12 jobs', out.getvalue())
+        self.assertEqual(Job.objects.filter(status=Job.SUCCEEDED, attempts=1).count(), 12)
+        self.assertEqual(Job.objects.values('locked_by').distinct().count(), 1)  # all cleared
+
+
+@override_settings(CACHES=SHARED_CACHES)
+class RoleTest(APITestCase):
+    """Roles and permissions resolve from the cache; Teachers act through the Teacher group."""
+
+    def setUp(self):
+        cache.clear()
+        self.teacher = User.objects.create_user(email='teacher@example.com', password='pass')
+        self.teacher.groups.add(Group.objects.get(name='Teacher'))
+        self.ann = User.objects.create_user(email='ann@example.com', password='pass')
+        self.bob = User.objects.create_user(email='bob@example.com', password='pass')
+        self.subject = Subject.objects.create(name='Algebra')
+        self.bobs = Enrollment.objects.create(student=self.bob, subject=self.subject)
+
+    def test_resolution_is_cached(self):
+        self.assertEqual(access_for(self.teacher).role, TEACHER)
+        with self.assertNumQueries(0):
+            access = access_for(self.teacher)
+            self.assertTrue(self.teacher.has_perm('grades.change_enrollment'))
+        self.assertTrue(access.can('grades.view_enrollment'))
+        self.assertFalse(access.can('grades.delete_enrollment'))
+        self.assertEqual(access_for(self.ann).role, STUDENT)
+        staff = User.objects.create_user(email='staff@example.com', password='pass', is_staff=True)
+        self.assertTrue(access_for(staff).can('grades.delete_subject'))
+        with self.assertNumQueries(0):
+            self.assertTrue(access_for(staff).can('grades.delete_subject'))
+
+    def test_staff_keep_their_real_permissions_in_the_admin(self):
+        # not a superuser: has_perm() must see the explicitly granted permission, and only it
+        staff = User.objects.create_user(email='staff@example.com', password='pass', is_staff=True)
+        staff.user_permissions.add(Permission.objects.get(codename='change_subject'))
+        staff = User.objects.get(pk=staff.pk)
+        self.assertTrue(staff.has_perm('grades.change_subject'))
+        self.assertFalse(staff.has_perm('grades.delete_subject'))
+        self.assertEqual(staff.get_all_permissions(), {'grades.change_subject'})
+        self.assertTrue(staff.has_module_perms('grades'))
+        # the API still lets staff do everything
+        self.assertTrue(access_for(staff).can('grades.delete_subject'))
+
+    def test_teacher_subject_rights(self):
+        self.client.force_authenticate(self.teacher)
+        response = self.client.post('/api/subjects/', {'name': 'Geometry'}, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        subject_id = response.data['id']
+        self.assertEqual(self.client.patch(f'/api/subjects/{subject_id}/', {'credits': 4}, format='json').status_code, 200)
+        self.assertEqual(self.client.delete(f'/api/subjects/{subject_id}/').status_code, 403)
+        self.client.force_authenticate(self.ann)
+        self.assertEqual(self.client.post('/api/subjects/', {'name': 'Art'}, format='json').status_code, 403)
+
+    def test_teacher_enrollment_rights(self):
+        self.client.force_authenticate(self.teacher)
+        self.assertEqual([row['id'] for row in self.client.get('/api/enrollments/').data['results']], [self.bobs.id])
+        response = self.client.post('/api/enrollments/', {'student': self.ann.id, 'subject': self.subject.id},
+                                    format='json')
+        self.assertEqual((response.status_code, response.data['student']), (201, self.ann.id))
+        path = f'/api/enrollments/{self.bobs.id}/'
+        self.assertEqual(self.client.patch(path, {'grade': 'A'}, format='json').status_code, 200)
+        self.assertEqual(self.client.delete(f"/api/enrollments/{response.data['id']}/").status_code, 403)
+        self.assertEqual(self.client.get(f'/api/users/{self.bob.id}/transcript/').status_code, 200)
+        self.assertEqual(self.client.get('/api/users/').status_code, 403)
+        # students still only reach their own enrollments
+        self.client.force_authenticate(self.ann)
+        self.assertEqual(self.client.patch(path, {'grade': 'F'}, format='json').status_code, 404)
+
+    def test_membership_and_permission_changes_invalidate(self):
+        self.assertTrue(access_for(self.teacher).can('grades.change_subject'))
+        group = Group.objects.get(name='Teacher')
+        group.permissions.remove(Permission.objects.get(codename='change_subject'))
+        self.assertFalse(access_for(self.teacher).can('grades.change_subject'))
+        self.assertTrue(access_for(self.teacher).can('grades.add_subject'))
+
+        self.teacher.groups.clear()
+        self.assertEqual(access_for(self.teacher).role, STUDENT)
+        group.user_set.add(self.teacher)
+        self.assertEqual(access_for(self.teacher).role, TEACHER)
+        self.teacher.user_permissions.add(Permission.objects.get(codename='delete_enrollment'))
+        self.assertTrue(access_for(self.teacher).can('grades.delete_enrollment'))
+
+
+class SubjectUnenrollTest(APITestCase):
+    """DELETE /api/subjects/{id}/students/ drops ungraded enrollments in a constant number of queries."""
+
+    def setUp(self):
+        self.staff = User.objects.create_user(email='staff@example.com', password='pass', is_staff=True)
+        self.subject = Subject.objects.create(name='Cancelled section')
+        self.other = Subject.objects.create(name='Algebra')
+        # no passwords needed: bulk_create skips the hashing
+        self.students = User.objects.bulk_create(User(email=f's{i}@example.com') for i in range(40))
+        for i, student in enumerate(self.students):
+            # every tenth enrollment graded; blank grades count as ungraded
+            grade = 'A' if i % 10 == 0 else ' ' if i % 10 == 1 else None
+            Enrollment.objects.create(student=student, subject=self.subject, grade=grade)
+            Enrollment.objects.create(student=student, subject=self.other)
+        self.client.force_authenticate(self.staff)
+        access_for(self.staff)
+        self.path = f'/api/subjects/{self.subject.id}/students/'
+
+    def _delete(self, students):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.delete(self.path, {'students': students}, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.data, len(ctx.captured_queries)
+
+    def test_reports_and_keeps_graded(self):
+        ids = [s.id for s in self.students]
+        data, _ = self._delete([ids[0], ids[1], ids[2], 999999, ids[2]])
+        self.assertEqual(data, {'removed': [ids[1], ids[2]], 'graded': [ids[0]], 'not_found': [999999]})
+        self.assertEqual(self.subject.enrollments.count(), 38)
+        self.assertEqual(Enrollment.objects.filter(subject=self.other).count(), 40)
+        self.assertEqual(SubjectStats.objects.get(subject=self.subject).enrollment_count, 38)
+        removed = Enrollment.objects.filter(subject=self.subject, student_id__in=ids[1:3])
+        self.assertFalse(removed.exists())
+        self.assertEqual(set(Tombstone.objects.filter(model=Tombstone.ENROLLMENT).values_list('student_id', flat=True)),
+                         {ids[1], ids[2]})
+
+    def test_query_count_is_constant(self):
+        ids = [s.id for s in self.students]
+        _, few = self._delete(ids[:3])
+        data, many = self._delete(ids[3:])
+        self.assertEqual(few, many)
+        self.assertEqual((len(data['removed']), len(data['graded'])), (34, 3))
+        self.assertEqual(self.subject.enrollments.count(), 4)
+
+    def test_validation_and_permissions(self):
+        self.assertEqual(self.client.delete(self.path, {'students': []}, format='json').status_code, 400)
+        self.assertEqual(self.client.delete(self.path, {'students': ['x']}, format='json').status_code, 400)
+        self.client.force_authenticate(self.students[1])
+        self.assertEqual(self.client.delete(self.path, {'students': [self.students[1].id]}, format='json').status_code, 403)
+
+    def test_delete_keeps_the_graded_guard_and_sends_no_signals(self):
+        doomed = Enrollment.objects.filter(subject=self.subject, student__in=self.students[:10]).filter(UNGRADED)
+        self.assertEqual(delete_enrollments(doomed), 9)
+        self.assertEqual(self.subject.enrollments.count(), 31)
+        self.assertTrue(self.subject.enrollments.filter(student=self.students[0]).exists())
+        # no post_delete receiver ran: the caller maintains these
+        self.assertFalse(Tombstone.objects.exists())
+        self.assertEqual(SubjectStats.objects.get(subject=self.subject).enrollment_count, 40)
+
+    def test_single_student_route(self):
+        graded, ungraded = self.students[0], self.students[2]
+        self.assertEqual(self.client.delete(f'{self.path}{graded.id}/').status_code, 400)
+        self.assertEqual(self.client.delete(f'{self.path}{ungraded.id}/').status_code, 204)
+        self.assertEqual(self.client.delete(f'{self.path}{ungraded.id}/').status_code, 404)
+        self.assertEqual(self.client.delete(f'{self.path}abc/').status_code, 404)
+
+
+class TermArchiveTest(APITestCase):
+    """archive_terms moves closed-term enrollments out of the hot table; transcripts and exports still read them."""
+
+    def setUp(self):
+        self.staff = User.objects.create_user(email='staff@example.com', password='pass', is_staff=True)
+        self.student = User.objects.create_user(email='student@example.com', password='pass')
+        self.other = User.objects.create_user(email='other@example.com', password='pass')
+        self.math = Subject.objects.create(name='Math', credits=3)
+        self.art = Subject.objects.create(name='Art', credits=2)
+        today = timezone.localdate()
+        self.past = Term.objects.create(name='Past', starts_on=today - timezone.timedelta(days=300),
+                                        ends_on=today - timezone.timedelta(days=150))
+        self.current = Term.objects.create(name='Current', starts_on=today - timezone.timedelta(days=30),
+                                           ends_on=today + timezone.timedelta(days=60))
+        old = [Enrollment.objects.create(student=self.student, subject=self.math, grade='A'),
+               Enrollment.objects.create(student=self.other, subject=self.math, grade='C')]
+        Enrollment.objects.filter(pk__in=[e.pk for e in old]).update(
+            created_at=term_bounds(self.past)[0] + timezone.timedelta(days=10))
+        self.old_ids = [e.pk for e in old]
+        self.new = Enrollment.objects.create(student=self.student, subject=self.art, grade='B')
+
+    def test_archive_moves_closed_terms_only(self):
+        out = io.StringIO()
+        call_command('archive_terms', batch_size=1, stdout=out)
+        self.assertIn('Past: archived 2 enrollments', out.getvalue())
+        self.assertIn('Archived 2 enrollments.', out.getvalue())
+        self.assertEqual(list(Enrollment.objects.values_list('id', flat=True)), [self.new.pk])
+        self.assertEqual(sorted(ArchivedEnrollment.objects.filter(term=self.past).values_list('id', flat=True)),
+                         self.old_ids)
+        self.past.refresh_from_db()
+        self.assertIsNotNone(self.past.archived_at)
+        # receivers' work done in bulk: statistics match the hot table, synced clients drop the rows
+        expected = {row.subject_id: (row.enrollment_count, row.graded_count) for row in compute_subject_stats()}
+        stored = {row.subject_id: (row.enrollment_count, row.graded_count) for row in SubjectStats.objects.all()}
+        self.assertEqual(stored, {**expected, self.math.id: (0, 0)})
+        self.assertEqual(sorted(Tombstone.objects.values_list('object_id', flat=True)), self.old_ids)
+        # the student may take the subject again in a new term
+        self.client.force_authenticate(self.student)
+        self.assertEqual(self.client.post('/api/enrollments/', {'subject': self.math.id}, format='json').status_code, 201)
+
+        with self.assertRaises(CommandError):
+            call_command('archive_terms', term=['Current'], stdout=io.StringIO())
+
+    def test_transcript_and_export_include_archive(self):
+        call_command('archive_terms', stdout=io.StringIO())
+        self.client.force_authenticate(self.student)
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/users/me/transcript/')
+        self.assertEqual([(e['subject']['name'], e['archived']) for e in response.data['enrollments']],
+                         [('Math', True), ('Art', False)])
+        # (3 * 4.00 + 2 * 3.00) / 5
+        self.assertEqual(response.data['summary'], {
+            'enrollments': 2, 'graded': 2, 'credits': 5, 'gpa_credits': 5, 'quality_points': '18.00', 'gpa': '3.60',
+        })
+
+        rows = list(csv.DictReader(io.StringIO(b''.join(
+            self.client.get('/api/enrollments/export/').streaming_content).decode())))
+        self.assertEqual([int(row['id']) for row in rows], [self.old_ids[0], self.new.pk])
+        self.client.force_authenticate(self.staff)
+        rows = list(csv.DictReader(io.StringIO(b''.join(
+            self.client.get(f'/api/enrollments/export/?subject={self.math.id}').streaming_content).decode())))
+        self.assertEqual([(int(row['id']), row['grade']) for row in rows], list(zip(self.old_ids, ['A', 'C'])))
+
+        # history keeps its subject
+        self.assertEqual(self.client.delete(f'/api/subjects/{self.math.id}/').status_code, 400)
+
+    def test_archive_benchmark(self):
+        seed_data(users=20, subjects=5, enrollments=60, prefix='arch')
+        results = run_archive_benchmark(archive_share=0.5, repeat=1)
+        self.assertEqual(results['rows']['archived'], results['rows']['before'] - results['rows']['after'])
+        self.assertGreaterEqual(results['rows']['archived'], 30)
+        for name, row in results['routes'].items():
+            with self.subTest(route=name):
+                self.assertEqual(row['before']['queries'], row['after']['queries'])
+                self.assertLess(row['after']['status'], 400)
@@ -0,0 +1,105 @@
+from decimal import Decimal
+
+from django.db.models import BooleanField, Case, Count, DecimalField, F, IntegerField, Sum, Value, When, Window
+from django.db.models.functions import Length, Trim
+from django.db.models.lookups import GreaterThan
+
+from .models import User
+
+# the student's current enrollments and the ones archived with closed terms (grades.archive)
+RELATIONS = {False: 'enrollments', True: 'archived_enrollments'}
+
+
+def entry_columns(relation):
+    """Enrollment columns of each transcript row, read through the student's reverse join."""
+    return {
+        'enrollment_id': F(f'{relation}__id'),
+        'subject_id': F(f'{relation}__subject_id'),
+        'subject_name': F(f'{relation}__subject__name'),
+        'credits': F(f'{relation}__subject__credits'),
+        'grade': F(f'{relation}__grade'),
+        'grade_points': F(f'{relation}__grade_points'),
+        'enrolled_at': F(f'{relation}__created_at'),
+        'enrollment_updated_at': F(f'{relation}__updated_at'),
+    }
+
+
+def summary_columns(relation):
+    """Totals over the relation's rows, computed by the database next to every row (window aggregates)."""
+    # same "graded" rule as grades.stats.is_graded: a grade that is not blank after trimming
+    graded = Case(
+        When(GreaterThan(Length(Trim(f'{relation}__grade')), 0), then=1),
+        default=0,
+        output_field=IntegerField(),
+    )
+    graded_credits = Case(
+        When(**{f'{relation}__grade_points__isnull': False}, then=F(f'{relation}__subject__credits')),
+        output_field=IntegerField(),
+    )
+    return {
+        'total_enrollments': Window(Count(f'{relation}__id')),
+        'total_graded': Window(Sum(graded)),
+        'total_credits': Window(Sum(f'{relation}__subject__credits')),
+        'gpa_credits': Window(Sum(graded_credits)),
+        'quality_points': Window(Sum(
+            F(f'{relation}__grade_points') * F(f'{relation}__subject__credits'),
+            output_field=DecimalField(max_digits=12, decimal_places=2),
+        )),
+    }
+
+
+def _part(student_id, archived):
+    relation = RELATIONS[archived]
+    return User.objects.filter(pk=student_id).values(
+        'id', 'email', 'first_name', 'last_name',
+        archived=Value(archived, output_field=BooleanField()),
+        **entry_columns(relation), **summary_columns(relation),
+    )
+
+
+def student_transcript(student_id):
+    """
+    Every enrollment of a student with its subject, archived ones included, plus GPA / credit
+    totals, in one query: the user LEFT JOINed to enrollments and subjects, UNION ALL the user
+    LEFT JOINed to archived enrollments, each part carrying its totals as window aggregates.
+
+    Returns None for an unknown student, else
+    {'student': {...}, 'enrollments': [rows], 'summary': {...}}. The GPA is credit-weighted
+    over enrollments with grade points (see grades.grading); other enrollments still count
+    towards the credit total.
+    """
+    rows = list(
+        _part(student_id, False).union(_part(student_id, True), all=True)
+        .order_by('enrolled_at', 'enrollment_id')
+    )
+    if not rows:
+        return None
+
+    first = rows[0]
+    student = {name: first[name] for name in ('id', 'email', 'first_name', 'last_name')}
+    entries = [
+        {
+            'id': row['enrollment_id'],
+            'subject': {'id': row['subject_id'], 'name': row['subject_name'], 'credits': row['credits']},
+            'grade': row['grade'],
+            'grade_points': row['grade_points'],
+            'archived': row['archived'],
+            'created_at': row['enrolled_at'],
+            'updated_at': row['enrollment_updated_at'],
+        }
+        # a part without enrollments comes back as one row of NULL enrollment columns
+        for row in rows if row['enrollment_id'] is not None
+    ]
+    # every row of a part repeats that part's totals: add up one row of each
+    parts = {row['archived']: row for row in rows}.values()
+    gpa_credits = sum(part['gpa_credits'] or 0 for part in parts)
+    quality_points = sum((part['quality_points'] or Decimal('0') for part in parts), Decimal('0'))
+    summary = {
+        'enrollments': sum(part['total_enrollments'] for part in parts),
+        'graded': sum(part['total_graded'] or 0 for part in parts),
+        'credits': sum(part['total_credits'] or 0 for part in parts),
+        'gpa_credits': gpa_credits,
+        'quality_points': quality_points,
+        'gpa': (quality_points / gpa_credits).quantize(Decimal('0.01')) if gpa_credits else None,
+    }
+    return {'student': student, 'enrollments': entries, 'summary': summary}
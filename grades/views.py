@@ -1,72 +1,343 @@
-from rest_framework import viewsets, permissions, status
+import csv
+import hashlib
+import io
+import os
+from contextlib import nullcontext
+
+from asgiref.sync import sync_to_async
+from rest_framework import mixins, viewsets, permissions, status
 from rest_framework.response import Response
 from rest_framework.decorators import action
+from rest_framework.reverse import reverse
+from rest_framework.views import APIView
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.db import IntegrityError, transaction
+from django.db.models import BooleanField, Count, ExpressionWrapper, Max, Prefetch
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_vary_headers
 
-from .models import User, Subject, Enrollment
-from .serializers import UserSerializer, SubjectSerializer, EnrollmentSerializer
-from .permissions import IsAdminOrReadOnly, IsOwnerOrAdmin
+from .models import UNGRADED, User, Subject, Enrollment, SubjectStats, Job, Tombstone, ArchivedEnrollment
+from .serializers import (
+    UserSerializer, SubjectSerializer, EnrollmentSerializer, SubjectStatsSerializer, TranscriptSerializer,
+    EnrollmentBulkCreateItemSerializer, EnrollmentBulkGradeItemSerializer, JobSerializer, SubjectUnenrollSerializer,
+)
+from .exports import EXPORT_FORMATS, aiter_chunks
+from .imports import import_users, read_user_csv
+from .stats import apply_enrollment_changes, delete_enrollments, enrollment_total, subject_enrollment_count
+from .sync import sync_changes
+from .transcripts import student_transcript
+from .authentication import token_cache_stats
+from .metrics import registry as metrics_registry
+from .async_views import AsyncReadMixin
+from .conditional import ConditionalGetMixin, newest
+from .fast_list import ValuesListMixin
+from .fieldsets import FieldsetViewMixin
+from .filters import EnrollmentFilter, SubjectSearchFilter, UserFilter
+from .grading import grade_points
+from . import events, response_cache
+from .permissions import IsAdminOrReadOnly, IsOwnerOrAdmin, IsStaffRole
+from .roles import request_access
+from .routers import use_primary
+from .pagination import IdCursorPagination, UpdatedAtCursorPagination
 
 
-class UserViewSet(viewsets.ModelViewSet):
+class UserViewSet(AsyncReadMixin, ValuesListMixin, FieldsetViewMixin, viewsets.ModelViewSet):
     queryset = User.objects.all().order_by('id')
     serializer_class = UserSerializer
+    pagination_class = IdCursorPagination
+    filter_backends = [UserFilter]
 
     def get_permissions(self):
         if self.action == 'create':
             return [permissions.AllowAny()]
-        return [permissions.IsAdminUser()]
+        if self.action == 'transcript':
+            # students may read their own transcript; checked in the action
+            return [permissions.IsAuthenticated()]
+        return [IsStaffRole()]
+
+    @action(detail=True, methods=['get'])
+    def transcript(self, request, pk=None):
+        # Every enrollment of the student with subject name/credits, grade and grade points,
+        # plus GPA / credit totals, read in one query (grades.transcripts).
+        # /api/users/me/transcript/ is the requesting user's own transcript.
+        # Users who may view every enrollment (staff, Teachers) may read any transcript.
+        user = request.user
+        student_id = str(user.pk) if pk == 'me' else str(pk)
+        if student_id != str(user.pk) and not request_access(request).can('grades.view_enrollment'):
+            return Response({"detail": "You can only view your own transcript."}, status=status.HTTP_403_FORBIDDEN)
+        transcript = student_transcript(int(student_id)) if student_id.isdigit() else None
+        if transcript is None:
+            return Response({"detail": "Not found."}, status=status.HTTP_404_NOT_FOUND)
+        return Response(TranscriptSerializer(transcript).data)
+
+    @action(detail=False, methods=['post'], url_path='import')
+    def import_csv(self, request):
+        # Admin-only CSV import (multipart field `file`). Passwords are hashed in a process
+        # pool and users bulk-inserted; the response is the import report (created count,
+        # duplicate emails and per-line failures).
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({"detail": "Upload a CSV file in the 'file' field."}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            report = import_users(read_user_csv(io.TextIOWrapper(upload.file, encoding='utf-8-sig', newline='')))
+        except (ValueError, UnicodeDecodeError) as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        except csv.Error as exc:
+            return Response({"detail": f"Malformed CSV: {exc}"}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(report, status=status.HTTP_201_CREATED if report['created'] else status.HTTP_200_OK)
 
 
-class SubjectViewSet(viewsets.ModelViewSet):
-    queryset = Subject.objects.all()
+class SubjectViewSet(ConditionalGetMixin, AsyncReadMixin, FieldsetViewMixin, viewsets.ModelViewSet):
+    queryset = Subject.objects.all().order_by('id')
     serializer_class = SubjectSerializer
+    pagination_class = IdCursorPagination
     permission_classes = [IsAdminOrReadOnly]
+    filter_backends = [SubjectSearchFilter]
+    # actions that render SubjectSerializer and therefore need the enrollment prefetches
+    serializing_actions = ('list', 'retrieve', 'update', 'partial_update')
+
+    def get_queryset(self):
+        # Resolve SubjectSerializer's computed fields in a constant number of queries:
+        # users who may view every enrollment (staff, Teachers) get them all (with their
+        # student) in one prefetch, students only their own enrollments. Anonymous users need neither, and neither does a
+        # ?fields= / ?omit= request that leaves the field out.
+        qs = super().get_queryset()
+        user = self.request.user
+        if self.action not in self.serializing_actions or not user or not user.is_authenticated:
+            return qs
+        if request_access(self.request).can('grades.view_enrollment'):
+            if not self.renders('enrollments'):
+                return qs
+            enrollments = Enrollment.objects.all()
+            if self._renders_enrolled_students():
+                enrollments = enrollments.select_related('student')
+            return qs.prefetch_related(Prefetch(
+                'enrollments',
+                queryset=enrollments,
+                to_attr='prefetched_enrollments',
+            ))
+        if not self.renders('student_grade'):
+            return qs
+        return qs.prefetch_related(Prefetch(
+            'enrollments',
+            queryset=Enrollment.objects.filter(student=user),
+            to_attr='student_enrollments',
+        ))
+
+    def _renders_enrolled_students(self):
+        fieldset = self.get_fieldset()
+        return fieldset is None or fieldset.nested('enrollments').includes('student')
+
+    # Conditional GET validators: every table SubjectSerializer reads for this user.
+    # Anonymous users see subjects only; students also their own enrollments (student_grade);
+    # staff all enrollments plus the enrolled students' emails (nested `enrollments`).
+    # Tables behind fields the request leaves out (?fields= / ?omit=) are not aggregated.
+    # Whole-table enrollment counts come from SubjectStats so staff requests never COUNT(*)
+    # the enrollment table; MAX(updated_at) is an index lookup.
+    def get_list_validators(self):
+        return self._catalog_validators(Subject.objects.all(), Enrollment.objects.all(), None)
+
+    def get_detail_validators(self):
+        pk = str(self.kwargs.get(self.lookup_url_kwarg or self.lookup_field))
+        if not pk.isdigit():
+            return None, None
+        return self._catalog_validators(Subject.objects.filter(pk=pk), Enrollment.objects.filter(subject_id=pk), int(pk))
+
+    def _catalog_validators(self, subjects, enrollments, subject_id):
+        subjects = subjects.aggregate(changed=Max('updated_at'), rows=Count('id'))
+        if subjects['rows'] == 0 and self.action == 'retrieve':
+            # unknown subject: let retrieve() produce the 404
+            return None, None
+        parts, changed = [subjects['rows'], subjects['changed']], [subjects['changed']]
+
+        user = self.request.user
+        if user and user.is_authenticated:
+            if request_access(self.request).can('grades.view_enrollment'):
+                if not self.renders('enrollments'):
+                    return parts, newest(*changed)
+                enrollments_changed = enrollments.aggregate(changed=Max('updated_at'))['changed']
+                parts += ['staff', enrollment_total(subject_id), enrollments_changed]
+                changed.append(enrollments_changed)
+                if self._renders_enrolled_students():
+                    users_changed = User.objects.aggregate(changed=Max('updated_at'))['changed']
+                    parts.append(users_changed)
+                    changed.append(users_changed)
+            elif self.renders('student_grade'):
+                own = enrollments.filter(student=user).aggregate(changed=Max('updated_at'), rows=Count('id'))
+                parts += ['student', own['rows'], own['changed']]
+                changed.append(own['changed'])
+        return parts, newest(*changed)
+
+    # Shared response cache: the anonymous payload (no grades) and the staff payload (every
+    # enrollment; Teachers get the same one) do not depend on which user asks, so one rendered copy serves all of them.
+    # Keys carry the version of each scope the payload is built from; signals bump them.
+    def list(self, request, *args, **kwargs):
+        return self._shared_response(request, super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self._shared_response(request, super().retrieve, *args, **kwargs)
+
+    async def alist(self, request, *args, **kwargs):
+        return await self._ashared_response(request, super().alist, *args, **kwargs)
+
+    async def aretrieve(self, request, *args, **kwargs):
+        return await self._ashared_response(request, super().aretrieve, *args, **kwargs)
+
+    def _shared_variant(self):
+        user = self.request.user
+        if not user or not user.is_authenticated:
+            return 'anon', (response_cache.SUBJECTS,)
+        if request_access(self.request).can('grades.view_enrollment'):
+            return 'staff', (response_cache.SUBJECTS, response_cache.ENROLLMENTS)
+        # students get their own student_grade: not shareable
+        return None, ()
+
+    def _shared_response(self, request, render, *args, **kwargs):
+        key, response = self._shared_lookup(request)
+        if response is None:
+            # a payload cached under the current versions must not come from a lagging replica
+            with use_primary() if key is not None else nullcontext():
+                response = self._shared_store(key, render(request, *args, **kwargs))
+        return response
+
+    async def _ashared_response(self, request, render, *args, **kwargs):
+        # the lookup reads the scope versions from the database
+        key, response = await sync_to_async(self._shared_lookup)(request)
+        if response is None:
+            with use_primary() if key is not None else nullcontext():
+                response = self._shared_store(key, await render(request, *args, **kwargs))
+        return response
+
+    def _shared_lookup(self, request):
+        # (cache key or None when the payload is per user, cached response or None)
+        variant, scopes = self._shared_variant()
+        if variant is None:
+            return None, None
+        versions = response_cache.current_versions(*scopes)
+        raw_key = repr((self.action, variant, versions, request.build_absolute_uri()))
+        key = 'grades:subjects:' + hashlib.sha1(raw_key.encode()).hexdigest()
+        entry = response_cache.get_cached(key)
+        if entry is None:
+            return key, None
+        data, headers = entry
+        response = get_conditional_response(request, etag=headers.get('ETag')) or Response(data)
+        for name, value in headers.items():
+            response[name] = value
+        patch_vary_headers(response, ('Authorization',))
+        return key, response
+
+    def _shared_store(self, key, response):
+        if key is not None and response.status_code == 200:
+            headers = {name: response[name] for name in ('ETag', 'Last-Modified') if response.has_header(name)}
+            response_cache.set_cached(key, (response.data, headers))
+        return response
 
     def destroy(self, request, *args, **kwargs):
         # Prevent deleting subjects that have enrollments
         subject = self.get_object()
-        if subject.enrollments.exists():
+        if subject_enrollment_count(subject) > 0 or subject.archived_enrollments.exists():
             return Response({"detail": "Cannot delete subject with enrollments."}, status=status.HTTP_400_BAD_REQUEST)
         return super().destroy(request, *args, **kwargs)
 
-    @action(detail=True, methods=['delete'], url_path=r'students/(?P<student_id>[^/.]+)', permission_classes=[permissions.IsAdminUser])
+    @action(detail=False, methods=['get'], url_path='stats', permission_classes=[IsStaffRole])
+    def all_stats(self, request):
+        # Per-subject enrollment/grade summary for staff dashboards, read from SubjectStats only.
+        queryset = SubjectStats.objects.select_related('subject').order_by('id')
+        page = self.paginate_queryset(queryset)
+        return self.get_paginated_response(SubjectStatsSerializer(page, many=True).data)
+
+    @action(detail=True, methods=['get'], url_path='stats', permission_classes=[IsStaffRole])
+    def stats(self, request, pk=None):
+        subject = self.get_object()
+        stats = SubjectStats.objects.filter(subject=subject).select_related('subject').first()
+        if stats is None:
+            # subject predates the summary table and has not been rebuilt yet
+            stats = SubjectStats(subject=subject)
+        return Response(SubjectStatsSerializer(stats).data)
+
+    @action(detail=True, methods=['delete'], url_path='students', permission_classes=[IsStaffRole])
+    def remove_students(self, request, pk=None):
+        # Bulk unenroll: {"students": [<id>, ...]} in the body. Ungraded enrollments are deleted
+        # with one conditional DELETE; the response lists the ids removed, those skipped because
+        # the enrollment is graded and those not enrolled in the subject. Constant query count.
+        body = SubjectUnenrollSerializer(data=request.data)
+        if not body.is_valid():
+            return Response(body.errors, status=status.HTTP_400_BAD_REQUEST)
+        student_ids = list(dict.fromkeys(body.validated_data['students']))
+        max_rows = getattr(settings, 'GRADES_BULK_MAX_ROWS', 1000)
+        if len(student_ids) > max_rows:
+            return Response({"detail": f"At most {max_rows} students may be sent at once."}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(_unenroll(self.get_object(), student_ids))
+
+    @action(detail=True, methods=['delete'], url_path=r'students/(?P<student_id>[^/.]+)', permission_classes=[IsStaffRole])
     def remove_student(self, request, pk=None, student_id=None):
-   
         # get subject (self.get_object will raise 404 if not found)
         subject = self.get_object()
-
-        # find the enrollment for this student+subject
-        try:
-            enrollment = Enrollment.objects.get(subject=subject, student__id=student_id)
-        except Enrollment.DoesNotExist:
+        if not student_id.isdigit():
             return Response({"detail": "Enrollment not found."}, status=status.HTTP_404_NOT_FOUND)
 
-        # refuse to remove if graded
-        if enrollment.grade and str(enrollment.grade).strip() != '':
+        # same guarded delete as remove_students, for one student
+        result = _unenroll(subject, [int(student_id)])
+        if result['not_found']:
+            return Response({"detail": "Enrollment not found."}, status=status.HTTP_404_NOT_FOUND)
+        if result['graded']:
             return Response({"detail": "Cannot remove a student from a graded enrollment."}, status=status.HTTP_400_BAD_REQUEST)
-
-        enrollment.delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-class EnrollmentViewSet(viewsets.ModelViewSet):
+class EnrollmentViewSet(ConditionalGetMixin, AsyncReadMixin, ValuesListMixin, FieldsetViewMixin, viewsets.ModelViewSet):
     queryset = Enrollment.objects.select_related('student', 'subject').all()
     serializer_class = EnrollmentSerializer
+    pagination_class = UpdatedAtCursorPagination
+    filter_backends = [EnrollmentFilter]
 
     def get_permissions(self):
-        if self.action in ['list', 'retrieve', 'create']:
+        # bulk and export rows are scoped through get_queryset / perform_create rules, like list/create
+        if self.action in ['list', 'retrieve', 'create', 'bulk', 'export']:
             return [permissions.IsAuthenticated()]
         return [permissions.IsAuthenticated(), IsOwnerOrAdmin()]
 
     def get_queryset(self):
         user = self.request.user
-        if user.is_staff or getattr(user, 'is_admin', False):
+        if request_access(self.request).can('grades.view_enrollment'):
             return super().get_queryset()
         return super().get_queryset().filter(student=user)
 
+    # Conditional GET validators: EnrollmentSerializer only renders the enrollment's own columns,
+    # so MAX(updated_at) + COUNT(*) of the (user-scoped) rows covers every change.
+    # Staff and Teachers see the whole table, whose row count is read from SubjectStats instead of COUNT(*).
+    # ?expand=student / ?expand=subject embed those tables too, so their MAX(updated_at) is added.
+    def get_list_validators(self):
+        queryset = self.filter_queryset(self.get_queryset())
+        if request_access(self.request).can('grades.view_enrollment') and not queryset.query.where:
+            changed = queryset.aggregate(changed=Max('updated_at'))['changed']
+            return self._with_expanded([enrollment_total(), changed], [changed])
+        agg = queryset.aggregate(changed=Max('updated_at'), rows=Count('id'))
+        return self._with_expanded([agg['rows'], agg['changed']], [agg['changed']])
+
+    def get_detail_validators(self):
+        pk = str(self.kwargs.get(self.lookup_url_kwarg or self.lookup_field))
+        if not pk.isdigit():
+            return None, None
+        changed = self.get_queryset().filter(pk=pk).values_list('updated_at', flat=True).first()
+        if changed is None:
+            # unknown or not visible to this user: let retrieve() produce the 404
+            return None, None
+        return self._with_expanded([changed], [changed])
+
+    def _with_expanded(self, parts, changed):
+        for name, model in (('student', User), ('subject', Subject)):
+            if self.expands(name):
+                expanded_changed = model.objects.aggregate(changed=Max('updated_at'))['changed']
+                parts.append(expanded_changed)
+                changed.append(expanded_changed)
+        return parts, newest(*changed)
+
     def perform_create(self, serializer):
         user = self.request.user
-        if not (user.is_staff or getattr(user, 'is_admin', False)):
+        if not request_access(self.request).can('grades.add_enrollment'):
             # Force student to be current user for regular users
             serializer.save(student=user)
         else:
@@ -77,4 +348,307 @@ class EnrollmentViewSet(viewsets.ModelViewSet):
         enrollment = self.get_object()
         if enrollment.grade and str(enrollment.grade).strip() != '':
             return Response({"detail": "Cannot delete a graded enrollment."}, status=status.HTTP_400_BAD_REQUEST)
-        return super().destroy(request, *args, **kwargs)
\ No newline at end of file
+        return super().destroy(request, *args, **kwargs)
+
+    @action(detail=False, methods=['get'], url_path='export')
+    def export(self, request):
+        # Stream the gradebook (enrollments joined to student email and subject name) as
+        # CSV (default) or newline-delimited JSON: ?output=csv|ndjson, optionally ?subject=<id>.
+        # Rows are written as they are read from the DB, so memory stays flat (under ASGI the
+        # rows are handed over as an async iterator, one chunk at a time).
+        # (`?format=` is reserved by DRF for renderer selection, hence `output`.)
+        output = request.query_params.get('output', 'csv')
+        if output not in EXPORT_FORMATS:
+            return Response({"detail": f"Unsupported output '{output}'. Use one of: {', '.join(EXPORT_FORMATS)}."}, status=status.HTTP_400_BAD_REQUEST)
+
+        # archived enrollments of closed terms (grades.archive) are part of the gradebook too
+        queryset, archived = self.get_queryset(), ArchivedEnrollment.objects.all()
+        if not request_access(request).can('grades.view_enrollment'):
+            archived = archived.filter(student=request.user)
+        subject = request.query_params.get('subject')
+        if subject is not None:
+            if not subject.isdigit():
+                return Response({"detail": "subject must be an integer id."}, status=status.HTTP_400_BAD_REQUEST)
+            queryset = queryset.filter(subject_id=int(subject))
+            archived = archived.filter(subject_id=int(subject))
+
+        stream, content_type, extension = EXPORT_FORMATS[output]
+        lines = stream(queryset, archived)
+        if isinstance(request._request, ASGIRequest):
+            lines = aiter_chunks(lines)
+        response = StreamingHttpResponse(lines, content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="gradebook.{extension}"'
+        return response
+
+    @action(detail=False, methods=['post', 'patch'], url_path='bulk')
+    def bulk(self, request):
+        # POST: enroll many (student, subject) pairs; PATCH: post grades for many enrollments.
+        # Rows are validated individually, checked against the DB with set-based queries and
+        # written in a single transaction. The response reports every row by its index.
+        rows = request.data
+        if not isinstance(rows, list) or not rows:
+            return Response({"detail": "Expected a non-empty list of rows."}, status=status.HTTP_400_BAD_REQUEST)
+        max_rows = getattr(settings, 'GRADES_BULK_MAX_ROWS', 1000)
+        if len(rows) > max_rows:
+            return Response({"detail": f"At most {max_rows} rows may be sent at once."}, status=status.HTTP_400_BAD_REQUEST)
+
+        if request.method == 'POST':
+            return self._bulk_create(request, rows)
+        return self._bulk_grade(request, rows)
+
+    def _bulk_create(self, request, rows):
+        user = request.user
+        can_add = request_access(request).can('grades.add_enrollment')
+        results = [None] * len(rows)
+
+        pending = []
+        for index, row in enumerate(rows):
+            item = EnrollmentBulkCreateItemSerializer(data=row)
+            if not item.is_valid():
+                results[index] = _bulk_error(index, item.errors)
+                continue
+            data = dict(item.validated_data)
+            # same rule as perform_create: regular users can only enroll themselves
+            if not can_add or data.get('student') is None:
+                data['student'] = user.pk
+            pending.append((index, data))
+
+        errors = _enrollment_errors({(data['student'], data['subject']) for _, data in pending})
+        to_create = []
+        for index, data in pending:
+            pair = (data['student'], data['subject'])
+            if pair in errors:
+                results[index] = _bulk_error(index, errors[pair])
+                continue
+            # later rows with the same pair are reported as duplicates
+            errors[pair] = {'non_field_errors': ["Student is already enrolled in this subject."]}
+            to_create.append((index, Enrollment(
+                student_id=data['student'], subject_id=data['subject'], grade=data.get('grade'),
+                grade_points=grade_points(data.get('grade')),
+            )))
+
+        while to_create:
+            try:
+                with transaction.atomic():
+                    created = Enrollment.objects.bulk_create([obj for _, obj in to_create])
+                    # bulk_create sends no post_save, so update the subject statistics and
+                    # invalidate cached subject payloads here
+                    apply_enrollment_changes((obj.subject_id, 1, None, obj.grade) for obj in created)
+                    response_cache.bump_versions(response_cache.ENROLLMENTS)
+                    events.publish(events.enrollment_event(events.CREATED, obj) for obj in created)
+            except IntegrityError:
+                # a concurrent request enrolled (or deleted) some of these rows and nothing was
+                # written: report the rows that conflict now and insert the others again
+                errors = _enrollment_errors({(obj.student_id, obj.subject_id) for _, obj in to_create})
+                if not errors:
+                    for index, _ in to_create:
+                        results[index] = _bulk_error(
+                            index, {'non_field_errors': ["Conflicting concurrent write, please retry."]})
+                    break
+                retry = []
+                for index, obj in to_create:
+                    pair = (obj.student_id, obj.subject_id)
+                    if pair in errors:
+                        results[index] = _bulk_error(index, errors[pair])
+                    else:
+                        retry.append((index, Enrollment(
+                            student_id=obj.student_id, subject_id=obj.subject_id, grade=obj.grade,
+                            grade_points=obj.grade_points)))
+                to_create = retry
+            else:
+                for (index, _), obj in zip(to_create, created):
+                    results[index] = {'index': index, 'status': 'created', 'enrollment': EnrollmentSerializer(obj).data}
+                break
+
+        return _bulk_response(results, status.HTTP_201_CREATED)
+
+    def _bulk_grade(self, request, rows):
+        results = [None] * len(rows)
+
+        pending = []
+        for index, row in enumerate(rows):
+            item = EnrollmentBulkGradeItemSerializer(data=row)
+            if not item.is_valid():
+                results[index] = _bulk_error(index, item.errors)
+                continue
+            pending.append((index, item.validated_data))
+
+        # Same rule as IsOwnerOrAdmin: own enrollments, or any with change_enrollment
+        # (get_queryset already scopes students to their own); other rows are reported as not found.
+        queryset = self.get_queryset()
+        if not request_access(request).can('grades.change_enrollment'):
+            queryset = queryset.filter(student=request.user)
+        enrollments = queryset.in_bulk({data['id'] for _, data in pending})
+
+        now = timezone.now()
+        to_update = []
+        previous_grades = {}
+        seen = set()
+        for index, data in pending:
+            enrollment = enrollments.get(data['id'])
+            if enrollment is None:
+                results[index] = _bulk_error(index, {'id': ["Not found."]})
+            elif data['id'] in seen:
+                results[index] = _bulk_error(index, {'id': ["Enrollment appears more than once in this request."]})
+            else:
+                seen.add(data['id'])
+                previous_grades[index] = enrollment.grade
+                enrollment.grade = data['grade']
+                enrollment.grade_points = grade_points(data['grade'])
+                # bulk_update skips auto_now, so keep updated_at current by hand
+                enrollment.updated_at = now
+                to_update.append((index, enrollment))
+
+        if to_update:
+            with transaction.atomic():
+                Enrollment.objects.bulk_update([obj for _, obj in to_update], ['grade', 'grade_points', 'updated_at'])
+                # bulk_update sends no post_save, so update the subject statistics and
+                # invalidate cached subject payloads here
+                apply_enrollment_changes(
+                    (obj.subject_id, 0, previous_grades[index], obj.grade) for index, obj in to_update)
+                response_cache.bump_versions(response_cache.ENROLLMENTS)
+                events.publish(events.enrollment_event(events.GRADED, obj)
+                               for index, obj in to_update if obj.grade != previous_grades[index])
+            for index, obj in to_update:
+                results[index] = {'index': index, 'status': 'updated', 'enrollment': EnrollmentSerializer(obj).data}
+
+        return _bulk_response(results, status.HTTP_200_OK)
+
+
+class MetricsView(APIView):
+    """
+    Admin-only Prometheus scrape endpoint: per-view request counts, latency and DB histograms
+    collected by grades.metrics.ViewMetricsMiddleware, plus token/response cache hit/miss counters.
+    """
+    permission_classes = [IsStaffRole]
+
+    def get(self, request):
+        cache_stats = token_cache_stats()
+        response_stats = response_cache.response_cache_stats()
+        extra = (
+            ('grades_token_cache_hits_total', 'counter', 'Token lookups served from the cache.', cache_stats['hits']),
+            ('grades_token_cache_misses_total', 'counter', 'Token lookups that hit the database.', cache_stats['misses']),
+            ('grades_response_cache_hits_total', 'counter', 'Subject responses served from the shared cache.',
+             response_stats['hits']),
+            ('grades_response_cache_misses_total', 'counter', 'Cacheable subject responses that were rendered.',
+             response_stats['misses']),
+        )
+        return HttpResponse(metrics_registry.render(extra), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+class JobViewSet(mixins.CreateModelMixin, mixins.RetrieveModelMixin, mixins.ListModelMixin, viewsets.GenericViewSet):
+    """
+    Background jobs (grades.jobs): POST queues one (202 + its status URL in Location), GET polls
+    status and progress, /api/jobs/{id}/result/ downloads the output file.
+    Staff see every job; other users only their own.
+    """
+    queryset = Job.objects.all().order_by('id')
+    serializer_class = JobSerializer
+    pagination_class = IdCursorPagination
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        user = self.request.user
+        if request_access(self.request).is_staff:
+            return super().get_queryset()
+        return super().get_queryset().filter(created_by=user)
+
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        job = serializer.save(created_by=request.user)
+        headers = {'Location': reverse('api:job-detail', args=[job.pk], request=request)}
+        return Response(serializer.data, status=status.HTTP_202_ACCEPTED, headers=headers)
+
+    @action(detail=True, methods=['get'])
+    def result(self, request, pk=None):
+        job = self.get_object()
+        if not job.result_file:
+            return Response({"detail": "This job has no result file."}, status=status.HTTP_404_NOT_FOUND)
+        return FileResponse(job.result_file.open('rb'), as_attachment=True,
+                            filename=os.path.basename(job.result_file.name))
+
+
+class SyncView(APIView):
+    """
+    Delta sync for clients that keep a local mirror of subjects, enrollments and users.
+
+    - GET /api/sync/ returns every visible row and a token; GET /api/sync/?since=<token> returns
+      only rows changed since then, plus the ids deleted since then (grades.sync).
+    - Visibility follows the list endpoints: staff see everything, Teachers all subjects and
+      enrollments, students all subjects and their own enrollments; non-staff only their account.
+    - 410 when the token is older than the tombstone retention: sync again without `since`.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        return Response(sync_changes(request.user, request.query_params.get('since') or None))
+
+
+def _unenroll(subject, student_ids):
+    """
+    Delete the ungraded enrollments of `student_ids` in `subject`.
+    Returns {'removed': [...], 'graded': [...], 'not_found': [...]} (student ids, request order).
+
+    The rows are read (locked, where the database supports it) and deleted in one transaction,
+    with the graded guard repeated in the DELETE's WHERE clause. The DELETE is a plain SQL one
+    (stats.delete_enrollments): QuerySet.delete() would load the rows again and send post_delete
+    per row, so the statistics, tombstones, cache versions and events those receivers maintain
+    are written here in bulk.
+    """
+    with transaction.atomic():
+        enrollments = list(
+            Enrollment.objects.select_for_update().filter(subject=subject, student_id__in=student_ids)
+            .only('id', 'student_id', 'subject_id', 'grade', 'grade_points', 'updated_at')
+            # classified by the DELETE's own condition, so the report matches what is deleted
+            .annotate(ungraded=ExpressionWrapper(UNGRADED, output_field=BooleanField())))
+        by_student = {enrollment.student_id: enrollment for enrollment in enrollments}
+        ungraded = [enrollment for enrollment in enrollments if enrollment.ungraded]
+        if ungraded:
+            delete_enrollments(Enrollment.objects.filter(pk__in=[e.pk for e in ungraded]).filter(UNGRADED))
+            apply_enrollment_changes((e.subject_id, -1, e.grade, None) for e in ungraded)
+            Tombstone.objects.bulk_create(
+                Tombstone(model=Tombstone.ENROLLMENT, object_id=e.pk, student_id=e.student_id) for e in ungraded)
+            response_cache.bump_versions(response_cache.ENROLLMENTS)
+            events.publish(events.enrollment_event(events.DELETED, e) for e in ungraded)
+
+    removed = {e.student_id for e in ungraded}
+    return {
+        'removed': [pk for pk in student_ids if pk in removed],
+        'graded': [pk for pk in student_ids if pk in by_student and pk not in removed],
+        'not_found': [pk for pk in student_ids if pk not in by_student],
+    }
+
+
+def _enrollment_errors(pairs):
+    """
+    {(student_id, subject_id): errors} for the pairs that cannot be enrolled: unknown student,
+    unknown subject or already enrolled. Three queries however many pairs.
+    """
+    student_ids = {student for student, _ in pairs}
+    subject_ids = {subject for _, subject in pairs}
+    known_students = set(User.objects.filter(pk__in=student_ids).values_list('pk', flat=True))
+    known_subjects = set(Subject.objects.filter(pk__in=subject_ids).values_list('pk', flat=True))
+    taken = set(
+        Enrollment.objects.filter(student_id__in=student_ids, subject_id__in=subject_ids)
+        .values_list('student_id', 'subject_id')
+    )
+    errors = {}
+    for student, subject in pairs:
+        if student not in known_students:
+            errors[student, subject] = {'student': [f'Invalid pk "{student}" - object does not exist.']}
+        elif subject not in known_subjects:
+            errors[student, subject] = {'subject': [f'Invalid pk "{subject}" - object does not exist.']}
+        elif (student, subject) in taken:
+            errors[student, subject] = {'non_field_errors': ["Student is already enrolled in this subject."]}
+    return errors
+
+
+def _bulk_error(index, errors):
+    return {'index': index, 'status': 'error', 'errors': errors}
+
+
+def _bulk_response(results, success_status):
+    # 400 only when no row could be written; otherwise partial success with per-row errors
+    ok = any(r['status'] != 'error' for r in results)
+    return Response({'results': results}, status=success_status if ok else status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,16 @@
+import os
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'project.settings')
+# list/detail reads are served by async views under ASGI; API_ASYNC_READS=0 keeps the sync ones
+os.environ.setdefault('API_ASYNC_READS', '1')
+# each async request runs its sync work in a fresh thread, so persistent connections would
+# pile up one per thread; use a pooler (PgBouncer) for connection reuse under ASGI
+os.environ.setdefault('API_DB_CONN_MAX_AGE', '0')
+
+django_application = get_asgi_application()
+
+from grades.event_stream import with_event_stream  # noqa: E402  (needs the app registry)
+
+# /api/events/enrollments/ (Server-Sent Events) is answered before Django's middleware stack
+application = with_event_stream(django_application)
@@ -0,0 +1,82 @@
+import os
+
+
+def database_config(base_dir, env=os.environ):
+    """
+    DATABASES['default'] built from API_DB_* environment variables.
+
+    - API_DB_ENGINE: 'sqlite' (default) or 'postgresql'.
+    - API_DB_NAME: SQLite file (default db.sqlite3) or PostgreSQL database name.
+    - API_DB_CONN_MAX_AGE: seconds a connection is reused across requests (default 60,
+      0 under ASGI, see project/asgi.py); broken persistent connections are replaced
+      (CONN_HEALTH_CHECKS).
+    - SQLite: WAL journal, synchronous=NORMAL, API_DB_SQLITE_MMAP_SIZE bytes of mmap,
+      API_DB_BUSY_TIMEOUT seconds of waiting on a locked database and BEGIN IMMEDIATE
+      transactions (see grades.backends.sqlite3).
+    - PostgreSQL: API_DB_USER / PASSWORD / HOST / PORT, API_DB_CONNECT_TIMEOUT; set
+      API_DB_PGBOUNCER=1 behind a transaction-pooling PgBouncer (disables server-side cursors,
+      which do not survive the pooler switching backends between transactions).
+    """
+    engine = env.get('API_DB_ENGINE', 'sqlite')
+    common = {
+        'CONN_MAX_AGE': int(env.get('API_DB_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': True,
+    }
+    if engine == 'sqlite':
+        return {
+            'ENGINE': 'grades.backends.sqlite3',
+            'NAME': env.get('API_DB_NAME', base_dir / 'db.sqlite3'),
+            # a file, not the in-memory default, so tests see WAL and real cross-connection locking
+            'TEST': {'NAME': env.get('API_DB_TEST_NAME', base_dir / 'test_db.sqlite3')},
+            'OPTIONS': {
+                'timeout': float(env.get('API_DB_BUSY_TIMEOUT', 20)),
+                'transaction_mode': 'IMMEDIATE',
+                'pragmas': {
+                    'journal_mode': 'WAL',
+                    'synchronous': 'NORMAL',
+                    'mmap_size': int(env.get('API_DB_SQLITE_MMAP_SIZE', 256 * 1024 * 1024)),
+                },
+            },
+            **common,
+        }
+    if engine == 'postgresql':
+        return {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': env.get('API_DB_NAME', 'grades'),
+            'USER': env.get('API_DB_USER', ''),
+            'PASSWORD': env.get('API_DB_PASSWORD', ''),
+            'HOST': env.get('API_DB_HOST', ''),
+            'PORT': env.get('API_DB_PORT', ''),
+            'OPTIONS': {'connect_timeout': int(env.get('API_DB_CONNECT_TIMEOUT', 5))},
+            'DISABLE_SERVER_SIDE_CURSORS': env.get('API_DB_PGBOUNCER', '0') == '1',
+            **common,
+        }
+    raise ValueError(f"API_DB_ENGINE must be 'sqlite' or 'postgresql', not {engine!r}")
+
+
+def replica_configs(default, env=os.environ):
+    """
+    Read replicas of the `default` database from API_DB_REPLICAS (comma-separated), as
+    {'replica1': {...}, 'replica2': {...}}; grades.routers sends reads to them.
+
+    - SQLite: each entry is a database file kept in step with the primary (a copy, Litestream,
+      ...). It is opened read-only, so a missing file fails instead of being created empty.
+    - PostgreSQL: each entry is the host[:port] of a streaming replica; name, user, password
+      and options are the primary's.
+    - Tests mirror every replica to the default test database.
+    """
+    replicas = {}
+    for number, entry in enumerate(filter(None, (e.strip() for e in env.get('API_DB_REPLICAS', '').split(','))), 1):
+        config = {**default, 'TEST': {'MIRROR': 'default'}}
+        if default['ENGINE'] == 'grades.backends.sqlite3':
+            options = dict(default['OPTIONS'])
+            # readers only: no journal-mode switch or write-locking transactions on a replica
+            options.pop('transaction_mode', None)
+            options['pragmas'] = {name: value for name, value in options.get('pragmas', {}).items()
+                                  if name != 'journal_mode'}
+            config.update(NAME=f'file:{entry}?mode=ro', OPTIONS=options)
+        else:
+            host, _, port = entry.partition(':')
+            config.update(HOST=host, PORT=port or default['PORT'])
+        replicas[f'replica{number}'] = config
+    return replicas
@@ -1,6 +1,10 @@
 import os
 from pathlib import Path
 
+from corsheaders.defaults import default_headers
+
+from project.database import database_config, replica_configs
+
 BASE_DIR = Path(__file__).resolve().parent.parent
 
 SECRET_KEY = 'test-secret-key'
@@ -26,10 +30,12 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'grades.metrics.ViewMetricsMiddleware',  # per-view request/DB metrics for /api/_metrics
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'grades.routers.ReplicaRoutingMiddleware',  # read replicas for GET requests (API_DB_REPLICAS)
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'corsheaders.middleware.CorsMiddleware',  # new
@@ -54,14 +60,25 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'project.wsgi.application'
+ASGI_APPLICATION = 'project.asgi.application'
 
+# SQLite (WAL, tuned for concurrent writers) by default, PostgreSQL via API_DB_* variables
 DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
+    'default': database_config(BASE_DIR),
 }
 
+# read replicas (API_DB_REPLICAS, see project/database.py): GET/HEAD/OPTIONS requests read
+# subjects, enrollments and users from them (grades.routers). After a user's own write their
+# reads stay on the primary for GRADES_REPLICA_STICKY_SECONDS (set it above the replication
+# lag); a replica that fails is skipped for GRADES_REPLICA_RETRY_SECONDS. The pins are kept in
+# GRADES_REPLICA_CACHE_ALIAS, which must be shared between processes like the role cache.
+DATABASES.update(replica_configs(DATABASES['default']))
+GRADES_DB_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+DATABASE_ROUTERS = ['grades.routers.ReadReplicaRouter']
+GRADES_REPLICA_STICKY_SECONDS = int(os.environ.get('API_DB_REPLICA_STICKY_SECONDS', 5))
+GRADES_REPLICA_RETRY_SECONDS = int(os.environ.get('API_DB_REPLICA_RETRY_SECONDS', 30))
+GRADES_REPLICA_CACHE_ALIAS = 'default'
+
 AUTH_PASSWORD_VALIDATORS = []
 
 LANGUAGE_CODE = 'en-us'
@@ -72,24 +89,124 @@ USE_TZ = True
 
 STATIC_URL = '/static/'
 
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
 # Use custom user model in grades app
 AUTH_USER_MODEL = 'grades.User'
 
 # basic DRF configuration
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework.authentication.TokenAuthentication',
+        # TokenAuthentication with the token -> user lookup cached (see grades.authentication)
+        'grades.authentication.CachedTokenAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticatedOrReadOnly',
     ),
+    # orjson-backed JSON (same bytes as DRF's JSONRenderer, see grades.renderers)
+    'DEFAULT_RENDERER_CLASSES': (
+        'grades.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'grades.renderers.ORJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ),
+    # keyset pagination: no COUNT(*) per page, cursors follow indexed orderings
+    'DEFAULT_PAGINATION_CLASS': 'grades.pagination.IdCursorPagination',
+    'PAGE_SIZE': int(os.environ.get('API_PAGE_SIZE', 100)),
 }
 
+# upper bound for the ?page_size= query parameter accepted by grades.pagination
+GRADES_MAX_PAGE_SIZE = int(os.environ.get('API_MAX_PAGE_SIZE', 500))
+
+# maximum number of rows accepted by /api/enrollments/bulk/ per request
+GRADES_BULK_MAX_ROWS = int(os.environ.get('API_BULK_MAX_ROWS', 1000))
+
+# list actions serialise `.values()` rows directly when the serializer allows it (grades.fast_list)
+GRADES_FAST_LIST = os.environ.get('API_FAST_LIST', '1') != '0'
+
+# rows fetched per round-trip by the streaming gradebook export
+GRADES_EXPORT_CHUNK_SIZE = int(os.environ.get('API_EXPORT_CHUNK_SIZE', 2000))
+
+# bulk user import: password hashing processes (None = all cores) and users per bulk_create
+GRADES_IMPORT_WORKERS = int(os.environ['API_IMPORT_WORKERS']) if os.environ.get('API_IMPORT_WORKERS') else None
+GRADES_IMPORT_BATCH_SIZE = int(os.environ.get('API_IMPORT_BATCH_SIZE', 1000))
+
+# cached token authentication: cache alias and seconds a token -> user lookup is kept
+# (at most GRADES_LOCAL_CACHE_TTL in a per-process cache, see below)
+GRADES_TOKEN_CACHE_ALIAS = 'default'
+GRADES_TOKEN_CACHE_TTL = int(os.environ.get('API_TOKEN_CACHE_TTL', 300))
+
+# cached role / permission resolution (grades.roles): cache alias and seconds an entry is kept.
+# Staff and admin roles come from the user's flags and are never cached.
+GRADES_ROLE_CACHE_ALIAS = 'default'
+GRADES_ROLE_CACHE_TTL = int(os.environ.get('API_ROLE_CACHE_TTL', 300))
+
+# Entries dropped by signals (tokens, roles) are kept at most this many seconds in a per-process cache
+# such as the default LocMemCache: a write in another worker reaches it only by expiry.
+# A shared alias (Redis, Memcached) sees every invalidation and keeps its full TTL.
+GRADES_LOCAL_CACHE_TTL = int(os.environ.get('API_LOCAL_CACHE_TTL', 5))
+
+# user.has_perm() (admin site included) answered from the same cached permission set
+AUTHENTICATION_BACKENDS = ['grades.roles.RoleBackend']
+
+# per-view request metrics served at /api/_metrics (set API_METRICS=0 to disable the middleware)
+GRADES_METRICS_ENABLED = os.environ.get('API_METRICS', '1') != '0'
+
+# serve list/detail reads with async views (grades.async_views); project/asgi.py turns this on
+GRADES_ASYNC_READS = os.environ.get('API_ASYNC_READS', '0') == '1'
+
+# shared subject response cache (anonymous / staff payloads), invalidated by version bumps.
+# The versions live in the database (grades.CacheVersion), so any backend is safe with any
+# number of worker processes; a shared one (Redis, Memcached) renders each payload only once.
+# The TTL only reclaims space from superseded versions.
+GRADES_RESPONSE_CACHE_ALIAS = 'default'
+GRADES_RESPONSE_CACHE_TTL = int(os.environ.get('API_RESPONSE_CACHE_TTL', 3600))
+
+# /api/sync/: rows per feed per call, seconds of changes replayed to catch late commits, and
+# how long deletions are remembered (older sync tokens get 410; `manage.py prune_tombstones`)
+GRADES_SYNC_PAGE_SIZE = int(os.environ.get('API_SYNC_PAGE_SIZE', 500))
+GRADES_SYNC_GRACE_SECONDS = int(os.environ.get('API_SYNC_GRACE_SECONDS', 5))
+GRADES_SYNC_TOMBSTONE_DAYS = int(os.environ.get('API_SYNC_TOMBSTONE_DAYS', 30))
+
+# live enrollment events (/api/events/enrollments/ under ASGI, grades.event_stream):
+# - the broker shares events between worker processes: grades.events.LocalBroker serves one
+#   process, grades.events.RedisBroker (API_EVENTS_REDIS_URL) any number of them
+# - events a slow listener may fall behind before it is cut off, seconds between heartbeats,
+#   maximum stream duration and open streams per process
+GRADES_EVENTS_BROKER = os.environ.get('API_EVENTS_BROKER', 'grades.events.LocalBroker')
+GRADES_EVENTS_REDIS_URL = os.environ.get('API_EVENTS_REDIS_URL', 'redis://localhost:6379/0')
+GRADES_EVENTS_QUEUE_SIZE = int(os.environ.get('API_EVENTS_QUEUE_SIZE', 100))
+GRADES_EVENTS_HEARTBEAT_SECONDS = int(os.environ.get('API_EVENTS_HEARTBEAT_SECONDS', 15))
+GRADES_EVENTS_MAX_SECONDS = int(os.environ.get('API_EVENTS_MAX_SECONDS', 3600))
+GRADES_EVENTS_MAX_CONNECTIONS = int(os.environ.get('API_EVENTS_MAX_CONNECTIONS', 10000))
+
+# background jobs (grades.jobs, `manage.py run_jobs`): input uploads and results are stored
+# under MEDIA_ROOT (share it, or configure a shared storage, when workers run on other hosts);
+# a worker's claim lasts GRADES_JOBS_LEASE_SECONDS and is renewed while the job runs
+MEDIA_ROOT = os.environ.get('API_MEDIA_ROOT', BASE_DIR / 'media')
+GRADES_JOBS_LEASE_SECONDS = int(os.environ.get('API_JOBS_LEASE_SECONDS', 60))
+GRADES_JOBS_MAX_ATTEMPTS = int(os.environ.get('API_JOBS_MAX_ATTEMPTS', 3))
+GRADES_JOBS_POLL_SECONDS = float(os.environ.get('API_JOBS_POLL_SECONDS', 1.0))
+
+# term archival (`manage.py archive_terms`, grades.archive): enrollments moved per transaction
+GRADES_ARCHIVE_BATCH_SIZE = int(os.environ.get('API_ARCHIVE_BATCH_SIZE', 1000))
+
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:5173",   # Vite dev server default
     "http://localhost:3000",   # if you use another dev server
 ]
 
+# conditional GETs: let the browser client send validators and read them back
+CORS_ALLOW_HEADERS = list(default_headers) + ['if-none-match', 'if-modified-since']
+CORS_EXPOSE_HEADERS = ['ETag', 'Last-Modified']
+
 # or for quick dev
 # CORS_ALLOW_ALL_ORIGINS = True
\ No newline at end of file
@@ -1,7 +1,9 @@
+from django.conf import settings
 from django.contrib import admin
 from django.urls import path, include
 from rest_framework import routers
 from grades import views as grade_views
+from grades.async_views import read_urlpatterns
 from rest_framework.authtoken import views as drf_authtoken_views
 from django.views.generic import RedirectView
 
@@ -9,12 +11,21 @@ router = routers.DefaultRouter()
 router.register(r'users', grade_views.UserViewSet, basename='user')
 router.register(r'subjects', grade_views.SubjectViewSet, basename='subject')
 router.register(r'enrollments', grade_views.EnrollmentViewSet, basename='enrollment')
+router.register(r'jobs', grade_views.JobViewSet, basename='job')
 
 urlpatterns = [
     # Redirect root URL to the API root so http://127.0.0.1:8000/ doesn't 404
     path('', RedirectView.as_view(url='/api/', permanent=False)),
 
     path('admin/', admin.site.urls),
+    # admin-only Prometheus metrics (grades.metrics.ViewMetricsMiddleware)
+    path('api/_metrics', grade_views.MetricsView.as_view(), name='metrics'),
+    # delta sync for client-side mirrors (grades.sync)
+    path('api/sync/', grade_views.SyncView.as_view(), name='sync'),
     path('api/', include((router.urls, 'api'), namespace='api')),
     path('api-token-auth/', drf_authtoken_views.obtain_auth_token, name='api_token_auth'),
 ]
+
+if settings.GRADES_ASYNC_READS:
+    # ASGI deployments (project/asgi.py): list/detail GETs run as async views
+    urlpatterns = read_urlpatterns(urlpatterns)